@@ -0,0 +1,157 @@
+# benchmarks/ann_recall.py
+"""Measure IVF/PQ recall@k and latency against brute-force search.
+
+Builds a synthetic corpus of clustered unit vectors (the shape sentence
+embeddings of templated policies have), computes exact top-k with a full
+scan, then sweeps nprobe for each index configuration and reports
+recall@k, per-query latency and build time. A slice of rows is re-added
+before searching, as upserts do, and the run fails if any search then
+returns a row twice.
+
+    python -m benchmarks.ann_recall --rows 200000 --nprobe 1,4,16,64 --pq-m 0,48
+"""
+from typing import Dict, Any, List, Tuple
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from src.agent.ann_index import IVFIndex
+
+
+def synthetic_corpus(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors drawn around random topic centers"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, rows)] + 0.6 * rng.normal(size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(corpus: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Corpus vectors moved by a perturbation of norm ~0.3, so each query has close but not identical neighbours"""
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(size=(count, corpus.shape[1])).astype(np.float32) * (0.3 / np.sqrt(corpus.shape[1]))
+    queries = corpus[rng.integers(0, len(corpus), count)] + noise
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def brute_force(corpus: np.ndarray, queries: np.ndarray, k: int) -> Tuple[np.ndarray, float]:
+    """Exact top-k rows per query and the mean per-query latency in milliseconds"""
+    started = time.perf_counter()
+    truth = []
+    for query in queries:
+        scores = corpus @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        truth.append(top[np.argsort(-scores[top])])
+    return np.array(truth), (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def run_config(corpus: np.ndarray,
+               queries: np.ndarray,
+               truth: np.ndarray,
+               k: int,
+               nlist: int,
+               pq_m: int,
+               refine: int,
+               nprobes: List[int],
+               train_size: int) -> List[Dict[str, Any]]:
+    """Build one index and sweep nprobe over it"""
+    index = IVFIndex(nlist=nlist, pq_m=pq_m, refine=refine)
+    started = time.perf_counter()
+    sample = np.random.default_rng(2).choice(len(corpus), min(train_size, len(corpus)), replace=False)
+    index.train(corpus[np.sort(sample)])
+    train_s = time.perf_counter() - started
+
+    # Add in slices, as ingestion would
+    started = time.perf_counter()
+    for start in range(0, len(corpus), 50000):
+        index.add(np.arange(start, min(start + 50000, len(corpus))), corpus[start:start + 50000])
+    add_s = time.perf_counter() - started
+
+    # Re-add a slice, as an upsert of existing chunks does; each row must still be returned once
+    reindexed = np.arange(0, len(corpus), 7)
+    index.add(reindexed, corpus[reindexed])
+
+    results = []
+    for nprobe in nprobes:
+        latencies = []
+        hits = 0
+        duplicates = 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            rows, _ = index.search(query, k, corpus, nprobe=nprobe)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(set(rows.tolist()) & set(expected.tolist()))
+            duplicates += len(rows) - len(np.unique(rows))
+        latencies.sort()
+        results.append({
+            'nlist': nlist,
+            'pq_m': pq_m,
+            'nprobe': nprobe,
+            'recall_at_k': hits / (len(queries) * k),
+            'duplicate_hits': duplicates,
+            'latency_ms_p50': latencies[len(latencies) // 2],
+            'latency_ms_p95': latencies[int(len(latencies) * 0.95)],
+            'train_s': train_s,
+            'add_s': add_s
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeddings are 384-d")
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--nprobe", default="1,4,16,64", help="comma-separated nprobe values")
+    parser.add_argument("--pq-m", default="0,48", help="comma-separated PQ sub-quantizer counts; 0 disables PQ")
+    parser.add_argument("--refine", type=int, default=4)
+    parser.add_argument("--train-size", type=int, default=100000)
+    parser.add_argument("--output", help="write the full results as JSON")
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows} x {args.dim} corpus...")
+    corpus = synthetic_corpus(args.rows, args.dim, args.clusters)
+    queries = make_queries(corpus, args.queries)
+    truth, brute_ms = brute_force(corpus, queries, args.k)
+    print(f"Brute force: {brute_ms:.2f} ms/query")
+
+    nprobes = [int(value) for value in args.nprobe.split(",") if value]
+    results = []
+    for pq_m in [int(value) for value in args.pq_m.split(",") if value]:
+        print(f"Building IVF{args.nlist}{f',PQ{pq_m}' if pq_m else ''}...")
+        results.extend(run_config(corpus, queries, truth, args.k, args.nlist, pq_m, args.refine, nprobes, args.train_size))
+
+    print(f"\n{'pq_m':>5} {'nprobe':>7} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8}")
+    for result in results:
+        print(
+            f"{result['pq_m']:>5} {result['nprobe']:>7} {result['recall_at_k']:>10.3f} "
+            f"{result['latency_ms_p50']:>8.2f} {result['latency_ms_p95']:>8.2f} "
+            f"{brute_ms / result['latency_ms_p50']:>7.1f}x"
+        )
+
+    duplicates = sum(result['duplicate_hits'] for result in results)
+    if duplicates:
+        print(f"\nError: {duplicates} duplicate rows returned after re-adding rows")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            'rows': args.rows,
+            'dim': args.dim,
+            'k': args.k,
+            'brute_force_ms': brute_ms,
+            'results': results
+        }, indent=2))
+        print(f"\nResults written to {args.output}")
+    if duplicates:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
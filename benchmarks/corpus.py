@@ -0,0 +1,241 @@
+# benchmarks/corpus.py
+"""Generate synthetic health and auto policies with a question workload of known answers.
+
+Policies follow the layout of the sample documents in
+``examples/sample_docs`` with randomized amounts, a unique policy number
+each, and optional rider sections to grow the documents. Every question
+names its policy number and records the expected answer and source file,
+so retrieval recall and answer accuracy can be scored.
+
+    python -m benchmarks.corpus --output bench_corpus --policies 1000 --sections 4
+"""
+from typing import Dict, Any, List, Tuple
+from pathlib import Path
+import argparse
+import json
+import random
+
+HEALTH_TEMPLATE = """HEALTH INSURANCE POLICY
+Policy Number: {policy_number}
+Date: {date}
+Insured: {insured}
+
+PRIMARY COVERAGE DETAILS:
+1. Primary Care Visits
+   - Copay: ${primary_copay} per visit
+   - Annual check-up: Covered 100%
+   - Preventive care: No copay
+
+2. Specialist Care
+   - Copay: ${specialist_copay} per visit
+   - Referral required from primary care
+   - Virtual consultation: ${virtual_copay} copay
+
+3. Prescription Drug Coverage
+   - Generic medications: ${generic_copay} copay
+   - Brand name medications: ${brand_copay} copay
+   - Specialty medications: {specialty_coinsurance}% coinsurance
+   - Mail order (90-day supply): 2x copay
+
+4. Hospital Services
+   - Inpatient care: ${inpatient_copay} per day copay
+   - Outpatient surgery: ${outpatient_copay} copay
+   - Emergency room: ${er_copay} copay (waived if admitted)
+   - Urgent care: ${urgent_copay} copay
+
+5. Mental Health Services
+   - In-network therapy: ${therapy_copay} copay
+   - Virtual mental health: ${virtual_mental_copay} copay
+   - Inpatient mental health: Same as medical
+{riders}
+ADDITIONAL BENEFITS:
+- Annual deductible: ${deductible:,} individual/${family_deductible:,} family
+- Out-of-pocket maximum: ${oop_max:,} individual/${family_oop_max:,} family
+- Wellness program discounts
+- 24/7 Nurse hotline: 1-800-NURSE-24
+
+HOW TO ACCESS CARE:
+1. Find a provider: www.healthpolicy.com/providers
+2. Virtual care: Download HealthApp or visit www.healthpolicy.com/virtual
+3. Emergency: Call 911 or go to nearest emergency room
+4. Questions: Call 1-800-HEALTH-1 (Available 24/7)
+"""
+
+AUTO_TEMPLATE = """AUTO INSURANCE POLICY
+Policy Number: {policy_number}
+Date: {date}
+Insured: {insured}
+
+COVERAGE DETAILS:
+1. Collision Coverage
+   - Deductible: ${collision_deductible:,}
+   - Coverage limit: ${collision_limit:,}
+
+2. Comprehensive Coverage
+   - Deductible: ${comprehensive_deductible:,}
+   - Coverage limit: ${comprehensive_limit:,}
+
+3. Liability Coverage
+   - Bodily Injury: ${bodily_person:,} per person/${bodily_accident:,} per accident
+   - Property Damage: ${property_damage:,} per accident
+{riders}
+Claims Process:
+- Phone: {claims_phone}
+- Online: www.example.com/claims
+- Mobile App: InsuranceApp
+"""
+
+RIDER_TEMPLATE = """
+{number}. {name} Rider
+   - Annual limit: ${limit:,}
+   - Waiting period: {waiting_days} days
+   - Exclusions: {exclusion}
+"""
+
+RIDER_NAMES = {
+    'health': ["Dental", "Vision", "Hearing", "Chiropractic", "Acupuncture", "Travel Medical", "Maternity", "Physical Therapy"],
+    'auto': ["Roadside Assistance", "Rental Reimbursement", "Gap Insurance", "Glass Repair", "Custom Equipment", "Rideshare", "Pet Injury", "Towing"]
+}
+EXCLUSIONS = ["Cosmetic procedures", "Pre-existing conditions", "Racing events", "Commercial use", "Intentional damage", "Experimental treatment"]
+NAMES = ["Avery", "Jordan", "Riley", "Morgan", "Casey", "Quinn", "Harper", "Rowan", "Emerson", "Sage"]
+SURNAMES = ["Patel", "Nguyen", "Garcia", "Okafor", "Schmidt", "Kowalski", "Tanaka", "Silva", "Haddad", "Larsen"]
+
+# (question template, template field, answer format)
+HEALTH_QUESTIONS = [
+    ("What is the primary care copay on policy {policy_number}?", 'primary_copay', "${}"),
+    ("What is the specialist copay on policy {policy_number}?", 'specialist_copay', "${}"),
+    ("How much are generic medications on policy {policy_number}?", 'generic_copay', "${}"),
+    ("What is the emergency room copay on policy {policy_number}?", 'er_copay', "${}"),
+    ("What is the urgent care copay on policy {policy_number}?", 'urgent_copay', "${}"),
+    ("What is the annual deductible on policy {policy_number}?", 'deductible', "${:,}"),
+    ("What is the out-of-pocket maximum on policy {policy_number}?", 'oop_max', "${:,}")
+]
+AUTO_QUESTIONS = [
+    ("What is the collision deductible on policy {policy_number}?", 'collision_deductible', "${:,}"),
+    ("What is the comprehensive deductible on policy {policy_number}?", 'comprehensive_deductible', "${:,}"),
+    ("What is the collision coverage limit on policy {policy_number}?", 'collision_limit', "${:,}"),
+    ("What is the property damage limit on policy {policy_number}?", 'property_damage', "${:,}"),
+    ("What is the bodily injury limit per person on policy {policy_number}?", 'bodily_person', "${:,}")
+]
+
+
+def _riders(kind: str, sections: int, first_number: int, rng: random.Random) -> str:
+    names = rng.sample(RIDER_NAMES[kind], min(sections, len(RIDER_NAMES[kind])))
+    names += [f"{rng.choice(RIDER_NAMES[kind])} Plus" for _ in range(sections - len(names))]
+    return "".join(
+        RIDER_TEMPLATE.format(
+            number=first_number + i,
+            name=name,
+            limit=rng.randrange(5, 200) * 100,
+            waiting_days=rng.choice([0, 15, 30, 60, 90]),
+            exclusion=rng.choice(EXCLUSIONS)
+        )
+        for i, name in enumerate(names)
+    )
+
+
+def generate_policy(kind: str, index: int, sections: int, rng: random.Random) -> Tuple[str, Dict[str, Any]]:
+    """Policy text and the values filled into its template"""
+    values: Dict[str, Any] = {
+        'policy_number': f"{kind.upper()}-2025-{index:05d}",
+        'date': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00",
+        'insured': f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}"
+    }
+    if kind == 'health':
+        values.update(
+            primary_copay=rng.randrange(10, 60, 5),
+            specialist_copay=rng.randrange(30, 90, 5),
+            virtual_copay=rng.randrange(0, 40, 5),
+            generic_copay=rng.randrange(5, 25, 5),
+            brand_copay=rng.randrange(25, 80, 5),
+            specialty_coinsurance=rng.choice([10, 20, 30, 40]),
+            inpatient_copay=rng.randrange(100, 600, 50),
+            outpatient_copay=rng.randrange(50, 400, 25),
+            er_copay=rng.randrange(100, 500, 25),
+            urgent_copay=rng.randrange(25, 120, 5),
+            therapy_copay=rng.randrange(10, 60, 5),
+            virtual_mental_copay=rng.randrange(0, 40, 5),
+            deductible=rng.randrange(500, 5000, 250)
+        )
+        values['family_deductible'] = values['deductible'] * 2
+        values['oop_max'] = values['deductible'] + rng.randrange(1000, 6000, 500)
+        values['family_oop_max'] = values['oop_max'] * 2
+        values['riders'] = _riders(kind, sections, 6, rng)
+        return HEALTH_TEMPLATE.format(**values), values
+
+    values.update(
+        collision_deductible=rng.choice([250, 500, 750, 1000, 1500, 2000]),
+        collision_limit=rng.randrange(10, 100) * 1000,
+        comprehensive_deductible=rng.choice([100, 250, 500, 750, 1000]),
+        comprehensive_limit=rng.randrange(10, 100) * 1000,
+        bodily_person=rng.choice([25, 50, 100, 250, 500]) * 1000,
+        property_damage=rng.choice([25, 50, 100, 250]) * 1000,
+        claims_phone=f"1-800-555-{rng.randint(1000, 9999)}"
+    )
+    values['bodily_accident'] = values['bodily_person'] * 3
+    values['riders'] = _riders(kind, sections, 4, rng)
+    return AUTO_TEMPLATE.format(**values), values
+
+
+def generate_corpus(output: str, policies: int, sections: int = 0, questions_per_policy: int = 2, seed: int = 0) -> Dict[str, Any]:
+    """Write ``policies`` policy files (alternating health and auto) and ``workload.json``"""
+    rng = random.Random(seed)
+    directory = Path(output)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    files: List[str] = []
+    questions: List[Dict[str, Any]] = []
+    total_bytes = 0
+    for index in range(policies):
+        kind = 'health' if index % 2 == 0 else 'auto'
+        text, values = generate_policy(kind, index, sections, rng)
+        path = directory / f"{kind}_policy_{index:05d}.txt"
+        path.write_text(text)
+        files.append(str(path))
+        total_bytes += len(text)
+
+        templates = HEALTH_QUESTIONS if kind == 'health' else AUTO_QUESTIONS
+        for question, field, answer_format in rng.sample(templates, min(questions_per_policy, len(templates))):
+            questions.append({
+                'question': question.format(policy_number=values['policy_number']),
+                'answer': answer_format.format(values[field]),
+                'source': str(path),
+                'policy_type': kind,
+                'field': field
+            })
+
+    rng.shuffle(questions)
+    workload = {
+        'seed': seed,
+        'policies': policies,
+        'sections': sections,
+        'bytes': total_bytes,
+        'files': files,
+        'questions': questions
+    }
+    (directory / "workload.json").write_text(json.dumps(workload, indent=2))
+    return workload
+
+
+def load_workload(output: str) -> Dict[str, Any]:
+    return json.loads((Path(output) / "workload.json").read_text())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="bench_corpus")
+    parser.add_argument("--policies", type=int, default=1000)
+    parser.add_argument("--sections", type=int, default=0, help="extra rider sections per policy, to grow documents")
+    parser.add_argument("--questions-per-policy", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workload = generate_corpus(args.output, args.policies, args.sections, args.questions_per_policy, args.seed)
+    print(
+        f"Wrote {workload['policies']} policies ({workload['bytes'] / 1024:.0f} KiB) and "
+        f"{len(workload['questions'])} questions to {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
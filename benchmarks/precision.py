@@ -0,0 +1,164 @@
+# benchmarks/precision.py
+"""Compare LLM precision modes on the sample policies.
+
+For each mode the model is loaded in a fresh process and answers the same
+questions over the same retrieved context with greedy decoding. Reports
+load time, peak RSS, generation tokens/s and answer drift against fp32.
+
+    python -m benchmarks.precision --modes fp32,bf16,int8
+"""
+from typing import Dict, Any, List
+from pathlib import Path
+import argparse
+import copy
+import difflib
+import json
+import multiprocessing
+import resource
+import tempfile
+import time
+
+from src.agent.config import load_config
+from src.agent.document_processor import DocumentProcessor
+from src.agent.vector_store import VectorStore
+
+SAMPLE_DOCS = ["examples/sample_docs/health_policy.txt", "examples/sample_docs/auto_policy.txt"]
+
+QUESTIONS = [
+    "What is my primary care copay?",
+    "What's my prescription drug coverage?",
+    "How do I access virtual care?",
+    "What is my collision deductible?",
+    "What are my liability limits?",
+    "How do I file a claim?"
+]
+
+
+def retrieve_contexts(config: Dict[str, Any], config_path: str, questions: List[str]) -> List[List[Dict[str, Any]]]:
+    """Index the sample policies in a scratch store and retrieve context for each question"""
+    with tempfile.TemporaryDirectory() as persist_dir:
+        scratch_config = copy.deepcopy(config)
+        scratch_config.setdefault('vector_store', {})['persist_directory'] = persist_dir
+
+        processor = DocumentProcessor(config_path, scratch_config)
+        vector_store = VectorStore(config_path, scratch_config)
+        for path in SAMPLE_DOCS:
+            vector_store.add_documents(processor.process_document(path))
+        return vector_store.search_similar_batch(questions)
+
+
+def run_mode(config: Dict[str, Any],
+             precision: str,
+             questions: List[str],
+             contexts: List[List[Dict[str, Any]]],
+             queue: "multiprocessing.Queue"):
+    """Load the model in one precision mode and answer every question (runs in a child process)"""
+    import torch
+    from src.agent.llm_handler import LLMHandler
+
+    mode_config = copy.deepcopy(config)
+    llm_config = mode_config.setdefault('llm', {})
+    llm_config['precision'] = precision
+    llm_config['temperature'] = 0  # greedy decoding, so drift reflects the weights only
+    llm_config['scheduler'] = {'enabled': False}
+    llm_config['prefix_cache'] = {'enabled': False}
+
+    try:
+        handler = LLMHandler(mode_config)
+        started = time.perf_counter()
+        handler.warm_up()
+        load_ms = (time.perf_counter() - started) * 1000
+
+        loaded = handler._current()
+        answers = []
+        new_tokens = 0
+        generation_s = 0.0
+        for question, context_docs in zip(questions, contexts):
+            _, inputs = handler._prepare_inputs(question, context_docs, loaded)
+            started = time.perf_counter()
+            with torch.no_grad():
+                outputs = loaded.model.generate(
+                    **inputs,
+                    **handler._generation_kwargs(),
+                    pad_token_id=loaded.tokenizer.eos_token_id
+                )
+            generation_s += time.perf_counter() - started
+            # Encoder-decoder outputs hold only generated tokens
+            new_tokens += outputs.shape[1] - (0 if loaded.is_encoder_decoder else inputs['input_ids'].shape[1])
+            answers.append(handler._extract_answer(loaded.tokenizer.decode(outputs[0], skip_special_tokens=True)))
+
+        queue.put({
+            'precision': precision,
+            'resolved_precision': handler.precision,
+            'load_ms': load_ms,
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'new_tokens': int(new_tokens),
+            'tokens_per_s': new_tokens / generation_s if generation_s else 0.0,
+            'answers': answers
+        })
+    except Exception as e:
+        queue.put({'precision': precision, 'error': str(e)})
+
+
+def drift(baseline: List[str], answers: List[str]) -> Dict[str, float]:
+    """Exact-match rate and mean character similarity of answers against the baseline"""
+    ratios = [difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(baseline, answers)]
+    return {
+        'exact_match': sum(a == b for a, b in zip(baseline, answers)) / len(baseline),
+        'similarity': sum(ratios) / len(ratios)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--modes", default="fp32,bf16,int8", help="comma-separated llm.precision values")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--compile", action="store_true", help="also enable llm.compile")
+    parser.add_argument("--output", help="write the full results as JSON")
+    args = parser.parse_args()
+
+    config = copy.deepcopy(load_config(args.config))
+    config.setdefault('llm', {})['max_tokens'] = args.max_new_tokens
+    config['llm']['compile'] = args.compile
+
+    # fp32 is always measured first as the drift baseline
+    modes = ['fp32'] + [mode for mode in args.modes.split(",") if mode and mode != 'fp32']
+
+    print("Retrieving context for the sample questions...")
+    contexts = retrieve_contexts(config, args.config, QUESTIONS)
+
+    # A fresh process per mode keeps peak RSS and load time independent
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for mode in modes:
+        print(f"Running {mode}...")
+        queue = ctx.Queue()
+        process = ctx.Process(target=run_mode, args=(config, mode, QUESTIONS, contexts, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        results.append(result)
+
+    baseline = results[0].get('answers')
+    print(f"\n{'mode':<8} {'resolved':<9} {'load ms':>9} {'peak RSS MB':>12} {'tokens/s':>9} {'exact':>6} {'similar':>8}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['precision']:<8} error: {result['error']}")
+            continue
+        if baseline:
+            result['drift'] = drift(baseline, result['answers'])
+        score = result.get('drift', {'exact_match': float('nan'), 'similarity': float('nan')})
+        print(
+            f"{result['precision']:<8} {result['resolved_precision']:<9} {result['load_ms']:>9.0f} "
+            f"{result['peak_rss_mb']:>12.0f} {result['tokens_per_s']:>9.1f} "
+            f"{score['exact_match']:>6.2f} {score['similarity']:>8.3f}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({'questions': QUESTIONS, 'results': results}, indent=2))
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+# benchmarks/suite.py
+"""End-to-end benchmark of ingestion, retrieval and answering on a synthetic corpus.
+
+Generates (or reuses) a corpus from ``benchmarks.corpus`` and runs three
+phases against ``InsuranceAgent``, each in a fresh process so peak RSS
+is per phase:
+
+    ingest     documents/s, chunks/s and MB/s for the whole corpus
+    retrieval  per-question search latency and recall@k of the chunk that
+               holds the expected answer in the expected policy
+    answer     end-to-end answer latency and answer accuracy
+
+Latencies are reported as p50/p95/p99 in milliseconds and everything is
+written as JSON. With ``--baseline`` the run is compared against an
+earlier result and exits non-zero on a regression beyond
+``--tolerance``. ``--stub-llm`` selects the echo generator, which answers
+with the best-matching context line instead of running the model, and
+``--hash-embeddings`` the hash embedder, so the suite can run without
+downloading any weights. A baseline is only comparable when it was
+measured with the same backends, so the comparison is refused when
+those settings differ.
+
+    python -m benchmarks.suite --policies 1000 --stub-llm --hash-embeddings --output bench.json
+    python -m benchmarks.suite --policies 1000 --stub-llm --hash-embeddings --baseline bench.json
+"""
+from typing import Dict, Any, List
+from pathlib import Path
+from queue import Empty
+import argparse
+import copy
+import json
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+
+import yaml
+
+from src.agent.config import load_config
+from benchmarks.corpus import generate_corpus, load_workload
+
+# (phase, metric, direction): +1 means higher is better
+TRACKED_METRICS = [
+    ('ingest', 'chunks_per_s', 1),
+    ('retrieval', 'questions_per_s', 1),
+    ('retrieval', 'latency_ms_p95', -1),
+    ('retrieval', 'recall_at_k', 1),
+    ('answer', 'questions_per_s', 1),
+    ('answer', 'latency_ms_p95', -1),
+    ('answer', 'accuracy', 1)
+]
+
+# Settings that change what is measured; a baseline must match on all of them
+COMPARABLE_SETTINGS = ('stub_llm', 'hash_embeddings', 'embedding_model', 'backend')
+
+
+def scratch_config(config: Dict[str, Any],
+                   directory: str,
+                   max_new_tokens: int,
+                   stub_llm: bool = False,
+                   hash_embeddings: bool = False) -> str:
+    """Write a config storing everything under ``directory`` with response caching disabled"""
+    config = copy.deepcopy(config)
+    vector_config = config.setdefault('vector_store', {})
+    if hash_embeddings:
+        vector_config['embedding_backend'] = "hash"
+    vector_config['persist_directory'] = str(Path(directory) / "vectors")
+    vector_config['query_cache'] = {'enabled': False}
+    vector_config['embedding_store'] = {'enabled': True, 'cache_dir': str(Path(directory) / "embeddings")}
+    llm_config = config.setdefault('llm', {})
+    llm_config['max_tokens'] = max_new_tokens
+    llm_config['use_cache'] = False
+    llm_config['semantic_cache'] = {'enabled': False}
+    llm_config['scheduler'] = {'enabled': False}
+    if stub_llm:
+        llm_config['backend'] = "echo"
+    config.setdefault('agent', {})['warm_up'] = False
+
+    path = Path(directory) / "config.yaml"
+    path.write_text(yaml.safe_dump(config))
+    return str(path)
+
+
+def summarize(latencies_ms: List[float]) -> Dict[str, float]:
+    """Percentiles of per-question latencies"""
+    ordered = sorted(latencies_ms)
+    if not ordered:
+        return {}
+
+    def percentile(q: float) -> float:
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+    return {
+        'latency_ms_mean': sum(ordered) / len(ordered),
+        'latency_ms_p50': percentile(0.50),
+        'latency_ms_p95': percentile(0.95),
+        'latency_ms_p99': percentile(0.99)
+    }
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_ingest(config_path: str, files: List[str], queue: "multiprocessing.Queue"):
+    """Ingest the whole corpus (runs in a child process)"""
+    from src.agent.insurance_agent import InsuranceAgent
+
+    try:
+        agent = InsuranceAgent(config_path)
+        corpus_bytes = sum(Path(path).stat().st_size for path in files)
+        # Model loading is reported by the answer phase; ingestion is timed warm
+        agent.vector_store.warm_up()
+        started = time.perf_counter()
+        report = agent.process_documents(files)
+        elapsed_s = time.perf_counter() - started
+        queue.put({
+            'files': len(files),
+            'chunks_written': report['chunks_written'],
+            'elapsed_s': elapsed_s,
+            'docs_per_s': len(files) / elapsed_s,
+            'chunks_per_s': report['chunks_written'] / elapsed_s,
+            'mb_per_s': corpus_bytes / 1024 ** 2 / elapsed_s,
+            'peak_rss_mb': peak_rss_mb(),
+            'report': report
+        })
+    except Exception as e:
+        queue.put({'error': str(e)})
+
+
+def _holds_answer(doc: Dict[str, Any], question: Dict[str, Any]) -> bool:
+    return (
+        Path(doc.get('metadata', {}).get('source', '')).name == Path(question['source']).name
+        and question['answer'] in doc.get('content', '')
+    )
+
+
+def run_retrieval(config_path: str, questions: List[Dict[str, Any]], k: int, queue: "multiprocessing.Queue"):
+    """Search for every question and score recall@k (runs in a child process)"""
+    from src.agent.insurance_agent import InsuranceAgent
+
+    try:
+        agent = InsuranceAgent(config_path)
+        agent.vector_store.warm_up()
+        agent.vector_store.search_similar(questions[0]['question'], n_results=k)
+
+        latencies = []
+        found = 0
+        started = time.perf_counter()
+        for question in questions:
+            question_started = time.perf_counter()
+            hits = agent.vector_store.search_similar(question['question'], n_results=k)
+            latencies.append((time.perf_counter() - question_started) * 1000)
+            found += any(_holds_answer(hit, question) for hit in hits)
+        elapsed_s = time.perf_counter() - started
+
+        queue.put({
+            'questions': len(questions),
+            'k': k,
+            'questions_per_s': len(questions) / elapsed_s,
+            **summarize(latencies),
+            'recall_at_k': found / len(questions),
+            'peak_rss_mb': peak_rss_mb()
+        })
+    except Exception as e:
+        queue.put({'error': str(e)})
+
+
+def run_answer(config_path: str, questions: List[Dict[str, Any]], queue: "multiprocessing.Queue"):
+    """Answer every question end to end and score accuracy (runs in a child process)"""
+    from src.agent.insurance_agent import InsuranceAgent
+
+    try:
+        agent = InsuranceAgent(config_path)
+        load_started = time.perf_counter()
+        agent.warm_up(background=False)
+        load_s = time.perf_counter() - load_started
+
+        latencies = []
+        correct = 0
+        sources: Dict[str, int] = {}
+        started = time.perf_counter()
+        for question in questions:
+            question_started = time.perf_counter()
+            result = agent.answer_question(question['question'])
+            latencies.append((time.perf_counter() - question_started) * 1000)
+            correct += question['answer'] in result['response']
+            source = result.get('answered_from', 'cache' if result.get('cached') else 'llm')
+            sources[source] = sources.get(source, 0) + 1
+        elapsed_s = time.perf_counter() - started
+
+        queue.put({
+            'questions': len(questions),
+            'llm_backend': agent.llm_handler.backend,
+            'load_s': load_s,
+            'questions_per_s': len(questions) / elapsed_s,
+            **summarize(latencies),
+            'accuracy': correct / len(questions),
+            'answered_from': sources,
+            'peak_rss_mb': peak_rss_mb()
+        })
+    except Exception as e:
+        queue.put({'error': str(e)})
+
+
+def run_phase(target, *args, poll_s: float = 1.0) -> Dict[str, Any]:
+    """Run one phase in a fresh spawned process so model loads and peak RSS stay independent.
+
+    A process that dies without reporting, or exits non-zero, yields
+    ``{'error': 'exit <code>'}`` instead of blocking the suite.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=target, args=(*args, queue))
+    process.start()
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=poll_s)
+        except Empty:
+            if not process.is_alive():
+                # The result may have been flushed just before the process exited
+                try:
+                    result = queue.get(timeout=poll_s)
+                except Empty:
+                    break
+    process.join()
+    if result is None or (process.exitcode != 0 and 'error' not in result):
+        return {'error': f"exit {process.exitcode}"}
+    return result
+
+
+def settings_mismatch(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Comparable settings that differ between a run and its baseline"""
+    current, previous = results.get('settings', {}), baseline.get('settings', {})
+    return [
+        f"{key}: {previous.get(key)!r} in the baseline, {current.get(key)!r} now"
+        for key in COMPARABLE_SETTINGS
+        if current.get(key) != previous.get(key)
+    ]
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Failed phases, and tracked metrics that got worse than the baseline by more than ``tolerance`` (relative)"""
+    regressions = [
+        f"{phase}: failed ({results[phase]['error']})"
+        for phase in ('ingest', 'retrieval', 'answer')
+        if 'error' in results.get(phase, {})
+    ]
+    for phase, metric, direction in TRACKED_METRICS:
+        current = results.get(phase, {}).get(metric)
+        previous = baseline.get(phase, {}).get(metric)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous * direction
+        if change < -tolerance:
+            regressions.append(f"{phase}.{metric}: {previous:.4g} -> {current:.4g} ({change * 100:+.1f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--corpus", help="existing corpus directory from benchmarks.corpus; generated when omitted")
+    parser.add_argument("--policies", type=int, default=200)
+    parser.add_argument("--sections", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--retrieval-questions", type=int, default=500)
+    parser.add_argument("--answer-questions", type=int, default=50)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--stub-llm", action="store_true", help="answer with the echo generator instead of loading a model")
+    parser.add_argument("--hash-embeddings", action="store_true", help="embed with the hash backend instead of loading a model")
+    parser.add_argument("--phases", default="ingest,retrieval,answer")
+    parser.add_argument("--workdir", help="keep the vector store and corpus here instead of a temporary directory")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="earlier --output JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="relative regression allowed per tracked metric")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    phases = [phase for phase in args.phases.split(",") if phase]
+
+    with tempfile.TemporaryDirectory() as temporary:
+        workdir = Path(args.workdir or temporary)
+        workdir.mkdir(parents=True, exist_ok=True)
+        if args.corpus:
+            workload = load_workload(args.corpus)
+        else:
+            print(f"Generating {args.policies} policies...")
+            workload = generate_corpus(str(workdir / "corpus"), args.policies, args.sections, seed=args.seed)
+        config_path = scratch_config(config, str(workdir), args.max_new_tokens, args.stub_llm, args.hash_embeddings)
+        questions = workload['questions']
+
+        results: Dict[str, Any] = {
+            'version': config.get('agent', {}).get('version'),
+            'corpus': {key: workload[key] for key in ('seed', 'policies', 'sections', 'bytes')},
+            'settings': {
+                'k': args.k,
+                'stub_llm': args.stub_llm,
+                'hash_embeddings': args.hash_embeddings,
+                'max_new_tokens': args.max_new_tokens,
+                'backend': config.get('vector_store', {}).get('backend', 'chroma'),
+                'embedding_model': "hash" if args.hash_embeddings else config.get('vector_store', {}).get('embedding_model')
+            }
+        }
+        if 'ingest' in phases:
+            print("Ingesting...")
+            results['ingest'] = run_phase(run_ingest, config_path, workload['files'])
+        if 'retrieval' in phases:
+            print("Measuring retrieval...")
+            results['retrieval'] = run_phase(run_retrieval, config_path, questions[:args.retrieval_questions], args.k)
+        if 'answer' in phases:
+            print("Measuring answers...")
+            results['answer'] = run_phase(run_answer, config_path, questions[:args.answer_questions])
+
+    for phase in ('ingest', 'retrieval', 'answer'):
+        if phase in results:
+            summary = {key: value for key, value in results[phase].items() if key != 'report'}
+            print(f"\n{phase}: {json.dumps(summary, indent=2, default=str)}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, default=str))
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        mismatched = settings_mismatch(results, baseline)
+        if mismatched:
+            print("\nNot comparing against a baseline measured with different settings:")
+            for mismatch in mismatched:
+                print(f"  {mismatch}")
+            sys.exit(2)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+    else:
+        failed = [phase for phase in ('ingest', 'retrieval', 'answer') if 'error' in results.get(phase, {})]
+        if failed:
+            print(f"\nFailed phases: {', '.join(failed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
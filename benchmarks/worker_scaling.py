@@ -0,0 +1,188 @@
+# benchmarks/worker_scaling.py
+"""Measure aggregate questions/s of the pre-fork worker pool against worker count.
+
+The sample policies are indexed once into a scratch store, then each worker
+count runs in a fresh process: the pool loads the models, forks, and a
+fixed set of questions is answered by concurrent callers. Response caches
+and field answers are disabled so every question reaches retrieval and
+generation. Worker count 0 is the single-process baseline, answering on
+threads with all cores given to torch. Summed PSS across the processes
+shows how much of the model the workers actually share.
+
+    python -m benchmarks.worker_scaling --workers 0,1,2,4,8,16 --questions 64
+"""
+from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import yaml
+
+from src.agent.config import load_config
+
+SAMPLE_DOCS = ["examples/sample_docs/health_policy.txt", "examples/sample_docs/auto_policy.txt"]
+
+QUESTIONS = [
+    "What is my primary care copay?",
+    "What's my prescription drug coverage?",
+    "How do I access virtual care?",
+    "What is my collision deductible?",
+    "What are my liability limits?",
+    "How do I file a claim?"
+]
+
+
+def scratch_config(config: Dict[str, Any], directory: str, max_new_tokens: int) -> str:
+    """Write a config that stores everything under ``directory`` and disables answer caching"""
+    config = copy.deepcopy(config)
+    vector_config = config.setdefault('vector_store', {})
+    vector_config['persist_directory'] = str(Path(directory) / "vectors")
+    vector_config['query_cache'] = {'enabled': False}
+    vector_config['embedding_store'] = {'enabled': True, 'cache_dir': str(Path(directory) / "embeddings")}
+    llm_config = config.setdefault('llm', {})
+    llm_config['max_tokens'] = max_new_tokens
+    llm_config['use_cache'] = False
+    llm_config['semantic_cache'] = {'enabled': False}
+    llm_config['scheduler'] = {'enabled': False}
+    config['field_index'] = {'enabled': False}
+    config.setdefault('agent', {})['warm_up'] = False
+
+    path = Path(directory) / "config.yaml"
+    path.write_text(yaml.safe_dump(config))
+    return str(path)
+
+
+def ingest(config_path: str):
+    """Index the sample policies (runs in a child process)"""
+    from src.agent.insurance_agent import InsuranceAgent
+    InsuranceAgent(config_path).process_documents(SAMPLE_DOCS)
+
+
+def memory_mb(pids: List[int]) -> Dict[str, float]:
+    """Summed RSS and PSS of the given processes, from /proc (Linux only)"""
+    totals = {'rss_mb': 0.0, 'pss_mb': 0.0}
+    for pid in pids:
+        try:
+            for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+                name, _, value = line.partition(':')
+                if name in ('Rss', 'Pss'):
+                    totals[f"{name.lower()}_mb"] += int(value.split()[0]) / 1024
+        except OSError:
+            return {}
+    return totals
+
+
+def run_workers(config_path: str, workers: int, questions: List[str], queue: "multiprocessing.Queue"):
+    """Answer every question with ``workers`` forked workers, or in-process for 0 (runs in a child process)"""
+    import torch
+    from src.agent.insurance_agent import InsuranceAgent
+    from src.agent.worker_pool import WorkerPool
+
+    try:
+        agent = InsuranceAgent(config_path)
+        cores = os.cpu_count() or 1
+        if workers:
+            pool = WorkerPool(agent, workers=workers)
+            started = time.perf_counter()
+            pool.start()
+            answerer = pool
+            callers = workers * 2
+        else:
+            torch.set_num_threads(cores)
+            started = time.perf_counter()
+            agent.warm_up(background=False)
+            answerer = agent
+            callers = 2
+        start_s = time.perf_counter() - started
+
+        # One untimed question per caller settles lazy loads in every worker
+        with ThreadPoolExecutor(max_workers=callers) as executor:
+            list(executor.map(answerer.answer_question, questions[:callers]))
+
+            latencies = []
+
+            def timed(question: str):
+                question_started = time.perf_counter()
+                answerer.answer_question(question)
+                latencies.append((time.perf_counter() - question_started) * 1000)
+
+            started = time.perf_counter()
+            list(executor.map(timed, questions))
+            elapsed_s = time.perf_counter() - started
+
+        pids = [os.getpid()] + ([pool.zygote.pid] + [worker.pid for worker in pool.pool] if workers else [])
+        memory = memory_mb(pids)
+        if workers:
+            pool.close()
+
+        latencies.sort()
+        queue.put({
+            'workers': workers,
+            'threads_per_worker': pool.threads_per_worker if workers else cores,
+            'start_s': start_s,
+            'questions': len(questions),
+            'questions_per_s': len(questions) / elapsed_s,
+            'latency_ms_p50': latencies[len(latencies) // 2],
+            'latency_ms_p95': latencies[int(len(latencies) * 0.95)],
+            **memory
+        })
+    except Exception as e:
+        queue.put({'workers': workers, 'error': str(e)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--workers", default="0,1,2,4,8", help="comma-separated worker counts; 0 is the in-process baseline")
+    parser.add_argument("--questions", type=int, default=64)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--output", help="write the full results as JSON")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.questions)]
+
+    # A fresh spawned process per run keeps model loads and OpenMP state independent
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = scratch_config(config, directory, args.max_new_tokens)
+        print("Indexing the sample policies...")
+        process = ctx.Process(target=ingest, args=(config_path,))
+        process.start()
+        process.join()
+
+        for workers in [int(value) for value in args.workers.split(",") if value]:
+            print(f"Running {workers or 'in-process'} workers...")
+            queue = ctx.Queue()
+            process = ctx.Process(target=run_workers, args=(config_path, workers, questions, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            results.append(result)
+
+    baseline = next((result['questions_per_s'] for result in results if 'error' not in result), None)
+    print(f"\n{'workers':>8} {'threads':>8} {'q/s':>8} {'speedup':>8} {'p50 ms':>9} {'p95 ms':>9} {'RSS MB':>8} {'PSS MB':>8}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['workers']:>8} error: {result['error']}")
+            continue
+        print(
+            f"{result['workers']:>8} {result['threads_per_worker']:>8} {result['questions_per_s']:>8.2f} "
+            f"{result['questions_per_s'] / baseline:>7.2f}x {result['latency_ms_p50']:>9.1f} {result['latency_ms_p95']:>9.1f} "
+            f"{result.get('rss_mb', 0.0):>8.0f} {result.get('pss_mb', 0.0):>8.0f}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({'questions': args.questions, 'results': results}, indent=2))
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
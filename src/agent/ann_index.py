@@ -0,0 +1,278 @@
+# src/agent/ann_index.py
+from typing import Dict, Any, List, Optional, Tuple
+from pathlib import Path
+import os
+import threading
+import numpy as np
+from loguru import logger
+
+# Rows assigned to centroids per block; bounds the (rows x centroids) distance matrix
+ASSIGN_BLOCK_ROWS = 16384
+PQ_CODEWORDS = 256
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid (L2) for each vector"""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        # argmin ||x - c||^2 == argmax 2 x.c - ||c||^2
+        assignment[start:start + len(block)] = np.argmax(2 * block @ centroids.T - centroid_norms, axis=1)
+    return assignment
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means; empty clusters are reseeded from random points"""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+
+    assignment = None
+    for _ in range(iterations):
+        new_assignment = _nearest(vectors, centroids)
+        if assignment is not None and np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+
+        # Per-cluster means from one sort instead of a scatter-add per row
+        order = np.argsort(assignment, kind='stable')
+        sorted_assignment = assignment[order]
+        starts = np.flatnonzero(np.r_[True, sorted_assignment[1:] != sorted_assignment[:-1]])
+        clusters = sorted_assignment[starts]
+        counts = np.diff(np.r_[starts, len(order)])
+        centroids[clusters] = np.add.reduceat(vectors[order], starts, axis=0) / counts[:, None]
+
+        empty = np.ones(k, dtype=bool)
+        empty[clusters] = False
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file ANN index over the rows of a vector segment.
+
+    A coarse k-means quantizer splits rows into ``nlist`` inverted lists,
+    and a search scans only the ``nprobe`` lists closest to the query. With
+    ``pq_m`` > 0 each row's residual is product-quantized into ``pq_m``
+    one-byte codes; candidates are then ranked by the approximate inner
+    product and only the best ``refine * k`` are rescored against the full
+    vectors. Vectors are expected L2-normalized, so inner product is cosine
+    similarity.
+
+    New rows are assigned to the existing centroids, so adds never retrain;
+    rows that are re-added are removed from their old list first, so each
+    row appears in exactly one list. Candidate gathering holds a lock;
+    scoring does not.
+    """
+
+    def __init__(self, nlist: int = 1024, nprobe: int = 16, pq_m: int = 0, refine: int = 4, seed: int = 0):
+        self.nlist = int(nlist)
+        self.nprobe = int(nprobe)
+        self.pq_m = int(pq_m)
+        self.refine = max(int(refine), 1)
+        self.seed = seed
+        self.lock = threading.Lock()
+
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None  # (pq_m, codewords, dim / pq_m)
+        self.assign = np.full(0, -1, dtype=np.int32)
+        self.codes = np.zeros((0, max(self.pq_m, 1)), dtype=np.uint8)
+        self.lists: List[List[np.ndarray]] = []
+        self.indexed_rows = 0
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, sample: np.ndarray):
+        """Fit the coarse quantizer (and PQ codebooks) on a sample of vectors"""
+        sample = np.asarray(sample, dtype=np.float32)
+        self.centroids = kmeans(sample, self.nlist, seed=self.seed)
+        self.lists = [[] for _ in range(len(self.centroids))]
+
+        if self.pq_m:
+            dim = sample.shape[1]
+            if dim % self.pq_m:
+                raise ValueError(f"pq_m={self.pq_m} must divide the embedding dimension {dim}")
+            residuals = sample - self.centroids[_nearest(sample, self.centroids)]
+            sub_dim = dim // self.pq_m
+            self.codebooks = np.stack([
+                kmeans(residuals[:, j * sub_dim:(j + 1) * sub_dim], PQ_CODEWORDS, seed=self.seed + j + 1)
+                for j in range(self.pq_m)
+            ])
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        sub_dim = residuals.shape[1] // self.pq_m
+        return np.stack([
+            _nearest(residuals[:, j * sub_dim:(j + 1) * sub_dim], self.codebooks[j])
+            for j in range(self.pq_m)
+        ], axis=1).astype(np.uint8)
+
+    def add(self, rows: np.ndarray, vectors: np.ndarray):
+        """Assign rows to their nearest list; rows already present are moved"""
+        rows = np.asarray(rows, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(rows):
+            return
+        assignment = _nearest(vectors, self.centroids)
+        codes = self._encode(vectors - self.centroids[assignment]) if self.pq_m else None
+
+        with self.lock:
+            needed = int(rows.max()) + 1
+            if needed > len(self.assign):
+                capacity = max(needed, len(self.assign) * 2)
+                grown = np.full(capacity, -1, dtype=np.int32)
+                grown[:len(self.assign)] = self.assign
+                self.assign = grown
+                if self.pq_m:
+                    grown_codes = np.zeros((capacity, self.pq_m), dtype=np.uint8)
+                    grown_codes[:len(self.codes)] = self.codes
+                    self.codes = grown_codes
+            # Re-added rows leave their old list, even when they land in the same one again
+            previous = self.assign[rows]
+            present = previous >= 0
+            if present.any():
+                for list_id in np.unique(previous[present]):
+                    chunks = self.lists[list_id]
+                    listed = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+                    self.lists[list_id] = [listed[~np.isin(listed, rows[previous == list_id])]]
+
+            self.assign[rows] = assignment
+            if self.pq_m:
+                self.codes[rows] = codes
+
+            order = np.argsort(assignment, kind='stable')
+            boundaries = np.flatnonzero(np.diff(assignment[order])) + 1
+            for group in np.split(order, boundaries):
+                self.lists[assignment[group[0]]].append(rows[group])
+            self.indexed_rows = max(self.indexed_rows, needed)
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Rows in the ``nprobe`` lists closest to the query"""
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        closeness = 2 * self.centroids @ query - (self.centroids ** 2).sum(axis=1)
+        probed = np.argpartition(-closeness, nprobe - 1)[:nprobe]
+
+        found = []
+        with self.lock:
+            for list_id in probed:
+                chunks = self.lists[list_id]
+                if not chunks:
+                    continue
+                if len(chunks) > 1:
+                    # Compact the list so later probes concatenate nothing
+                    chunks[:] = [np.concatenate(chunks)]
+                found.append(chunks[0])
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def search(self,
+               query: np.ndarray,
+               k: int,
+               vectors: np.ndarray,
+               nprobe: Optional[int] = None,
+               exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k rows and their exact similarities, best first.
+
+        ``vectors`` is the full-precision segment the rows index into; it
+        is only read at the candidate rows.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        rows = self.candidates(query, nprobe)
+        if exclude is not None and len(exclude):
+            rows = rows[~np.isin(rows, exclude)]
+        if not len(rows):
+            return rows, np.zeros(0, dtype=np.float32)
+
+        if self.pq_m and len(rows) > self.refine * k:
+            # Asymmetric distance: exact query against PQ-coded residuals
+            sub_dim = len(query) // self.pq_m
+            tables = np.einsum('mcd,md->mc', self.codebooks, query.reshape(self.pq_m, sub_dim))
+            approx = self.centroids[self.assign[rows]] @ query
+            approx += tables[np.arange(self.pq_m), self.codes[rows]].sum(axis=1)
+            shortlist = self.refine * k
+            rows = rows[np.argpartition(-approx, shortlist - 1)[:shortlist]]
+
+        rows = np.sort(rows)  # sequential reads from the mapped segment
+        scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return rows[top], scores[top]
+
+    def save(self, path: str):
+        """Atomically write the trained index"""
+        try:
+            path = Path(path)
+            tmp_path = path.with_suffix('.tmp.npz')
+            np.savez(
+                tmp_path,
+                centroids=self.centroids,
+                codebooks=self.codebooks if self.codebooks is not None else np.zeros(0, dtype=np.float32),
+                assign=self.assign[:self.indexed_rows],
+                codes=self.codes[:self.indexed_rows] if self.pq_m else np.zeros((0, 1), dtype=np.uint8),
+                params=np.array([self.nlist, self.pq_m], dtype=np.int64)
+            )
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Error saving ANN index: {str(e)}")
+            raise
+
+    def load(self, path: str) -> bool:
+        """Load a saved index built with the same parameters; returns False if there is none"""
+        path = Path(path)
+        if not path.exists():
+            return False
+        arrays = np.load(path)
+        if list(arrays['params']) != [self.nlist, self.pq_m]:
+            logger.info(f"ANN index at {path} was built with different parameters, retraining")
+            return False
+
+        self.centroids = arrays['centroids']
+        self.codebooks = arrays['codebooks'] if self.pq_m else None
+        self.assign = arrays['assign'].astype(np.int32)
+        self.codes = arrays['codes'] if self.pq_m else np.zeros((0, 1), dtype=np.uint8)
+        self.indexed_rows = len(self.assign)
+        self._rebuild_lists()
+        return True
+
+    def renumbered(self, keep: np.ndarray) -> 'IVFIndex':
+        """Copy of the index for a compacted segment whose row ``i`` was row ``keep[i]``.
+
+        ``keep`` must be sorted; kept rows that were never indexed stay unindexed.
+        """
+        keep = np.asarray(keep, dtype=np.int64)
+        index = IVFIndex(self.nlist, self.nprobe, self.pq_m, self.refine, self.seed)
+        index.centroids = self.centroids
+        index.codebooks = self.codebooks
+        with self.lock:
+            index.indexed_rows = int(np.searchsorted(keep, self.indexed_rows))
+            indexed = keep[:index.indexed_rows]
+            index.assign = self.assign[indexed]
+            index.codes = self.codes[indexed] if self.pq_m else index.codes
+        index._rebuild_lists()
+        return index
+
+    def _rebuild_lists(self):
+        """Rebuild the inverted lists from the row assignments"""
+        self.lists = [[] for _ in range(len(self.centroids))]
+        assigned = np.flatnonzero(self.assign >= 0)
+        order = assigned[np.argsort(self.assign[assigned], kind='stable')]
+        if len(order):
+            boundaries = np.flatnonzero(np.diff(self.assign[order])) + 1
+            for group in np.split(order, boundaries):
+                self.lists[self.assign[group[0]]].append(group.astype(np.int64))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index shape and list balance"""
+        sizes = [sum(len(chunk) for chunk in chunks) for chunks in self.lists]
+        return {
+            'trained': self.trained,
+            'nlist': len(self.centroids) if self.trained else self.nlist,
+            'nprobe': self.nprobe,
+            'pq_m': self.pq_m,
+            'indexed_rows': self.indexed_rows,
+            'largest_list': max(sizes) if sizes else 0
+        }
@@ -0,0 +1,176 @@
+# src/agent/backends.py
+from typing import Dict, Any, List, Iterator, Optional
+import hashlib
+import time
+import numpy as np
+from loguru import logger
+from .field_index import content_tokens
+from .keyword_index import tokenize
+from .metrics import metrics
+
+# Generators that need no model download; "transformers" loads llm.model as usual
+GENERATOR_BACKENDS = ("echo", "fixed_latency")
+EMBEDDING_BACKENDS = ("sentence_transformers", "hash")
+
+
+class HashEmbeddingFunction:
+    """Deterministic embeddings by feature hashing of the index terms.
+
+    Each term adds +1 or -1 to one of ``dim`` buckets picked by a keyed
+    BLAKE2 hash, and the vector is L2-normalized. Texts sharing words get a
+    positive cosine similarity, so retrieval still ranks sensibly, with no
+    model and no network. Vectors are the same in every process and run.
+    """
+
+    def __init__(self, dim: int = 384):
+        if dim <= 0:
+            raise ValueError(f"Hash embedding dimension must be positive, got {dim}")
+        self.dim = dim
+        self.model_name = f"hash-{dim}"
+        self._buckets: Dict[str, tuple] = {}
+
+    def _bucket(self, term: str) -> tuple:
+        bucket = self._buckets.get(term)
+        if bucket is None:
+            value = int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), 'little')
+            bucket = self._buckets[term] = (value % self.dim, 1.0 if value >> 63 else -1.0)
+        return bucket
+
+    def embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for term in tokenize(text):
+            index, sign = self._bucket(term)
+            vector[index] += sign
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return [self.embed(text) for text in input]
+
+
+class EchoGenerator:
+    """Answers with the context line that best matches the question, without a model.
+
+    Lines are scored by the content words they share with the question; a
+    ``- Copay: $25 per visit`` line also counts the words of the numbered
+    heading above it. Identifiers and "policy" are ignored so the policy
+    header never wins. Answers take microseconds, so the retrieval, cache
+    and scheduling layers dominate whatever is measured.
+    """
+
+    prefix = "Based on the policy information provided: "
+
+    @staticmethod
+    def _words(text: str) -> frozenset:
+        return frozenset(word for word in content_tokens(text) if word != 'policy' and not any(c.isdigit() for c in word))
+
+    def answer(self, question: str, context_docs: List[Dict[str, Any]]) -> str:
+        question_words = self._words(question)
+        best_line, best_overlap = "", -1
+        for doc in context_docs:
+            heading_words = frozenset()
+            for line in doc['content'].splitlines():
+                line = line.strip()
+                words = self._words(line)
+                if line.startswith('-'):
+                    words |= heading_words
+                else:
+                    heading_words = words
+                overlap = len(question_words & words)
+                if overlap > best_overlap:
+                    best_line, best_overlap = line.strip(" -"), overlap
+        return f"{self.prefix}{best_line}"
+
+    def generate(self, questions: List[str], context_docs_list: List[List[Dict[str, Any]]]) -> List[str]:
+        """Answer one batch"""
+        return [self.answer(question, docs) for question, docs in zip(questions, context_docs_list)]
+
+    def stream(self, question: str, context_docs: List[Dict[str, Any]]) -> Iterator[str]:
+        """Yield the answer word by word"""
+        words = self.answer(question, context_docs).split(" ")
+        for index, word in enumerate(words):
+            yield word if index == len(words) - 1 else word + " "
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'backend': 'echo'}
+
+
+class FixedLatencyGenerator(EchoGenerator):
+    """Echo answers delivered after a fixed, configurable generation time.
+
+    Every generate call sleeps ``prefill_ms`` plus ``per_token_ms`` for
+    each of ``tokens`` tokens, whatever the batch size, like a batched
+    decode on an accelerator with room to spare. Micro-batching therefore
+    shows up as throughput, and queueing, admission control and timeouts
+    can be exercised with realistic waits but no CPU load. Prefill and
+    decode are recorded as stages, as the model path does.
+    """
+
+    def __init__(self, prefill_ms: float = 50.0, per_token_ms: float = 20.0, tokens: int = 32):
+        self.prefill_s = max(float(prefill_ms), 0.0) / 1000
+        self.per_token_s = max(float(per_token_ms), 0.0) / 1000
+        self.tokens = max(int(tokens), 1)
+        self.calls = 0
+
+    def _simulate(self, batch_size: int):
+        self.calls += 1
+        decode_s = self.per_token_s * self.tokens
+        time.sleep(self.prefill_s + decode_s)
+        if metrics.enabled:
+            metrics.record_stage('prefill', self.prefill_s)
+            metrics.record_stage('decode', decode_s)
+            metrics.increment('rag_generated_tokens_total', self.tokens * batch_size)
+
+    def generate(self, questions: List[str], context_docs_list: List[List[Dict[str, Any]]]) -> List[str]:
+        self._simulate(len(questions))
+        return super().generate(questions, context_docs_list)
+
+    def stream(self, question: str, context_docs: List[Dict[str, Any]]) -> Iterator[str]:
+        """Yield the answer word by word, the first after prefill and then one per token interval"""
+        self.calls += 1
+        time.sleep(self.prefill_s)
+        for piece in super().stream(question, context_docs):
+            yield piece
+            time.sleep(self.per_token_s)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'backend': 'fixed_latency',
+            'prefill_ms': self.prefill_s * 1000,
+            'per_token_ms': self.per_token_s * 1000,
+            'tokens': self.tokens,
+            'calls': self.calls
+        }
+
+
+def create_generator(config: Dict[str, Any]) -> Optional[EchoGenerator]:
+    """Model-free generator for ``llm.backend``, or None for the transformers backend"""
+    llm_config = config.get('llm', {})
+    backend = llm_config.get('backend', "transformers")
+    if backend == "transformers":
+        return None
+    if backend == "echo":
+        generator = EchoGenerator()
+    elif backend == "fixed_latency":
+        latency_config = llm_config.get('fixed_latency', {}) or {}
+        generator = FixedLatencyGenerator(
+            prefill_ms=latency_config.get('prefill_ms', 50),
+            per_token_ms=latency_config.get('per_token_ms', 20),
+            tokens=latency_config.get('tokens', 32)
+        )
+    else:
+        raise ValueError(f"Unsupported LLM backend: {backend}")
+    logger.info(f"Using the {backend} generator; no model will be loaded")
+    return generator
+
+
+def create_embedding_function(vector_config: Dict[str, Any]) -> Optional[HashEmbeddingFunction]:
+    """Model-free embedder for ``vector_store.embedding_backend``, or None for sentence-transformers"""
+    backend = vector_config.get('embedding_backend', "sentence_transformers")
+    if backend == "sentence_transformers":
+        return None
+    if backend == "hash":
+        return HashEmbeddingFunction(int(vector_config.get('embedding_dim', 384)))
+    raise ValueError(f"Unsupported embedding backend: {backend}")
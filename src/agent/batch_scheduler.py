@@ -0,0 +1,166 @@
+# src/agent/batch_scheduler.py
+from typing import Dict, Any, List, Optional, Tuple
+from collections import Counter, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import queue
+import threading
+import time
+from loguru import logger
+
+# Sentinel that tells the scheduler thread to exit
+_STOP = object()
+
+
+class GenerationUnavailable(RuntimeError):
+    """Generation was not attempted: the queue was full or the wait timed out.
+
+    This is a capacity condition, not an answer; callers should report it
+    as such (the server maps it to 503) and never cache it.
+    """
+
+
+class GenerationScheduler:
+    """Dynamic micro-batching in front of LLMHandler generation.
+
+    Callers submit single generation requests and receive futures. A
+    background thread drains the queue into micro-batches, closing a batch
+    once it holds ``max_batch_size`` requests or its oldest request has
+    waited ``max_wait_ms``, and runs one padded generate per batch.
+    """
+
+    def __init__(self,
+                 llm_handler,
+                 max_batch_size: int = 8,
+                 max_wait_ms: float = 20.0,
+                 max_queue_size: int = 0,
+                 timeout_s: float = 0.0):
+        self.llm_handler = llm_handler
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000
+        self.timeout_s = max(float(timeout_s), 0.0)
+        self.queue: "queue.Queue" = queue.Queue(maxsize=int(max_queue_size))
+
+        # Tuning statistics
+        self.stats_lock = threading.Lock()
+        self.batch_size_histogram: Counter = Counter()
+        self.queue_depth_histogram: Counter = Counter()
+        self.queue_wait_ms: deque = deque(maxlen=1024)
+        self.requests = 0
+        self.batches = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+        self.thread = threading.Thread(target=self._run, name="generation-scheduler", daemon=True)
+        self.thread.start()
+        logger.info(f"GenerationScheduler started (max_batch_size={self.max_batch_size}, max_wait_ms={max_wait_ms})")
+
+    def submit(self, question: str, context_docs: List[Dict[str, Any]]) -> Future:
+        """Queue a generation request and return a future for its response"""
+        future: Future = Future()
+        try:
+            self.queue.put_nowait((question, context_docs, future, time.perf_counter()))
+        except queue.Full:
+            with self.stats_lock:
+                self.rejected += 1
+            raise GenerationUnavailable("Generation queue is full")
+        return future
+
+    def generate(self, question: str, context_docs: List[Dict[str, Any]]) -> str:
+        """Submit a request and wait for its response, at most ``timeout_s`` when set"""
+        future = self.submit(question, context_docs)
+        try:
+            return future.result(timeout=self.timeout_s or None)
+        except FutureTimeoutError:
+            # A request still in the queue is dropped; one already generating finishes unseen
+            future.cancel()
+            with self.stats_lock:
+                self.timeouts += 1
+            raise GenerationUnavailable(f"Generation did not finish within {self.timeout_s:g}s")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the scheduler thread after the queued requests are served"""
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+
+    def _collect_batch(self) -> Tuple[List[Tuple[str, List[Dict[str, Any]], Future, float]], bool]:
+        """Block for one request, then gather more until the batch is full or the wait expires"""
+        item = self.queue.get()
+        if item is _STOP:
+            return [], True
+
+        batch = [item]
+        deadline = item[3] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        """Scheduler loop: collect a micro-batch, generate, resolve futures"""
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect_batch()
+            if not batch:
+                continue
+
+            dispatched = time.perf_counter()
+            self._record_batch(batch, dispatched)
+
+            # Skip requests whose callers have already given up
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                responses = self.llm_handler.generate_responses(
+                    [item[0] for item in batch],
+                    [item[1] for item in batch]
+                )
+                for item, response in zip(batch, responses):
+                    item[2].set_result(response)
+            except Exception as e:
+                logger.error(f"Error generating scheduled batch: {str(e)}")
+                for item in batch:
+                    item[2].set_exception(e)
+
+    def _record_batch(self, batch: List[Tuple[str, List[Dict[str, Any]], Future, float]], dispatched: float):
+        """Update batch-size, queue-depth and queue-wait statistics"""
+        depth = self.queue.qsize()
+        # Power-of-two buckets keep the depth histogram small under load
+        bucket = 0 if depth == 0 else 1 << (depth - 1).bit_length()
+        with self.stats_lock:
+            self.requests += len(batch)
+            self.batches += 1
+            self.batch_size_histogram[len(batch)] += 1
+            self.queue_depth_histogram[bucket] += 1
+            self.queue_wait_ms.extend((dispatched - item[3]) * 1000 for item in batch)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue-depth and batch-size histograms plus queue-wait percentiles"""
+        with self.stats_lock:
+            waits = sorted(self.queue_wait_ms)
+
+            def percentile(p: float) -> float:
+                return waits[min(int(p * len(waits)), len(waits) - 1)] if waits else 0.0
+
+            return {
+                'requests': self.requests,
+                'batches': self.batches,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+                'batch_size_histogram': dict(sorted(self.batch_size_histogram.items())),
+                'queue_depth_histogram': dict(sorted(self.queue_depth_histogram.items())),
+                'queue_depth': self.queue.qsize(),
+                'queue_wait_ms_p50': percentile(0.50),
+                'queue_wait_ms_p95': percentile(0.95),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'timeout_s': self.timeout_s
+            }
@@ -0,0 +1,33 @@
+# src/agent/config.py
+from typing import Dict, Any, Tuple
+from pathlib import Path
+import threading
+import yaml
+from loguru import logger
+
+# Parsed configs keyed by resolved path, invalidated when the file changes
+_config_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_config_lock = threading.Lock()
+
+
+def load_config(config_path: str) -> Dict[str, Any]:
+    """Load configuration from YAML file, parsing each file once per process.
+
+    Every component loading the same path receives the same dict, so the
+    agent and its components share a single config object.
+    """
+    try:
+        resolved = str(Path(config_path).resolve())
+        mtime = Path(resolved).stat().st_mtime
+        with _config_lock:
+            cached = _config_cache.get(resolved)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+            with open(resolved, 'r') as f:
+                config = yaml.safe_load(f) or {}
+            _config_cache[resolved] = (mtime, config)
+            return config
+    except Exception as e:
+        logger.error(f"Error loading config: {str(e)}")
+        raise
@@ -0,0 +1,190 @@
+# src/agent/context_packer.py
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import threading
+from loguru import logger
+
+class ContextPacker:
+    """Packs retrieved chunks into the prompt's token budget.
+
+    Chunks are ranked by fused ``rrf_score`` when retrieval provides one
+    and otherwise by ``distance`` (closest first), chunks that mostly
+    repeat a better-ranked chunk from the same source are dropped, and the
+    rest are added greedily while they fit. The budget is the model's
+    context window minus the tokens reserved for generation and for the
+    fixed parts of the prompt, optionally capped by ``max_context_tokens``.
+    Token counts are cached per chunk so each chunk is tokenized once.
+    """
+
+    def __init__(self,
+                 context_window: int = 2048,
+                 max_context_tokens: Optional[int] = None,
+                 dedupe_overlap: float = 0.5,
+                 separator: str = "\n\n",
+                 max_cached_counts: int = 16384):
+        self.context_window = int(context_window)
+        self.max_context_tokens = int(max_context_tokens) if max_context_tokens else None
+        self.dedupe_overlap = float(dedupe_overlap)
+        self.separator = separator
+        self.max_cached_counts = int(max_cached_counts)
+        self.lock = threading.Lock()
+        self.token_counts: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+
+        # Counters
+        self.calls = 0
+        self.chunks_in = 0
+        self.chunks_packed = 0
+        self.chunks_deduped = 0
+        self.chunks_dropped = 0
+        self.chunks_truncated = 0
+
+    def budget(self, overhead_tokens: int, max_new_tokens: int, context_window: Optional[int] = None) -> int:
+        """Tokens available for context once the prompt and the answer are accounted for.
+
+        ``context_window`` is the model's own limit, applied when smaller
+        than the configured window.
+        """
+        window = min(self.context_window, context_window) if context_window else self.context_window
+        available = window - max_new_tokens - overhead_tokens
+        if self.max_context_tokens is not None:
+            available = min(available, self.max_context_tokens)
+        return max(available, 0)
+
+    def _rank_key(self, doc: Dict[str, Any]) -> float:
+        """Sort key of a chunk, best first"""
+        if doc.get('rrf_score') is not None:
+            return -doc['rrf_score']
+        return doc['distance'] if doc.get('distance') is not None else float('inf')
+
+    def _chunk_key(self, tokenizer, doc: Dict[str, Any]) -> Tuple[str, str]:
+        """Cache key of a chunk's token count for a given tokenizer"""
+        doc_key = doc.get('id') or hashlib.sha256(doc['content'].encode('utf-8')).hexdigest()
+        return getattr(tokenizer, 'name_or_path', ''), doc_key
+
+    def _count_tokens(self, tokenizer, docs: List[Dict[str, Any]]) -> List[int]:
+        """Token count of each chunk, tokenizing only chunks not seen before"""
+        keys = [self._chunk_key(tokenizer, doc) for doc in docs]
+        with self.lock:
+            counts = [self.token_counts.get(key) for key in keys]
+        missing = [idx for idx, count in enumerate(counts) if count is None]
+
+        if missing:
+            encoded = tokenizer([docs[idx]['content'] for idx in missing], add_special_tokens=False)
+            with self.lock:
+                for idx, ids in zip(missing, encoded['input_ids']):
+                    counts[idx] = len(ids)
+                    self.token_counts[keys[idx]] = len(ids)
+                while len(self.token_counts) > self.max_cached_counts:
+                    self.token_counts.popitem(last=False)
+        return counts
+
+    def _overlaps(self, doc: Dict[str, Any], kept: List[Dict[str, Any]]) -> bool:
+        """Whether a chunk mostly repeats text from an already kept chunk"""
+        metadata = doc.get('metadata') or {}
+        source = metadata.get('source')
+        start, end = metadata.get('start_offset'), metadata.get('end_offset')
+
+        for other in kept:
+            if other['content'] == doc['content']:
+                return True
+            other_metadata = other.get('metadata') or {}
+            if source is None or start is None or end is None or other_metadata.get('source') != source:
+                continue
+            other_start, other_end = other_metadata.get('start_offset'), other_metadata.get('end_offset')
+            if other_start is None or other_end is None:
+                continue
+
+            shared = min(end, other_end) - max(start, other_start)
+            shorter = min(end - start, other_end - other_start)
+            if shared > 0 and shorter > 0 and shared / shorter >= self.dedupe_overlap:
+                return True
+        return False
+
+    def _truncate(self, tokenizer, doc: Dict[str, Any], max_tokens: int) -> Dict[str, Any]:
+        """Cut a chunk down to its first ``max_tokens`` tokens"""
+        ids = tokenizer(doc['content'], add_special_tokens=False)['input_ids'][:max_tokens]
+        truncated = dict(doc)
+        truncated['content'] = tokenizer.decode(ids, skip_special_tokens=True)
+        truncated['truncated'] = True
+        return truncated
+
+    def pack(self,
+             tokenizer,
+             context_docs: List[Dict[str, Any]],
+             overhead_tokens: int,
+             max_new_tokens: int,
+             context_window: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Select the chunks to put in the prompt.
+
+        Returns the packed chunks in rank order and a summary of the
+        packing decision.
+        """
+        try:
+            budget = self.budget(overhead_tokens, max_new_tokens, context_window)
+            ranked = sorted(context_docs, key=self._rank_key)
+            counts = self._count_tokens(tokenizer, ranked) if ranked else []
+            separator_tokens = len(tokenizer(self.separator, add_special_tokens=False)['input_ids'])
+
+            packed: List[Dict[str, Any]] = []
+            used = 0
+            deduped = dropped = truncated = 0
+            for doc, count in zip(ranked, counts):
+                if self._overlaps(doc, packed):
+                    deduped += 1
+                    continue
+
+                cost = count + (separator_tokens if packed else 0)
+                if used + cost <= budget:
+                    packed.append(doc)
+                    used += cost
+                elif not packed and budget > 0:
+                    # Never send an empty context because the best chunk is too long
+                    packed.append(self._truncate(tokenizer, doc, budget))
+                    used = budget
+                    truncated += 1
+                else:
+                    dropped += 1
+
+            stats = {
+                'budget_tokens': budget,
+                'context_tokens': used,
+                'chunks_in': len(context_docs),
+                'chunks_packed': len(packed),
+                'chunks_deduped': deduped,
+                'chunks_dropped': dropped,
+                'chunks_truncated': truncated
+            }
+            with self.lock:
+                self.calls += 1
+                self.chunks_in += len(context_docs)
+                self.chunks_packed += len(packed)
+                self.chunks_deduped += deduped
+                self.chunks_dropped += dropped
+                self.chunks_truncated += truncated
+
+            if deduped or dropped or truncated:
+                logger.debug(
+                    f"Packed {len(packed)}/{len(context_docs)} chunks into {used}/{budget} tokens "
+                    f"({deduped} deduplicated, {dropped} dropped, {truncated} truncated)"
+                )
+            return packed, stats
+
+        except Exception as e:
+            logger.error(f"Error packing context: {str(e)}")
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cumulative packing counters"""
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'context_window': self.context_window,
+                'max_context_tokens': self.max_context_tokens,
+                'chunks_in': self.chunks_in,
+                'chunks_packed': self.chunks_packed,
+                'chunks_deduped': self.chunks_deduped,
+                'chunks_dropped': self.chunks_dropped,
+                'chunks_truncated': self.chunks_truncated,
+                'cached_token_counts': len(self.token_counts)
+            }
@@ -1,67 +1,165 @@
 # src/agent/document_processor.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from pathlib import Path
-import yaml
+import re
 from loguru import logger
 from datetime import datetime
+from .config import load_config
+
+# Approximates subword tokenizers: words and standalone punctuation each count as one token
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+# Section headings such as "HEALTH INSURANCE POLICY", "COVERAGE DETAILS:" or "Claims Process:"
+SECTION_PATTERN = re.compile(r"^(?:[A-Z][A-Z0-9 &/',()-]{3,}|[A-Z][A-Za-z0-9 &/',()-]*:)$")
+# Numbered sub-headings such as "1. Collision Coverage"
+SUBSECTION_PATTERN = re.compile(r"^\s*\d+\.\s+([A-Za-z][^:]*?)\s*$")
+# Largest opening block (title, policy number) repeated at the top of later chunks
+MAX_HEADER_TOKENS = 32
+# Key/value lines such as "   - Deductible: $500" or "1. Find a provider: www.example.com"
+FIELD_PATTERN = re.compile(r"^\s*(?:[-*•]\s*|\d+\.\s+)?([A-Za-z0-9][A-Za-z0-9 &/'(),.-]{0,60}?)\s*:\s+(\S.*?)\s*$")
 
 class DocumentProcessor:
-    def __init__(self, config_path: str):
-        self.config = self._load_config(config_path)
+    def __init__(self, config_path: str, config: Optional[Dict[str, Any]] = None):
+        self.config = config if config is not None else self._load_config(config_path)
         self.current_date = "2025-01-20 22:38:06"  # Updated timestamp
         self.current_user = "objectgyan"
+
+        processor_config = self.config.get('document_processor', {}) or {}
+        self.chunk_size = int(processor_config.get('chunk_size', 256))
+        self.chunk_overlap = int(processor_config.get('chunk_overlap', 50))
+        if processor_config.get('max_chunks') is not None:
+            logger.warning("document_processor.max_chunks is no longer supported; documents are always chunked in full")
+        if self.chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if not 0 <= self.chunk_overlap < self.chunk_size:
+            raise ValueError("chunk_overlap must be between 0 and chunk_size")
+
         logger.info(f"DocumentProcessor initialized by {self.current_user}")
 
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from YAML file"""
-        try:
-            with open(config_path, 'r') as f:
-                return yaml.safe_load(f)
-        except Exception as e:
-            logger.error(f"Error loading config: {str(e)}")
-            raise
+        return load_config(config_path)
 
-    def _extract_text(self, file_path: Path) -> str:
-        """Extract text from a file"""
+    def _iter_lines(self, file_path: Path) -> Iterator[str]:
+        """Stream lines from a file without loading it into memory"""
         try:
             suffix = file_path.suffix.lower()
-            
+
             if suffix == '.txt':
                 with open(file_path, 'r', encoding='utf-8') as f:
-                    return f.read()
+                    yield from f
             else:
                 raise ValueError(f"Unsupported file type: {suffix}")
-                
+
         except Exception as e:
             logger.error(f"Error extracting text from {file_path}: {str(e)}")
             raise
 
+    def _extract_text(self, file_path: Path) -> str:
+        """Extract text from a file"""
+        return ''.join(self._iter_lines(file_path))
+
+    def _count_tokens(self, text: str) -> int:
+        """Approximate the number of model tokens in a piece of text"""
+        return len(TOKEN_PATTERN.findall(text))
+
+    def _split_long_line(self, line: str) -> List[str]:
+        """Split a single line that exceeds chunk_size into token-bounded pieces"""
+        pieces = []
+        start = 0
+        matches = list(TOKEN_PATTERN.finditer(line))
+        for idx in range(self.chunk_size, len(matches), self.chunk_size):
+            end = matches[idx].start()
+            pieces.append(line[start:end])
+            start = end
+        pieces.append(line[start:])
+        return pieces
+
+    def _iter_chunks(self, lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Group streamed lines into overlapping, token-bounded chunks.
+
+        Each chunk carries the section it starts in and its character
+        offsets within the source, so only ``chunk_size`` tokens plus the
+        current line are ever held in memory. A short opening block, up to
+        the first blank line, is repeated at the top of every later chunk
+        so each one still names its document; those chunks leave room for
+        it within ``chunk_size``.
+        """
+        # Buffered entries are (text, start_offset, token_count, section)
+        buffer: List[Tuple[str, int, int, Optional[str]]] = []
+        buffer_tokens = 0
+        offset = 0
+        section = None
+        header: List[str] = []
+        header_tokens = 0
+        header_end = 0
+        header_done = False
+
+        def limit(start_offset: int) -> int:
+            """Token budget of a chunk body starting at ``start_offset``"""
+            return self.chunk_size - (header_tokens if header and start_offset >= header_end else 0)
+
+        def emit() -> Dict[str, Any]:
+            first_offset = buffer[0][1]
+            last_text, last_offset = buffer[-1][0], buffer[-1][1]
+            body = ''.join(entry[0] for entry in buffer).strip()
+            prefixed = bool(header) and first_offset >= header_end
+            return {
+                'content': "\n".join(header) + "\n\n" + body if prefixed else body,
+                'section': next((entry[3] for entry in buffer if entry[3]), ''),
+                'start_offset': first_offset,
+                'end_offset': last_offset + len(last_text),
+                'token_count': buffer_tokens + (header_tokens if prefixed else 0)
+            }
+
+        for raw_line in lines:
+            stripped = raw_line.strip()
+            if SECTION_PATTERN.match(stripped):
+                section = stripped.rstrip(':')
+            if not header_done:
+                if stripped:
+                    header.append(stripped)
+                    header_tokens += self._count_tokens(stripped)
+                    header_end = offset + len(raw_line)
+                    if header_tokens > MAX_HEADER_TOKENS or header_tokens * 2 > self.chunk_size:
+                        # Not a short title block; chunks stand alone
+                        header, header_tokens, header_done = [], 0, True
+                elif header:
+                    header_done = True
+
+            pieces = [raw_line] if self._count_tokens(raw_line) <= self.chunk_size else self._split_long_line(raw_line)
+            for piece in pieces:
+                tokens = self._count_tokens(piece)
+                piece_offset = offset
+                offset += len(piece)
+
+                if buffer_tokens and buffer_tokens + tokens > limit(buffer[0][1]):
+                    yield emit()
+
+                    # Carry trailing lines forward as overlap
+                    overlap: List[Tuple[str, int, int, Optional[str]]] = []
+                    overlap_tokens = 0
+                    for entry in reversed(buffer):
+                        if overlap_tokens + entry[2] > self.chunk_overlap:
+                            break
+                        overlap.insert(0, entry)
+                        overlap_tokens += entry[2]
+                    buffer = overlap
+                    buffer_tokens = overlap_tokens
+
+                    # Drop overlap that would not leave room for the new line
+                    while buffer and buffer_tokens + tokens > limit(buffer[0][1]):
+                        buffer_tokens -= buffer.pop(0)[2]
+
+                buffer.append((piece, piece_offset, tokens, section))
+                buffer_tokens += tokens
+
+        if buffer and any(entry[0].strip() for entry in buffer):
+            yield emit()
+
     def _split_text(self, text: str) -> List[str]:
-        """Split text into sections based on policy type"""
+        """Split text into overlapping token-bounded chunks"""
         try:
-            # Determine policy type
-            is_health = 'HEALTH INSURANCE POLICY' in text
-            is_auto = 'AUTO INSURANCE POLICY' in text
-
-            # Keep the document as a single chunk with complete context
-            if is_health or is_auto:
-                return [text]
-            
-            # For other documents, split by sections
-            sections = []
-            current_section = []
-            
-            for line in text.split('\n'):
-                if line.strip():
-                    current_section.append(line)
-                elif current_section:
-                    sections.append('\n'.join(current_section))
-                    current_section = []
-                    
-            if current_section:
-                sections.append('\n'.join(current_section))
-                
-            return sections
+            return [chunk['content'] for chunk in self._iter_chunks(text.splitlines(keepends=True))]
 
         except Exception as e:
             logger.error(f"Error splitting text: {str(e)}")
@@ -76,34 +174,95 @@ class DocumentProcessor:
             return 'auto'
         return 'unknown'
 
+    def _detect_document_type(self, line: str) -> Optional[str]:
+        """Detect the document type from a single line, if it names one"""
+        doc_type = self._get_document_type(line)
+        return doc_type if doc_type != 'unknown' else None
+
+    def _parse_field(self, line: str) -> Optional[Tuple[str, str]]:
+        """Parse a "Key: value" coverage line into (field, value)"""
+        match = FIELD_PATTERN.match(line)
+        if match is None:
+            return None
+        return match.group(1).strip(), match.group(2)
+
     def process_document(self, file_path: str) -> List[Dict[str, Any]]:
-        """Process a document and return as a single document with metadata"""
+        """Process a document into overlapping chunks with metadata"""
+        return self.process_document_with_fields(file_path)[0]
+
+    def process_document_with_fields(self, file_path: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Process a document into chunks and extract its key/value coverage fields.
+
+        Both come from a single streaming pass. Each field records the
+        section and numbered sub-heading it appears under, e.g.
+        ("COVERAGE DETAILS", "Collision Coverage", "Deductible", "$500").
+        """
         try:
             file_path = Path(file_path)
             if not file_path.exists():
                 raise FileNotFoundError(f"File not found: {file_path}")
 
-            # Extract text from file
-            text = self._extract_text(file_path)
-            
-            # Get document type
-            doc_type = self._get_document_type(text)
-            
-            # Create a single document with complete content
-            document = {
-                'content': text,
-                'metadata': {
-                    'source': str(file_path),
-                    'doc_type': doc_type,
-                    'processed_at': self.current_date,
-                    'processed_by': self.current_user,
-                    'file_type': file_path.suffix.lower(),
-                    'file_name': file_path.name
-                }
-            }
+            doc_type = None
+            fields: List[Dict[str, Any]] = []
+            field_section = ''
+            subsection = ''
+            offset = 0
+
+            def tracked_lines() -> Iterator[str]:
+                nonlocal doc_type, field_section, subsection, offset
+                for line in self._iter_lines(file_path):
+                    if doc_type is None:
+                        doc_type = self._detect_document_type(line)
+
+                    stripped = line.strip()
+                    subsection_match = SUBSECTION_PATTERN.match(line)
+                    if SECTION_PATTERN.match(stripped):
+                        field_section = stripped.rstrip(':')
+                        subsection = ''
+                    elif subsection_match:
+                        subsection = subsection_match.group(1)
+                    else:
+                        parsed = self._parse_field(line)
+                        if parsed is not None:
+                            fields.append({
+                                'section': field_section,
+                                'subsection': subsection,
+                                'field': parsed[0],
+                                'value': parsed[1],
+                                'line': stripped,
+                                'offset': offset
+                            })
+                    offset += len(line)
+                    yield line
+
+            chunks = list(self._iter_chunks(tracked_lines()))
+
+            doc_type = doc_type or 'unknown'
+            documents = []
+            for idx, chunk in enumerate(chunks):
+                documents.append({
+                    'content': chunk['content'],
+                    'metadata': {
+                        'source': str(file_path),
+                        'doc_type': doc_type,
+                        'section': chunk['section'],
+                        'chunk_index': idx,
+                        'start_offset': chunk['start_offset'],
+                        'end_offset': chunk['end_offset'],
+                        'token_count': chunk['token_count'],
+                        'processed_at': self.current_date,
+                        'processed_by': self.current_user,
+                        'file_type': file_path.suffix.lower(),
+                        'file_name': file_path.name
+                    }
+                })
+
+            for field in fields:
+                field['source'] = str(file_path)
+                field['doc_type'] = doc_type
 
-            logger.info(f"Successfully processed {doc_type} document: {file_path}")
-            return [document]  # Return as list for consistency
+            logger.info(f"Successfully processed {doc_type} document into {len(documents)} chunks and {len(fields)} fields: {file_path}")
+            return documents, fields
 
         except Exception as e:
             logger.error(f"Error processing document: {str(e)}")
@@ -0,0 +1,167 @@
+# src/agent/embedding_store.py
+from typing import Dict, Any, List, Optional
+from pathlib import Path
+import hashlib
+import os
+import struct
+import threading
+import numpy as np
+from loguru import logger
+
+# Data record: sha256(model, text) digest, dimension, float32 vector
+RECORD_HEADER = struct.Struct("<32sI")
+# Index record: first 8 digest bytes as the lookup key, data file offset
+INDEX_DTYPE = np.dtype([('key', '<u8'), ('offset', '<i8')])
+# Appended keys are merged into the sorted arrays once this many accumulate
+MERGE_THRESHOLD = 65536
+
+
+class EmbeddingStore:
+    """Content-addressed, append-only store of chunk embeddings.
+
+    Vectors are keyed by (embedding model, chunk text) and appended to
+    ``embeddings.bin``; ``embeddings.idx`` records where each one starts.
+    The index is held as sorted uint64 keys with their offsets and looked
+    up with ``searchsorted``, and each hit is checked against the full
+    digest stored in its record. A vector is written to the data file
+    before its index entry, so a crash at worst orphans the tail of
+    ``embeddings.bin``. The store lives outside the vector database, so
+    wiping ``data/chroma`` or switching backends keeps every vector.
+    """
+
+    def __init__(self, cache_dir: str = "cache/embeddings"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.cache_dir / "embeddings.bin"
+        self.index_path = self.cache_dir / "embeddings.idx"
+        self.lock = threading.Lock()
+
+        self.data_file = open(self.data_path, 'ab')
+        self.index_file = open(self.index_path, 'ab')
+        self.read_fd = os.open(self.data_path, os.O_RDONLY)
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.recent: Dict[int, int] = {}
+        self._load_index()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    @staticmethod
+    def _digest(model: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).digest()
+
+    def _load_index(self):
+        """Read the offset index, dropping entries past the end of the data file"""
+        try:
+            entries = np.fromfile(self.index_path, dtype=INDEX_DTYPE)
+            entries = entries[entries['offset'] < self.data_path.stat().st_size]
+            # Stable sort keeps the latest entry for a key last
+            order = np.argsort(entries['key'], kind='stable')
+            keys, offsets = entries['key'][order], entries['offset'][order]
+            last = np.r_[keys[1:] != keys[:-1], True] if len(keys) else np.zeros(0, dtype=bool)
+            self.keys, self.offsets = keys[last], offsets[last]
+            if len(self.keys):
+                logger.info(f"Embedding store holds {len(self.keys)} vectors")
+        except Exception as e:
+            logger.error(f"Error loading embedding store index: {str(e)}")
+            raise
+
+    def _merge_recent(self):
+        """Fold recently appended keys into the sorted arrays"""
+        keys = np.concatenate([self.keys, np.fromiter(self.recent.keys(), dtype=np.uint64, count=len(self.recent))])
+        offsets = np.concatenate([self.offsets, np.fromiter(self.recent.values(), dtype=np.int64, count=len(self.recent))])
+        order = np.argsort(keys, kind='stable')
+        keys, offsets = keys[order], offsets[order]
+        last = np.r_[keys[1:] != keys[:-1], True]
+        self.keys, self.offsets = keys[last], offsets[last]
+        self.recent = {}
+
+    def _offset(self, key: int) -> Optional[int]:
+        offset = self.recent.get(key)
+        if offset is not None:
+            return offset
+        position = int(np.searchsorted(self.keys, np.uint64(key)))
+        if position < len(self.keys) and int(self.keys[position]) == key:
+            return int(self.offsets[position])
+        return None
+
+    def _read(self, offset: int, digest: bytes) -> Optional[List[float]]:
+        header = os.pread(self.read_fd, RECORD_HEADER.size, offset)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        stored_digest, dim = RECORD_HEADER.unpack(header)
+        if stored_digest != digest:
+            return None  # 64-bit key collision
+        payload = os.pread(self.read_fd, dim * 4, offset + RECORD_HEADER.size)
+        if len(payload) < dim * 4:
+            return None
+        return np.frombuffer(payload, dtype=np.float32).tolist()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Stored embedding per text, or None where it has not been computed yet"""
+        try:
+            results: List[Optional[List[float]]] = []
+            with self.lock:
+                for text in texts:
+                    digest = self._digest(model, text)
+                    offset = self._offset(int.from_bytes(digest[:8], 'little'))
+                    vector = self._read(offset, digest) if offset is not None else None
+                    if vector is None:
+                        self.misses += 1
+                    else:
+                        self.hits += 1
+                    results.append(vector)
+            return results
+        except Exception as e:
+            logger.error(f"Error reading embedding store: {str(e)}")
+            raise
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """Append newly computed embeddings"""
+        try:
+            with self.lock:
+                offset = self.data_file.seek(0, os.SEEK_END)
+                records = []
+                entries = []
+                for text, embedding in zip(texts, embeddings):
+                    digest = self._digest(model, text)
+                    vector = np.asarray(embedding, dtype=np.float32)
+                    record = RECORD_HEADER.pack(digest, len(vector)) + vector.tobytes()
+                    records.append(record)
+                    entries.append((int.from_bytes(digest[:8], 'little'), offset))
+                    offset += len(record)
+
+                self.data_file.write(b''.join(records))
+                self.data_file.flush()
+                self.index_file.write(np.array(entries, dtype=INDEX_DTYPE).tobytes())
+                self.index_file.flush()
+
+                self.recent.update(entries)
+                self.writes += len(entries)
+                if len(self.recent) >= MERGE_THRESHOLD:
+                    self._merge_recent()
+        except Exception as e:
+            logger.error(f"Error writing embedding store: {str(e)}")
+            raise
+
+    def close(self):
+        with self.lock:
+            self.data_file.close()
+            self.index_file.close()
+            os.close(self.read_fd)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store size and reuse counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'vectors': len(self.keys) + len(self.recent),
+                'bytes': self.data_path.stat().st_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'writes': self.writes
+            }
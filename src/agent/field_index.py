@@ -0,0 +1,310 @@
+# src/agent/field_index.py
+from typing import Dict, Any, List, Optional, FrozenSet, Set, Tuple
+from collections import deque
+from pathlib import Path
+import json
+import os
+import re
+import threading
+import time
+from loguru import logger
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+# Policy numbers and file names a question can be scoped by, e.g. "AUTO-2025-001" or "auto_policy.txt"
+SCOPE_PATTERN = re.compile(r"[\w][\w.-]*[\w]")
+
+# Words that carry no field information; "coverage" and "insurance" appear in almost every heading
+STOPWORDS = frozenset("""
+a about am an and any are at be can could do does for from have how i if in is it me much my
+of on or our please s tell that the their there this to under what whats when where which who
+will with would you your coverage covered details insurance
+""".split())
+
+
+def content_tokens(text: str) -> FrozenSet[str]:
+    """Lowercase content words with stopwords removed and plurals folded"""
+    tokens = set()
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.add(word)
+    return frozenset(tokens)
+
+
+class FieldIndex:
+    """Per-policy index of key/value coverage fields for answering questions without the LLM.
+
+    Answers are scoped to one policy: the question (or the request) must
+    name a policy number or source file the index holds, otherwise the
+    question goes through retrieval, so one customer is never answered
+    from another customer's policy. Within the named policies a field is a
+    candidate when every content word of its name appears in the question.
+    Its confidence is the share of question words explained by the field
+    name, value, headings and policy type. The best candidate answers only
+    when it reaches ``min_confidence`` and no candidate with a different
+    value scores as high. Questions naming a numbered sub-heading (e.g.
+    "prescription drug coverage") can also be answered with every field
+    under it.
+    """
+
+    def __init__(self, index_path: str, min_confidence: float = 0.75):
+        self.index_path = Path(index_path)
+        self.min_confidence = float(min_confidence)
+        self.lock = threading.Lock()
+        self.sources: Dict[str, List[Dict[str, Any]]] = self._load()
+
+        # Counters
+        self.lookups = 0
+        self.hits = 0
+        self.unscoped = 0
+        self.lookup_us: deque = deque(maxlen=4096)
+
+        # Per-source lookup structures and policy number / file name -> sources
+        self.indexes: Dict[str, Dict[str, Any]] = {}
+        self.scope_keys: Dict[str, Set[str]] = {}
+        for source, fields in self.sources.items():
+            self._index_source(source, fields)
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Load the index from disk, starting empty if it does not exist"""
+        try:
+            if self.index_path.exists():
+                with open(self.index_path, 'r') as f:
+                    return json.load(f)
+            return {}
+        except Exception as e:
+            logger.error(f"Error loading field index: {str(e)}")
+            raise
+
+    def save(self):
+        """Atomically write the index to disk"""
+        try:
+            with self.lock:
+                data = json.dumps(self.sources)
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"Error saving field index: {str(e)}")
+            raise
+
+    @staticmethod
+    def _scope_key(text: str) -> str:
+        return text.strip().strip(".,;:!?'\"()").lower()
+
+    def _source_keys(self, source: str, fields: List[Dict[str, Any]]) -> Set[str]:
+        """Policy numbers and the file name that scope a question to this source"""
+        keys = {self._scope_key(Path(source).name)}
+        for field in fields:
+            if field['field'].lower() == 'policy number':
+                keys.add(self._scope_key(field['value']))
+        return keys
+
+    def _index_source(self, source: str, fields: List[Dict[str, Any]]):
+        """Build the token -> entry and token -> group maps of one source; called with the lock held"""
+        entries = []
+        groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for field in fields:
+            # The numbered sub-heading is more specific than the section it sits in
+            heading = field['subsection'] or field['section']
+            heading_tokens = content_tokens(f"{heading} {field['doc_type']}")
+            entry = {
+                'field': field,
+                'name_tokens': content_tokens(field['field']),
+                'all_tokens': content_tokens(field['field']) | content_tokens(field['value']) | heading_tokens
+            }
+            if entry['name_tokens']:
+                entries.append(entry)
+
+            if field['subsection']:
+                group = groups.setdefault((field['section'], field['subsection']), {
+                    'fields': [],
+                    'name_tokens': content_tokens(field['subsection']),
+                    'all_tokens': heading_tokens
+                })
+                group['fields'].append(field)
+                group['all_tokens'] = group['all_tokens'] | entry['all_tokens']
+
+        postings: Dict[str, List[int]] = {}
+        for idx, entry in enumerate(entries):
+            for token in entry['name_tokens']:
+                postings.setdefault(token, []).append(idx)
+
+        group_list = [group for group in groups.values() if group['name_tokens']]
+        group_postings: Dict[str, List[int]] = {}
+        for idx, group in enumerate(group_list):
+            for token in group['name_tokens']:
+                group_postings.setdefault(token, []).append(idx)
+
+        keys = self._source_keys(source, fields)
+        for key in keys:
+            self.scope_keys.setdefault(key, set()).add(source)
+        self.indexes[source] = {
+            'entries': entries,
+            'postings': postings,
+            'groups': group_list,
+            'group_postings': group_postings,
+            'keys': keys
+        }
+
+    def _unindex_source(self, source: str):
+        """Drop the lookup structures of one source; called with the lock held"""
+        index = self.indexes.pop(source, None)
+        if index is None:
+            return
+        for key in index['keys']:
+            sources = self.scope_keys.get(key)
+            if sources is not None:
+                sources.discard(source)
+                if not sources:
+                    del self.scope_keys[key]
+
+    def has_source(self, source: str) -> bool:
+        with self.lock:
+            return source in self.sources
+
+    def replace_sources(self, updates: Dict[str, Optional[List[Dict[str, Any]]]]):
+        """Replace the fields of several source documents at once; None removes a source.
+
+        Only the given sources are re-indexed, so committing an ingest run
+        costs time proportional to the files it changed.
+        """
+        with self.lock:
+            for source, fields in updates.items():
+                self._unindex_source(source)
+                if fields is None:
+                    self.sources.pop(source, None)
+                else:
+                    self.sources[source] = fields
+                    self._index_source(source, fields)
+
+    def replace_source(self, source: str, fields: List[Dict[str, Any]]):
+        """Replace every field extracted from a source document"""
+        self.replace_sources({source: fields})
+
+    def remove_source(self, source: str):
+        """Drop the fields of a source document that no longer exists"""
+        self.replace_sources({source: None})
+
+    def _resolve_scope(self, question: str, policy: Optional[str]) -> Set[str]:
+        """Sources named by the request's policy, or else by policy numbers or file names in the question"""
+        if policy:
+            key = self._scope_key(policy)
+            if policy in self.indexes:
+                return {policy}
+            return set(self.scope_keys.get(key, ())) | set(self.scope_keys.get(self._scope_key(Path(policy).name), ()))
+
+        sources: Set[str] = set()
+        for term in SCOPE_PATTERN.findall(question):
+            sources |= self.scope_keys.get(self._scope_key(term), set())
+        return sources
+
+    def _format_answer(self, field: Dict[str, Any]) -> str:
+        """Render a single field as an answer"""
+        heading = field['subsection'] or field['section'].title()
+        return f"{field['field']} ({heading}, {field['doc_type']} policy): {field['value']}"
+
+    def _format_group(self, fields: List[Dict[str, Any]]) -> str:
+        """Render every field under a sub-heading as an answer"""
+        lines = [f"{fields[0]['subsection']} ({fields[0]['doc_type']} policy):"]
+        lines.extend(f"- {field['field']}: {field['value']}" for field in fields)
+        return "\n".join(lines)
+
+    def lookup(self, question: str, policy: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Answer a question from the index if a field of the named policy matches confidently.
+
+        ``policy`` is a policy number or source file given with the
+        request; without it the question itself must name one. Returns the
+        answer text, its confidence and the matched fields, or None when
+        the question should go through retrieval and the LLM.
+        """
+        started = time.perf_counter()
+        try:
+            question_tokens = content_tokens(question)
+            if not question_tokens:
+                return None
+
+            with self.lock:
+                self.lookups += 1
+                sources = self._resolve_scope(question, policy)
+                if not sources:
+                    self.unscoped += 1
+                    return None
+
+                # Policy numbers and file names ("on policy AUTO-2025-001") scope the question; they are not field words
+                scope_tokens = {'policy'}
+                for source in sources:
+                    for key in self.indexes[source]['keys']:
+                        scope_tokens |= content_tokens(key)
+                question_tokens = question_tokens - scope_tokens
+                if not question_tokens:
+                    return None
+
+                # (confidence, specificity, answer, fields); specificity prefers single fields
+                candidates: List[Tuple[float, int, str, List[Dict[str, Any]]]] = []
+                for source in sources:
+                    index = self.indexes[source]
+                    seen = set()
+                    for token in question_tokens:
+                        for idx in index['postings'].get(token, ()):
+                            if idx in seen:
+                                continue
+                            seen.add(idx)
+                            entry = index['entries'][idx]
+                            if entry['name_tokens'] <= question_tokens:
+                                confidence = len(question_tokens & entry['all_tokens']) / len(question_tokens)
+                                candidates.append((confidence, 1, self._format_answer(entry['field']), [entry['field']]))
+
+                    seen = set()
+                    for token in question_tokens:
+                        for idx in index['group_postings'].get(token, ()):
+                            if idx in seen:
+                                continue
+                            seen.add(idx)
+                            group = index['groups'][idx]
+                            if group['name_tokens'] <= question_tokens:
+                                confidence = len(question_tokens & group['all_tokens']) / len(question_tokens)
+                                candidates.append((confidence, 0, self._format_group(group['fields']), group['fields']))
+
+                if not candidates:
+                    return None
+
+                candidates.sort(key=lambda candidate: (candidate[0], candidate[1]), reverse=True)
+                best = candidates[0]
+                if best[0] < self.min_confidence:
+                    return None
+
+                # Two equally good matches with different values (e.g. two deductibles) are ambiguous
+                for other in candidates[1:]:
+                    if other[0] < best[0]:
+                        break
+                    if other[1] == best[1] and other[2] != best[2]:
+                        return None
+
+                self.hits += 1
+                return {'response': best[2], 'confidence': best[0], 'fields': best[3]}
+
+        except Exception as e:
+            logger.error(f"Error looking up field index: {str(e)}")
+            return None
+        finally:
+            self.lookup_us.append((time.perf_counter() - started) * 1e6)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index size, hit rate and lookup latency"""
+        with self.lock:
+            lookup_us = sorted(self.lookup_us)
+            return {
+                'sources': len(self.sources),
+                'fields': sum(len(fields) for fields in self.sources.values()),
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'unscoped': self.unscoped,
+                'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+                'lookup_us_p50': lookup_us[len(lookup_us) // 2] if lookup_us else 0.0,
+                'min_confidence': self.min_confidence
+            }
@@ -0,0 +1,82 @@
+# src/agent/ingest_manifest.py
+from typing import Dict, Any, List, Optional
+from pathlib import Path
+import hashlib
+import json
+import os
+from loguru import logger
+
+
+def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+    """Compute the SHA-256 of a file without loading it into memory"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """Record of ingested files: (path, mtime, size, hash) plus the chunk IDs each produced"""
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = Path(manifest_path)
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Load the manifest from disk, starting empty if it does not exist"""
+        try:
+            if self.manifest_path.exists():
+                with open(self.manifest_path, 'r') as f:
+                    return json.load(f)
+            return {}
+        except Exception as e:
+            logger.error(f"Error loading ingest manifest: {str(e)}")
+            raise
+
+    def save(self):
+        """Atomically write the manifest to disk"""
+        try:
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.manifest_path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception as e:
+            logger.error(f"Error saving ingest manifest: {str(e)}")
+            raise
+
+    def get(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Get the manifest entry for a file"""
+        return self.entries.get(file_path)
+
+    def is_unchanged(self, file_path: str, stat: os.stat_result) -> bool:
+        """Cheap check: same mtime and size as the last ingestion"""
+        entry = self.entries.get(file_path)
+        return (entry is not None
+                and entry['mtime'] == stat.st_mtime
+                and entry['size'] == stat.st_size)
+
+    def update(self, file_path: str, stat: os.stat_result, file_hash: str, ids: List[str]):
+        """Record the current state of an ingested file"""
+        self.entries[file_path] = {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'hash': file_hash,
+            'ids': ids
+        }
+
+    def touch(self, file_path: str, stat: os.stat_result):
+        """Refresh mtime/size for a file whose content hash did not change"""
+        entry = self.entries[file_path]
+        entry['mtime'] = stat.st_mtime
+        entry['size'] = stat.st_size
+
+    def remove(self, file_path: str) -> List[str]:
+        """Forget a file and return the chunk IDs it had produced"""
+        entry = self.entries.pop(file_path, None)
+        return entry['ids'] if entry else []
+
+    def missing_files(self) -> List[str]:
+        """Files recorded in the manifest that no longer exist on disk"""
+        return [file_path for file_path in self.entries if not os.path.exists(file_path)]
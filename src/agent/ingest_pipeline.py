@@ -0,0 +1,319 @@
+# src/agent/ingest_pipeline.py
+from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+import os
+import time
+from loguru import logger
+from .document_processor import DocumentProcessor
+from .ingest_manifest import hash_file
+
+# Per-process DocumentProcessor, created once by the pool initializer
+_worker_processor: Optional[DocumentProcessor] = None
+
+
+def _init_worker(config_path: str):
+    """Create the DocumentProcessor used by a parse worker"""
+    global _worker_processor
+    _worker_processor = DocumentProcessor(config_path)
+
+
+def _parse_file(file_path: str) -> Tuple[str, List[Dict[str, Any]], str, List[Dict[str, Any]]]:
+    """Parse, extract fields from and hash a single file inside a worker process"""
+    documents, fields = _worker_processor.process_document_with_fields(file_path)
+    return file_path, documents, hash_file(file_path), fields
+
+
+class IngestPipeline:
+    """Pipelined bulk ingestion: parallel parse -> batched embed -> grouped write.
+
+    Files are parsed in a process pool with at most ``max_pending_files`` in
+    flight. Chunks from all files are pooled into fixed-size embedding
+    batches, and embedded chunks are written to the vector store in groups
+    of ``write_batch_size``.
+
+    Ingestion is incremental: files whose mtime/size or content hash match
+    the vector store manifest are skipped, only chunks with new IDs are
+    embedded, and chunks of changed or removed files are deleted. When a
+    field index is given, the key/value fields of each parsed file replace
+    that file's previous fields.
+    """
+
+    def __init__(self,
+                 config_path: str,
+                 config: Dict[str, Any],
+                 document_processor: DocumentProcessor,
+                 vector_store,
+                 field_index=None):
+        self.current_date = "2025-01-20 23:26:03"
+        self.current_user = "objectgyan"
+        self.config_path = config_path
+        self.document_processor = document_processor
+        self.vector_store = vector_store
+        self.field_index = field_index
+
+        ingest_config = config.get('ingest', {}) or {}
+        self.workers = int(ingest_config.get('workers', os.cpu_count() or 1))
+        self.embed_batch_size = int(ingest_config.get('embed_batch_size', 64))
+        self.write_batch_size = int(ingest_config.get('write_batch_size', 256))
+        self.max_pending_files = int(ingest_config.get('max_pending_files', max(self.workers, 1) * 4))
+        self.progress_interval = float(ingest_config.get('progress_interval', 5.0))
+
+    def run(self, file_paths: List[str]) -> Dict[str, Any]:
+        """Ingest files and return a throughput report"""
+        self._reset_stats(len(file_paths))
+
+        try:
+            file_paths = self._select_changed([os.path.abspath(file_path) for file_path in file_paths])
+            self._remove_deleted_files()
+
+            if self.workers <= 1 or len(file_paths) <= 1:
+                for file_path in file_paths:
+                    self._handle_parsed(file_path, self._parse_inline(file_path))
+            else:
+                self._run_parallel(file_paths)
+
+            self._embed_pending(flush=True)
+            self._write_pending(flush=True)
+            self._commit_manifest()
+        except Exception as e:
+            logger.error(f"Error running ingest pipeline: {str(e)}")
+            raise
+
+        report = self._build_report()
+        logger.info(
+            f"Ingested {report['files_processed']}/{report['files_total']} files, "
+            f"{report['chunks_written']} chunks in {report['elapsed_s']:.2f}s "
+            f"({report['files_skipped']} files and {report['chunks_skipped']} chunks unchanged, "
+            f"{report['files_per_s']:.1f} files/s, {report['chunks_per_s']:.1f} chunks/s, "
+            f"{report['embed_ms_per_batch']:.1f} ms per embed batch)"
+        )
+        return report
+
+    def _run_parallel(self, file_paths: List[str]):
+        """Parse files in a process pool, bounding the number of files in flight"""
+        remaining = iter(file_paths)
+        pending: Dict[Future, str] = {}
+
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 initializer=_init_worker,
+                                 initargs=(self.config_path,)) as pool:
+            def fill():
+                while len(pending) < self.max_pending_files:
+                    file_path = next(remaining, None)
+                    if file_path is None:
+                        return
+                    pending[pool.submit(_parse_file, file_path)] = file_path
+
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = pending.pop(future)
+                    try:
+                        _, documents, file_hash, fields = future.result()
+                        parsed = (documents, file_hash, fields)
+                    except Exception as e:
+                        logger.error(f"Error parsing {file_path}: {str(e)}")
+                        parsed = None
+                    self._handle_parsed(file_path, parsed)
+                # Downstream stages run before refilling, so slow embedding throttles parsing
+                fill()
+
+    def _parse_inline(self, file_path: str) -> Optional[Tuple[List[Dict[str, Any]], str, List[Dict[str, Any]]]]:
+        """Parse, extract fields from and hash a file in the current process"""
+        try:
+            documents, fields = self.document_processor.process_document_with_fields(file_path)
+            return documents, hash_file(file_path), fields
+        except Exception as e:
+            logger.error(f"Error parsing {file_path}: {str(e)}")
+            return None
+
+    def _select_changed(self, file_paths: List[str]) -> List[str]:
+        """Drop files whose mtime and size match the manifest"""
+        manifest = self.vector_store.manifest
+        changed = []
+        for file_path in file_paths:
+            try:
+                stat = os.stat(file_path)
+            except OSError as e:
+                logger.error(f"Error reading {file_path}: {str(e)}")
+                self.stats['failed_files'].append(file_path)
+                continue
+
+            # Files ingested before the field index existed are parsed once more to fill it
+            if manifest.is_unchanged(file_path, stat) and (
+                self.field_index is None or self.field_index.has_source(file_path)
+            ):
+                self.stats['files_skipped'] += 1
+                continue
+            self.file_stats[file_path] = stat
+            changed.append(file_path)
+        return changed
+
+    def _remove_deleted_files(self):
+        """Delete chunks of files that have disappeared since the last run"""
+        manifest = self.vector_store.manifest
+        for file_path in manifest.missing_files():
+            ids = manifest.remove(file_path)
+            self.pending_deletes.extend(ids)
+            if self.field_index is not None:
+                self.pending_fields.append((file_path, None))
+            self.stats['files_removed'] += 1
+
+    def _handle_parsed(self,
+                       file_path: str,
+                       parsed: Optional[Tuple[List[Dict[str, Any]], str, List[Dict[str, Any]]]]):
+        """Feed new chunks of a parsed file into the embedding stage"""
+        if parsed is None:
+            self.stats['failed_files'].append(file_path)
+        else:
+            documents, file_hash, fields = parsed
+            manifest = self.vector_store.manifest
+            entry = manifest.get(file_path)
+            stat = self.file_stats[file_path]
+
+            if self.field_index is not None and (
+                entry is None or entry['hash'] != file_hash or not self.field_index.has_source(file_path)
+            ):
+                self.pending_fields.append((file_path, fields))
+
+            if entry is not None and entry['hash'] == file_hash:
+                # Only the timestamp changed
+                manifest.touch(file_path, stat)
+                self.stats['files_skipped'] += 1
+            else:
+                ids = [self.vector_store.document_id(doc) for doc in documents]
+                if entry is not None:
+                    self.pending_deletes.extend(set(entry['ids']) - set(ids))
+                new_documents = self.vector_store.find_missing(documents)
+
+                self.stats['files_processed'] += 1
+                self.stats['chunks_parsed'] += len(documents)
+                self.stats['chunks_skipped'] += len(documents) - len(new_documents)
+                self.pending_chunks.extend(new_documents)
+                self.pending_manifest.append((file_path, stat, file_hash, ids))
+
+        self._embed_pending()
+        self._write_pending()
+        self._maybe_log_progress()
+
+    def _embed_pending(self, flush: bool = False):
+        """Embed pooled chunks in fixed-size batches"""
+        while len(self.pending_chunks) >= self.embed_batch_size or (flush and self.pending_chunks):
+            batch = self.pending_chunks[:self.embed_batch_size]
+            del self.pending_chunks[:self.embed_batch_size]
+
+            started = time.perf_counter()
+            embeddings = self.vector_store.embed_documents([doc['content'] for doc in batch])
+            self.stats['embed_batch_ms'].append((time.perf_counter() - started) * 1000)
+
+            self.pending_writes.extend(zip(batch, embeddings))
+
+    def _write_pending(self, flush: bool = False):
+        """Write embedded chunks to the vector store in large groups"""
+        while len(self.pending_writes) >= self.write_batch_size or (flush and self.pending_writes):
+            group = self.pending_writes[:self.write_batch_size]
+            del self.pending_writes[:self.write_batch_size]
+
+            started = time.perf_counter()
+            self.vector_store.add_documents(
+                [doc for doc, _ in group],
+                embeddings=[embedding for _, embedding in group]
+            )
+            self.stats['write_batch_ms'].append((time.perf_counter() - started) * 1000)
+            self.stats['chunks_written'] += len(group)
+
+    def _commit_manifest(self):
+        """Apply deletions and record ingested files once their chunks are written"""
+        if self.pending_deletes:
+            self.vector_store.delete_ids(self.pending_deletes, batch_size=self.write_batch_size)
+            self.stats['chunks_deleted'] += len(self.pending_deletes)
+            self.pending_deletes = []
+
+        manifest = self.vector_store.manifest
+        for file_path, stat, file_hash, ids in self.pending_manifest:
+            manifest.update(file_path, stat, file_hash, ids)
+        self.pending_manifest = []
+        manifest.save()
+        self.vector_store.flush()
+
+        if self.field_index is not None and self.pending_fields:
+            # One bulk update per run; only the changed files are re-indexed
+            self.field_index.replace_sources(dict(self.pending_fields))
+            self.stats['fields_indexed'] += sum(len(fields) for _, fields in self.pending_fields if fields is not None)
+            self.pending_fields = []
+            self.field_index.save()
+
+    def _reset_stats(self, files_total: int):
+        """Reset per-run buffers and counters"""
+        self.pending_chunks: List[Dict[str, Any]] = []
+        self.pending_writes: List[Tuple[Dict[str, Any], List[float]]] = []
+        self.pending_deletes: List[str] = []
+        self.pending_manifest: List[Tuple[str, os.stat_result, str, List[str]]] = []
+        self.pending_fields: List[Tuple[str, Optional[List[Dict[str, Any]]]]] = []
+        self.file_stats: Dict[str, os.stat_result] = {}
+        self.started_at = time.perf_counter()
+        self.last_progress_at = self.started_at
+        self.stats = {
+            'files_total': files_total,
+            'files_processed': 0,
+            'files_skipped': 0,
+            'files_removed': 0,
+            'failed_files': [],
+            'chunks_parsed': 0,
+            'chunks_skipped': 0,
+            'chunks_written': 0,
+            'chunks_deleted': 0,
+            'fields_indexed': 0,
+            'embed_batch_ms': [],
+            'write_batch_ms': []
+        }
+        # Embedding store hits during this run are chunks that skipped the embedding model
+        store = self.vector_store.embedding_store
+        self.store_hits_at_start = store.get_stats()['hits'] if store is not None else 0
+
+    def _maybe_log_progress(self):
+        """Log throughput at most once per progress_interval"""
+        now = time.perf_counter()
+        if now - self.last_progress_at < self.progress_interval:
+            return
+        self.last_progress_at = now
+        elapsed = max(now - self.started_at, 1e-9)
+        logger.info(
+            f"Ingest progress: {self.stats['files_processed']}/{self.stats['files_total']} files, "
+            f"{self.stats['files_processed'] / elapsed:.1f} files/s, "
+            f"{self.stats['chunks_parsed'] / elapsed:.1f} chunks/s, "
+            f"{len(self.pending_chunks)} chunks awaiting embedding"
+        )
+
+    def _build_report(self) -> Dict[str, Any]:
+        """Summarize the finished run"""
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        embed_ms = self.stats['embed_batch_ms']
+        write_ms = self.stats['write_batch_ms']
+        return {
+            'files_total': self.stats['files_total'],
+            'files_processed': self.stats['files_processed'],
+            'files_skipped': self.stats['files_skipped'],
+            'files_removed': self.stats['files_removed'],
+            'failed_files': self.stats['failed_files'],
+            'chunks_written': self.stats['chunks_written'],
+            'chunks_skipped': self.stats['chunks_skipped'],
+            'chunks_deleted': self.stats['chunks_deleted'],
+            'fields_indexed': self.stats['fields_indexed'],
+            'embeddings_reused': (
+                self.vector_store.embedding_store.get_stats()['hits'] - self.store_hits_at_start
+                if self.vector_store.embedding_store is not None else 0
+            ),
+            'elapsed_s': elapsed,
+            'files_per_s': self.stats['files_processed'] / elapsed,
+            'chunks_per_s': self.stats['chunks_written'] / elapsed,
+            'embed_batches': len(embed_ms),
+            'embed_ms_per_batch': sum(embed_ms) / len(embed_ms) if embed_ms else 0.0,
+            'embed_ms_max': max(embed_ms) if embed_ms else 0.0,
+            'write_batches': len(write_ms),
+            'write_ms_per_batch': sum(write_ms) / len(write_ms) if write_ms else 0.0,
+            'workers': self.workers,
+            'processed_at': self.current_date,
+            'processed_by': self.current_user
+        }
@@ -1,52 +1,254 @@
 # src/agent/insurance_agent.py
-from typing import Dict, Any
-import yaml
+from typing import Dict, Any, List, Iterator, Optional, Callable, Tuple
+from pathlib import Path
+import threading
+import time
 from loguru import logger
+from .config import load_config
 from .document_processor import DocumentProcessor
 from .vector_store import VectorStore
 from .llm_handler import LLMHandler
+from .batch_scheduler import GenerationUnavailable
+from .ingest_pipeline import IngestPipeline
+from .llm_cache import LLMCache
+from .semantic_cache import SemanticCache
+from .field_index import FieldIndex
+from .metrics import metrics
 
 class InsuranceAgent:
     def __init__(self, config_path: str):
         self.current_date = "2025-01-20 23:26:03"
         self.current_user = "objectgyan"
-        self.config = self._load_config(config_path)
+        self.config_path = config_path
+        self.startup_timings: Dict[str, float] = {}
+        self.warm_up_thread: Optional[threading.Thread] = None
+        self.config = self._timed('config', lambda: self._load_config(config_path))
+        metrics.configure(self.config)
         
-        # Initialize components
-        self.document_processor = DocumentProcessor(config_path)
-        self.vector_store = VectorStore(config_path)
-        self.llm_handler = LLMHandler(self.config)
+        # Initialize components; models and Chroma load lazily on first use
+        self.document_processor = self._timed('document_processor', lambda: DocumentProcessor(config_path, self.config))
+        self.vector_store = self._timed('vector_store', lambda: VectorStore(config_path, self.config))
+        self.llm_handler = self._timed('llm_handler', lambda: LLMHandler(self.config))
+
+        # Key/value coverage fields extracted at ingest time, for answering without the LLM
+        field_config = self.config.get('field_index', {}) or {}
+        self.field_index = None
+        if field_config.get('enabled', False):
+            self.field_index = self._timed('field_index', lambda: FieldIndex(
+                str(Path(self.vector_store.persist_directory) / "field_index.json"),
+                min_confidence=field_config.get('min_confidence', 0.75)
+            ))
+
+        self.ingest_pipeline = IngestPipeline(
+            config_path,
+            self.config,
+            self.document_processor,
+            self.vector_store,
+            field_index=self.field_index
+        )
+
+        # Response cache keyed by question and retrieved chunk IDs
+        llm_config = self.config.get('llm', {})
+        self.llm_cache = None
+        if llm_config.get('use_cache', False):
+            cache_config = llm_config.get('response_cache', {}) or {}
+            self.llm_cache = self._timed('llm_cache', lambda: LLMCache(
+                cache_dir=cache_config.get('cache_dir', "cache/llm"),
+                memory_entries=cache_config.get('memory_entries', 256),
+                max_bytes=cache_config.get('max_bytes', 64 * 1024 * 1024),
+                ttl_seconds=cache_config.get('ttl_seconds', 7 * 24 * 3600)
+            ))
+
+        # Paraphrase-tolerant cache keyed by question embedding similarity
+        semantic_config = llm_config.get('semantic_cache', {}) or {}
+        self.semantic_cache = None
+        if semantic_config.get('enabled', False):
+            self.semantic_cache = SemanticCache(
+                similarity_threshold=semantic_config.get('similarity_threshold', 0.92),
+                max_entries=semantic_config.get('max_entries', 4096)
+            )
+
+        # Cache counters are read at export time
+        metrics.register_collector('caches', self._cache_metrics)
+
+        if self.config.get('agent', {}).get('warm_up', False):
+            self.warm_up(background=True)
         
-        logger.info(f"InsuranceAgent initialized by {self.current_user}")
+        logger.info(f"InsuranceAgent initialized by {self.current_user} in {sum(self.startup_timings.values()):.1f}ms")
 
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from YAML file"""
-        try:
-            with open(config_path, 'r') as f:
-                return yaml.safe_load(f)
-        except Exception as e:
-            logger.error(f"Error loading config: {str(e)}")
-            raise
+        return load_config(config_path)
+
+    def _timed(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Run a startup step and record its duration"""
+        started = time.perf_counter()
+        result = factory()
+        self.startup_timings[f"{name}_ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+    def warm_up(self, background: bool = True, include_llm: bool = True) -> Optional[threading.Thread]:
+        """Load the embedder, Chroma collections and (optionally) the LLM ahead of the first request.
+
+        With ``background`` the work runs on a daemon thread, which is
+        returned; requests arriving meanwhile simply wait on the same locks.
+        """
+        def run():
+            try:
+                self._timed('warm_up_vector_store', self.vector_store.warm_up)
+                if include_llm:
+                    self._timed('warm_up_llm', self.llm_handler.warm_up)
+                logger.info("InsuranceAgent warm-up complete")
+            except Exception as e:
+                logger.error(f"Error warming up: {str(e)}")
+
+        if not background:
+            run()
+            return None
+
+        self.warm_up_thread = threading.Thread(target=run, name="agent-warm-up", daemon=True)
+        self.warm_up_thread.start()
+        return self.warm_up_thread
+
+    def get_startup_report(self) -> Dict[str, Any]:
+        """Get a breakdown of construction time and of the lazy loads that have happened so far"""
+        return {
+            'init_ms': dict(self.startup_timings),
+            'vector_store_loads_ms': dict(self.vector_store.load_timings),
+            'llm_loads_ms': dict(self.llm_handler.load_timings),
+            'llm_loaded': self.llm_handler.is_loaded,
+            'warm_up_running': self.warm_up_thread is not None and self.warm_up_thread.is_alive()
+        }
 
-    def process_documents(self, file_paths: list):
-        """Process and store documents"""
+    def reset_after_fork(self):
+        """Reopen inherited database handles and threads in a forked worker process"""
+        self.vector_store.reset_after_fork()
+        self.llm_handler.reset_after_fork()
+        if self.llm_cache is not None:
+            self.llm_cache.reopen()
+        self.warm_up_thread = None
+
+    def reload_indexes(self):
+        """Reload the keyword and field indexes from disk, e.g. in a worker forked from an older snapshot"""
+        self.vector_store.reload_keyword_index()
+        if self.field_index is not None:
+            self.field_index = FieldIndex(str(self.field_index.index_path), min_confidence=self.field_index.min_confidence)
+            self.ingest_pipeline.field_index = self.field_index
+
+    def process_documents(self, file_paths: list) -> Dict[str, Any]:
+        """Process and store documents, returning an ingestion throughput report"""
         try:
-            for file_path in file_paths:
-                documents = self.document_processor.process_document(file_path)
-                self.vector_store.add_documents(documents)
-            logger.info(f"Processed {len(file_paths)} documents")
+            report = self.ingest_pipeline.run([str(file_path) for file_path in file_paths])
+            logger.info(f"Processed {report['files_processed']} documents")
+            return report
         except Exception as e:
             logger.error(f"Error processing documents: {str(e)}")
             raise
 
-    def answer_question(self, question: str) -> Dict[str, Any]:
-        """Process question and generate answer"""
+    def _answer_from_fields(self, question: str, policy: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Answer directly from the field index when a coverage field of the named policy matches confidently"""
+        if self.field_index is None:
+            return None
+        with metrics.span('field_lookup'):
+            match = self.field_index.lookup(question, policy=policy)
+        if match is None:
+            return None
+
+        logger.info(f"Answered from field index (confidence {match['confidence']:.2f})")
+        return {
+            'response': match['response'],
+            'similar_documents': [{
+                'content': field['line'],
+                'metadata': {
+                    'source': field['source'],
+                    'doc_type': field['doc_type'],
+                    'section': field['section'],
+                    'subsection': field['subsection']
+                }
+            } for field in match['fields'][:2]],
+            'timestamp': self.current_date,
+            'user': self.current_user,
+            'cached': False,
+            'answered_from': 'field_index',
+            'confidence': match['confidence']
+        }
+
+    def _get_cached(self,
+                    question: str,
+                    query_embedding: Optional[List[float]],
+                    similar_docs: List[Dict[str, Any]]) -> Optional[str]:
+        """Look up a cached response: exact question first, then semantically similar ones"""
+        doc_ids = [doc['id'] for doc in similar_docs]
+        settings = self.llm_handler.generation_settings()
+        with metrics.span('cache_lookup'):
+            if self.llm_cache is not None:
+                cached = self.llm_cache.get_cached_response(question, doc_ids, settings)
+                if cached is not None:
+                    return cached
+            if self.semantic_cache is not None and query_embedding is not None:
+                return self.semantic_cache.lookup(query_embedding, doc_ids, settings)
+            return None
+
+    def _store_cached(self,
+                      question: str,
+                      query_embedding: Optional[List[float]],
+                      similar_docs: List[Dict[str, Any]],
+                      response: str,
+                      generation_ms: float):
+        """Cache a generated response unless generation failed"""
+        if response.startswith("Error generating response"):
+            return
+        doc_ids = [doc['id'] for doc in similar_docs]
+        settings = self.llm_handler.generation_settings()
+        if self.llm_cache is not None:
+            self.llm_cache.cache_response(question, doc_ids, response, settings)
+        if self.semantic_cache is not None and query_embedding is not None:
+            self.semantic_cache.add(question, query_embedding, doc_ids, response, generation_ms, settings)
+
+    def _retrieve(self, question: str) -> Tuple[Optional[List[float]], List[Dict[str, Any]]]:
+        """Retrieve context for a question, with its embedding unless keyword search sufficed"""
+        similar_docs = self.vector_store.search_keyword_only(question)
+        if similar_docs is not None:
+            return None, similar_docs
+        query_embedding = self.vector_store.embed_queries([question])[0]
+        return query_embedding, self.vector_store.search_similar(question, query_embedding=query_embedding)
+
+    @staticmethod
+    def _answer_source(result: Dict[str, Any]) -> str:
+        """Where an answer came from, for the rag_answers_total counter"""
+        if 'answered_from' in result:
+            return result['answered_from']
+        if 'cached' in result:
+            return 'cache' if result['cached'] else 'llm'
+        return 'none'  # no relevant documents, or an error
+
+    def answer_question(self, question: str, policy: Optional[str] = None) -> Dict[str, Any]:
+        """Process question and generate answer.
+
+        ``policy`` (a policy number or source file) lets the field index
+        answer questions that do not name their policy. With metrics
+        enabled the result also carries ``stage_ms``, the milliseconds
+        spent in each pipeline stage for this question.
+        """
+        with metrics.trace("answer") as trace:
+            result = self._answer_question(question, policy)
+        if trace is not None:
+            metrics.increment('rag_answers_total', source=self._answer_source(result))
+            result['stage_ms'] = trace.as_dict()
+        return result
+
+    def _answer_question(self, question: str, policy: Optional[str] = None) -> Dict[str, Any]:
         try:
             # Log the incoming question
             logger.info(f"Processing question: {question}")
+
+            # Exact coverage-field answers skip retrieval and generation entirely
+            field_answer = self._answer_from_fields(question, policy)
+            if field_answer is not None:
+                return field_answer
             
-            # Get relevant documents from vector store
-            similar_docs = self.vector_store.search_similar(question)
+            # Get relevant documents from vector store, reusing the embedding for the semantic cache
+            query_embedding, similar_docs = self._retrieve(question)
             
             if not similar_docs:
                 logger.warning("No relevant documents found")
@@ -57,22 +259,34 @@ class InsuranceAgent:
                     'user': self.current_user
                 }
             
-            # Generate response using LLM
-            response = self.llm_handler.generate_response(
-                question=question,
-                context_docs=similar_docs
-            )
-            
-            # Log successful response
-            logger.info("Response generated successfully")
+            cached = self._get_cached(question, query_embedding, similar_docs)
+            if cached is not None:
+                logger.info("Response served from cache")
+                response = cached
+            else:
+                # Generate response using LLM
+                generation_started = time.perf_counter()
+                response = self.llm_handler.generate_response(
+                    question=question,
+                    context_docs=similar_docs
+                )
+                generation_ms = (time.perf_counter() - generation_started) * 1000
+                self._store_cached(question, query_embedding, similar_docs, response, generation_ms)
+
+                # Log successful response
+                logger.info("Response generated successfully")
             
             return {
                 'response': response,
                 'similar_documents': similar_docs[:2],  # Return top 2 relevant documents
                 'timestamp': self.current_date,
-                'user': self.current_user
+                'user': self.current_user,
+                'cached': cached is not None
             }
 
+        except GenerationUnavailable:
+            # Overload is the caller's to report; it is not an answer
+            raise
         except Exception as e:
             logger.error(f"Error processing question: {str(e)}")
             return {
@@ -80,4 +294,200 @@ class InsuranceAgent:
                 'similar_documents': [],
                 'timestamp': self.current_date,
                 'user': self.current_user
-            }
\ No newline at end of file
+            }
+
+    def answer_question_stream(self,
+                               question: str,
+                               result: Optional[Dict[str, Any]] = None,
+                               policy: Optional[str] = None,
+                               cancel: Optional[threading.Event] = None) -> Iterator[str]:
+        """Answer a question, yielding response text as it is generated.
+
+        When ``result`` is given it is filled with the similar documents
+        before the first piece of text is yielded. Setting ``cancel`` stops
+        generation within one decoding step, even between pieces.
+        """
+        logger.info(f"Processing question (streaming): {question}")
+
+        field_answer = self._answer_from_fields(question, policy)
+        if field_answer is not None:
+            if result is not None:
+                result.update({k: v for k, v in field_answer.items() if k != 'response'})
+            yield field_answer['response']
+            return
+
+        query_embedding, similar_docs = self._retrieve(question)
+        if result is not None:
+            result['similar_documents'] = similar_docs[:2]  # Return top 2 relevant documents
+            result['timestamp'] = self.current_date
+            result['user'] = self.current_user
+
+        if not similar_docs:
+            logger.warning("No relevant documents found")
+            yield "I couldn't find any relevant information in the policy documents. Could you please rephrase your question or be more specific?"
+            return
+
+        cached = self._get_cached(question, query_embedding, similar_docs)
+        if cached is not None:
+            yield cached
+            return
+
+        pieces = []
+        generation_started = time.perf_counter()
+        for piece in self.llm_handler.generate_response_stream(
+            question=question,
+            context_docs=similar_docs,
+            stop_event=cancel
+        ):
+            pieces.append(piece)
+            yield piece
+        if cancel is not None and cancel.is_set():
+            # A cut-off answer is not worth caching
+            return
+        generation_ms = (time.perf_counter() - generation_started) * 1000
+        self._store_cached(question, query_embedding, similar_docs, "".join(pieces), generation_ms)
+
+    def answer_questions(self, questions: List[str]) -> Dict[str, Any]:
+        """Answer a batch of questions with batched retrieval and generation.
+
+        Returns per-question results in input order, in the same shape as
+        ``answer_question``, plus stage timings in milliseconds for the
+        whole batch (and ``stage_ms`` per pipeline stage with metrics
+        enabled).
+        """
+        with metrics.trace("answer_batch") as trace:
+            batch = self._answer_questions(questions)
+        if trace is not None:
+            for result in batch['results']:
+                metrics.increment('rag_answers_total', source=self._answer_source(result))
+            batch['stage_ms'] = trace.as_dict()
+        return batch
+
+    def _answer_questions(self, questions: List[str]) -> Dict[str, Any]:
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        try:
+            logger.info(f"Processing batch of {len(questions)} questions")
+
+            # Questions answered from the field index skip retrieval and generation
+            results: List[Optional[Dict[str, Any]]] = [self._answer_from_fields(question) for question in questions]
+            to_retrieve = [idx for idx, result in enumerate(results) if result is None]
+            retrieve_questions = [questions[idx] for idx in to_retrieve]
+
+            # Identifier-heavy questions are served by keyword search without embedding
+            keyword_started = time.perf_counter()
+            similar_docs_list: List[List[Dict[str, Any]]] = [[] for _ in questions]
+            to_embed = []
+            for idx in to_retrieve:
+                keyword_docs = self.vector_store.search_keyword_only(questions[idx])
+                if keyword_docs is None:
+                    to_embed.append(idx)
+                else:
+                    similar_docs_list[idx] = keyword_docs
+            keyword_ms = (time.perf_counter() - keyword_started) * 1000
+            embed_questions = [questions[idx] for idx in to_embed]
+
+            # Batch-embed and batch-query the remaining questions
+            embed_started = time.perf_counter()
+            retrieved_embeddings = self.vector_store.embed_queries(embed_questions)
+            timings['embed_ms'] = (time.perf_counter() - embed_started) * 1000
+
+            query_timings: Dict[str, float] = {'query_ms': 0.0}
+            retrieved_docs = self.vector_store.search_similar_batch(
+                embed_questions,
+                timings=query_timings,
+                query_embeddings=retrieved_embeddings
+            ) if embed_questions else []
+            timings['query_ms'] = query_timings['query_ms'] + keyword_ms
+
+            query_embeddings: List[Optional[List[float]]] = [None] * len(questions)
+            for idx, embedding, similar_docs in zip(to_embed, retrieved_embeddings, retrieved_docs):
+                query_embeddings[idx] = embedding
+                similar_docs_list[idx] = similar_docs
+
+            to_generate = []
+            for idx in to_retrieve:
+                question, similar_docs = questions[idx], similar_docs_list[idx]
+                if not similar_docs:
+                    results[idx] = {
+                        'response': "I couldn't find any relevant information in the policy documents. Could you please rephrase your question or be more specific?",
+                        'similar_documents': [],
+                        'timestamp': self.current_date,
+                        'user': self.current_user
+                    }
+                    continue
+
+                cached = self._get_cached(question, query_embeddings[idx], similar_docs)
+                if cached is not None:
+                    results[idx] = {
+                        'response': cached,
+                        'similar_documents': similar_docs[:2],
+                        'timestamp': self.current_date,
+                        'user': self.current_user,
+                        'cached': True
+                    }
+                else:
+                    to_generate.append(idx)
+
+            # Padded batched generation for questions with context
+            generation_started = time.perf_counter()
+            if to_generate:
+                responses = self.llm_handler.generate_responses(
+                    [questions[idx] for idx in to_generate],
+                    [similar_docs_list[idx] for idx in to_generate]
+                )
+                # Each answer is charged an equal share of the batch generation time
+                generation_ms = (time.perf_counter() - generation_started) * 1000 / len(to_generate)
+                for idx, response in zip(to_generate, responses):
+                    self._store_cached(questions[idx], query_embeddings[idx], similar_docs_list[idx], response, generation_ms)
+                    results[idx] = {
+                        'response': response,
+                        'similar_documents': similar_docs_list[idx][:2],  # Return top 2 relevant documents
+                        'timestamp': self.current_date,
+                        'user': self.current_user,
+                        'cached': False
+                    }
+            timings['generation_ms'] = (time.perf_counter() - generation_started) * 1000
+            timings['total_ms'] = (time.perf_counter() - started) * 1000
+
+            logger.info(f"Batch of {len(questions)} questions answered in {timings['total_ms']:.1f}ms")
+            return {'results': results, 'timings': timings}
+
+        except Exception as e:
+            logger.error(f"Error processing question batch: {str(e)}")
+            timings['total_ms'] = (time.perf_counter() - started) * 1000
+            return {
+                'results': [{
+                    'response': f"I apologize, but I encountered an error while processing your question. Please try again.",
+                    'similar_documents': [],
+                    'timestamp': self.current_date,
+                    'user': self.current_user
+                } for _ in questions],
+                'timings': timings
+            }
+
+    def _cache_metrics(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Numeric cache counters as (metric, labels, value) gauges"""
+        gauges = []
+        for cache, stats in self.get_cache_stats().items():
+            for name, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges.append((f"rag_cache_{name}", {'cache': cache}, value))
+        return gauges
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Stage latency summaries, counters and cache gauges from the metrics registry"""
+        return metrics.get_snapshot()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get response cache, semantic cache, query embedding cache and field index counters for those that are enabled"""
+        stats = {}
+        if self.llm_cache is not None:
+            stats['response_cache'] = self.llm_cache.get_stats()
+        if self.semantic_cache is not None:
+            stats['semantic_cache'] = self.semantic_cache.get_stats()
+        if self.vector_store.query_cache is not None:
+            stats['query_embeddings'] = self.vector_store.query_cache.get_stats()
+        if self.field_index is not None:
+            stats['field_index'] = self.field_index.get_stats()
+        return stats
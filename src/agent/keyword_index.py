@@ -0,0 +1,299 @@
+# src/agent/keyword_index.py
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+from array import array
+from pathlib import Path
+import math
+import re
+import sqlite3
+import threading
+import numpy as np
+from loguru import logger
+
+# Words, numbers and compound identifiers such as "auto-2025-001", "1-800-555-claim" or "1,000"
+TERM_PATTERN = re.compile(r"[a-z0-9]+(?:[-/.,:][a-z0-9]+)*")
+PART_PATTERN = re.compile(r"[-/.,:]")
+
+# Postings are stored in array('I') buffers and scored through zero-copy numpy views
+POSTING_DTYPE = np.dtype(f"u{array('I').itemsize}")
+
+
+def tokenize(text: str) -> List[str]:
+    """Index terms of a text; compound identifiers are indexed whole and by part"""
+    terms = []
+    for term in TERM_PATTERN.findall(text.lower()):
+        terms.append(term)
+        if PART_PATTERN.search(term):
+            terms.extend(part for part in PART_PATTERN.split(term) if part)
+    return terms
+
+
+def is_identifier(term: str) -> bool:
+    """Whether a query term is an exact identifier (policy number, phone number, amount)"""
+    return any(ch.isdigit() for ch in term) and len(term) >= 3
+
+
+class KeywordIndex:
+    """In-process BM25 index over chunk text.
+
+    Only chunk IDs, lengths and postings are held: each term maps to two
+    parallel ``array('I')`` buffers of document numbers and term
+    frequencies, in increasing document order. Chunk text stays in the
+    vector store, which callers read for the hits they keep. Removed chunks
+    are tombstoned and dropped when the index is compacted on save. The
+    index is persisted to SQLite with each posting list as a pair of blobs,
+    along with the ingest manifest stamp it reflects.
+    """
+
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75):
+        self.index_dir = Path(index_dir)
+        self.k1 = float(k1)
+        self.b = float(b)
+        self.lock = threading.RLock()
+        self.dirty = False
+        self.persisted = False
+        self.manifest_stamp = ""
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        """Start from an empty index"""
+        self.ids: List[Optional[str]] = []
+        self.lengths = array('I')
+        self.alive = array('B')
+        self.docno_by_id: Dict[str, int] = {}
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.total_length = 0
+        self.deleted = 0
+
+    def __len__(self) -> int:
+        return len(self.docno_by_id)
+
+    @property
+    def index_path(self) -> Path:
+        return self.index_dir / "keyword_index.sqlite3"
+
+    @staticmethod
+    def _buffer(blob: bytes) -> array:
+        buffer = array('I')
+        buffer.frombytes(blob)
+        return buffer
+
+    def _load(self):
+        """Load the persisted index, if any"""
+        if not self.index_path.exists():
+            return
+        try:
+            connection = sqlite3.connect(str(self.index_path))
+            try:
+                stamp = connection.execute("SELECT value FROM meta WHERE key = 'manifest_stamp'").fetchone()
+                for docno, doc_id, length in connection.execute("SELECT docno, id, length FROM docs ORDER BY docno"):
+                    if docno != len(self.ids):
+                        raise ValueError(f"Document numbers are not contiguous at {docno}")
+                    self.ids.append(doc_id)
+                    self.lengths.append(length)
+                    self.docno_by_id[doc_id] = docno
+                    self.total_length += length
+                self.alive = array('B', [1]) * len(self.ids)
+                for term, docnos, tfs in connection.execute("SELECT term, docnos, tfs FROM postings"):
+                    self.postings[term] = (self._buffer(docnos), self._buffer(tfs))
+            finally:
+                connection.close()
+            self.manifest_stamp = stamp[0] if stamp else ""
+            self.persisted = True
+        except Exception as e:
+            logger.error(f"Error loading keyword index, it will be rebuilt: {str(e)}")
+            self._reset()
+
+    def add(self, doc_id: str, content: str):
+        """Index a chunk, replacing any previous version with the same ID"""
+        with self.lock:
+            if doc_id in self.docno_by_id:
+                self.remove([doc_id])
+
+            terms = tokenize(content)
+            counts: Dict[str, int] = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+
+            docno = len(self.ids)
+            self.ids.append(doc_id)
+            self.lengths.append(len(terms))
+            self.alive.append(1)
+            self.docno_by_id[doc_id] = docno
+            self.total_length += len(terms)
+
+            for term, count in counts.items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = (array('I'), array('I'))
+                posting[0].append(docno)
+                posting[1].append(count)
+            self.dirty = True
+
+    def remove(self, ids: Iterable[str]):
+        """Tombstone chunks by ID"""
+        with self.lock:
+            for doc_id in ids:
+                docno = self.docno_by_id.pop(doc_id, None)
+                if docno is None:
+                    continue
+                self.alive[docno] = 0
+                self.total_length -= self.lengths[docno]
+                self.ids[docno] = None
+                self.deleted += 1
+                self.dirty = True
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+            self.dirty = True
+
+    def search(self, query: str, n_results: int) -> List[Dict[str, Any]]:
+        """Top ``n_results`` chunk IDs by BM25 score, best first, without their text"""
+        with self.lock:
+            live = len(self.docno_by_id)
+            terms = set(tokenize(query))
+            if not live or not terms:
+                return []
+
+            avg_length = self.total_length / live
+            lengths = np.frombuffer(self.lengths, dtype=POSTING_DTYPE).astype(np.float32)
+            scores = np.zeros(len(self.ids), dtype=np.float32)
+            for term in terms:
+                posting = self.postings.get(term)
+                if posting is None or not len(posting[0]):
+                    continue
+                docnos = np.frombuffer(posting[0], dtype=POSTING_DTYPE)
+                tfs = np.frombuffer(posting[1], dtype=POSTING_DTYPE).astype(np.float32)
+                df = len(docnos)
+                idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[docnos] / avg_length)
+                scores[docnos] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+                del docnos, tfs
+
+            if self.deleted:
+                scores *= np.frombuffer(self.alive, dtype=np.uint8)
+            del lengths
+
+            matched = np.flatnonzero(scores > 0)
+            if not len(matched):
+                return []
+            if len(matched) > n_results:
+                matched = matched[np.argpartition(-scores[matched], n_results - 1)[:n_results]]
+            ranked = matched[np.argsort(-scores[matched], kind='stable')]
+
+            return [
+                {
+                    'id': self.ids[docno],
+                    # IDs start with the collection name, as VectorStore.document_id builds them
+                    'policy_type': self.ids[docno].split('_', 1)[0],
+                    'distance': None,
+                    'bm25_score': float(scores[docno])
+                }
+                for docno in ranked
+            ]
+
+    def contains_terms(self, doc_id: str, terms: Iterable[str]) -> bool:
+        """Whether a chunk contains every one of the given terms"""
+        with self.lock:
+            docno = self.docno_by_id.get(doc_id)
+            if docno is None:
+                return False
+            for term in terms:
+                posting = self.postings.get(term)
+                if posting is None:
+                    return False
+                docnos = np.frombuffer(posting[0], dtype=POSTING_DTYPE)
+                position = int(np.searchsorted(docnos, docno))
+                found = position < len(docnos) and docnos[position] == docno
+                del docnos
+                if not found:
+                    return False
+            return True
+
+    def _compact(self):
+        """Drop tombstoned chunks and renumber the rest, keeping posting order"""
+        alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        renumber = np.cumsum(alive, dtype=np.int64) - 1
+        lengths = np.frombuffer(self.lengths, dtype=POSTING_DTYPE)[alive]
+
+        postings: Dict[str, Tuple[array, array]] = {}
+        for term, (term_docnos, term_tfs) in self.postings.items():
+            docnos = np.frombuffer(term_docnos, dtype=POSTING_DTYPE)
+            keep = alive[docnos]
+            if keep.any():
+                postings[term] = (
+                    self._buffer(renumber[docnos[keep]].astype(POSTING_DTYPE).tobytes()),
+                    self._buffer(np.frombuffer(term_tfs, dtype=POSTING_DTYPE)[keep].tobytes())
+                )
+            del docnos
+        ids = [doc_id for doc_id in self.ids if doc_id is not None]
+
+        total_length = self.total_length
+        self._reset()
+        self.ids = ids
+        self.lengths = self._buffer(lengths.tobytes())
+        self.alive = array('B', [1]) * len(ids)
+        self.docno_by_id = {doc_id: docno for docno, doc_id in enumerate(ids)}
+        self.postings = postings
+        self.total_length = total_length
+
+    def save(self, manifest_stamp: Optional[str] = None):
+        """Compact and atomically persist the index if it changed.
+
+        ``manifest_stamp`` records which ingest manifest the index reflects,
+        so the next load can skip reconciling when it has not changed.
+        """
+        try:
+            with self.lock:
+                stamp = self.manifest_stamp if manifest_stamp is None else manifest_stamp
+                if not self.dirty and stamp == self.manifest_stamp and self.persisted:
+                    return
+                if self.deleted:
+                    self._compact()
+
+                self.index_dir.mkdir(parents=True, exist_ok=True)
+                connection = sqlite3.connect(str(self.index_path))
+                try:
+                    connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS docs (docno INTEGER PRIMARY KEY, id TEXT NOT NULL, length INTEGER NOT NULL)"
+                    )
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS postings (term TEXT PRIMARY KEY, docnos BLOB NOT NULL, tfs BLOB NOT NULL)"
+                    )
+                    # One transaction, so readers see the old index or the new one
+                    with connection:
+                        connection.execute("DELETE FROM docs")
+                        connection.execute("DELETE FROM postings")
+                        connection.executemany(
+                            "INSERT INTO docs (docno, id, length) VALUES (?, ?, ?)",
+                            zip(range(len(self.ids)), self.ids, self.lengths)
+                        )
+                        connection.executemany(
+                            "INSERT INTO postings (term, docnos, tfs) VALUES (?, ?, ?)",
+                            ((term, docnos.tobytes(), tfs.tobytes()) for term, (docnos, tfs) in self.postings.items())
+                        )
+                        connection.execute(
+                            "INSERT OR REPLACE INTO meta (key, value) VALUES ('manifest_stamp', ?)", (stamp,)
+                        )
+                finally:
+                    connection.close()
+
+                self.manifest_stamp = stamp
+                self.persisted = True
+                self.dirty = False
+        except Exception as e:
+            logger.error(f"Error saving keyword index: {str(e)}")
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index size counters"""
+        with self.lock:
+            return {
+                'documents': len(self.docno_by_id),
+                'terms': len(self.postings),
+                'postings': sum(len(posting[0]) for posting in self.postings.values()),
+                'tombstones': self.deleted,
+                'disk_bytes': self.index_path.stat().st_size if self.index_path.exists() else 0
+            }
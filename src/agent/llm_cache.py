@@ -1,47 +1,187 @@
 # src/agent/llm_cache.py
-from typing import Dict, Any
-import json
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict, deque
 from pathlib import Path
-from datetime import datetime
 import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from loguru import logger
 
 class LLMCache:
-    def __init__(self, cache_dir: str = "cache/llm"):
+    """Two-tier response cache: in-process LRU in front of a compact SQLite store.
+
+    Keys are built from the normalized question, the IDs of the chunks
+    retrieved for it and the generation settings (model, backend, token
+    limit, temperature, system prompt), so entries never embed the context
+    text and a settings change never serves stale answers. Responses
+    are stored zlib-compressed; entries expire after ``ttl_seconds`` and
+    the least recently used ones are evicted once the store exceeds
+    ``max_bytes``.
+    """
+
+    def __init__(self,
+                 cache_dir: str = "cache/llm",
+                 memory_entries: int = 256,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: float = 7 * 24 * 3600):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.current_date = "2025-01-20 22:57:56"
         self.current_user = "objectgyan"
+        self.memory_entries = int(memory_entries)
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds)
+
+        self.lock = threading.Lock()
+        self.memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self.connection = sqlite3.connect(str(self.cache_dir / "responses.sqlite3"), check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self.connection.commit()
+        self.disk_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        # Counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lookup_ms: deque = deque(maxlen=1024)
+
+    def reopen(self):
+        """Open a fresh SQLite connection, e.g. in a forked worker that must not share the parent's"""
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(self.cache_dir / "responses.sqlite3"), check_same_thread=False)
+
+    def _get_cache_key(self, question: str, doc_ids: List[str], settings: str = "") -> str:
+        """Generate cache key from the normalized question, retrieved chunk IDs and generation settings"""
+        normalized = " ".join(question.lower().split())
+        combined = f"{settings}|{normalized}|{','.join(sorted(doc_ids))}"
+        return hashlib.sha256(combined.encode('utf-8')).hexdigest()
+
+    def get_cached_response(self, question: str, doc_ids: List[str], settings: str = "") -> Optional[str]:
+        """Get cached response if available and not expired"""
+        started = time.perf_counter()
+        cache_key = self._get_cache_key(question, doc_ids, settings)
+        now = time.time()
+        try:
+            with self.lock:
+                entry = self.memory.get(cache_key)
+                if entry is not None:
+                    response, created_at = entry
+                    if now - created_at <= self.ttl_seconds:
+                        self.memory.move_to_end(cache_key)
+                        self.memory_hits += 1
+                        return response
+                    del self.memory[cache_key]
+
+                row = self.connection.execute(
+                    "SELECT response, created_at, size FROM responses WHERE key = ?", (cache_key,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+
+                blob, created_at, size = row
+                if now - created_at > self.ttl_seconds:
+                    self.connection.execute("DELETE FROM responses WHERE key = ?", (cache_key,))
+                    self.connection.commit()
+                    self.disk_bytes -= size
+                    self.expirations += 1
+                    self.misses += 1
+                    return None
+
+                self.connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, cache_key))
+                self.connection.commit()
+                response = zlib.decompress(blob).decode('utf-8')
+                self._remember(cache_key, response, created_at)
+                self.disk_hits += 1
+                return response
+        except Exception as e:
+            logger.error(f"Error reading response cache: {str(e)}")
+            return None
+        finally:
+            self.lookup_ms.append((time.perf_counter() - started) * 1000)
+
+    def cache_response(self,
+                      question: str,
+                      doc_ids: List[str],
+                      response: str,
+                      settings: str = ""):
+        """Cache the response in memory and on disk"""
+        cache_key = self._get_cache_key(question, doc_ids, settings)
+        now = time.time()
+        blob = zlib.compress(response.encode('utf-8'))
+        try:
+            with self.lock:
+                self._remember(cache_key, response, now)
+
+                row = self.connection.execute("SELECT size FROM responses WHERE key = ?", (cache_key,)).fetchone()
+                if row is not None:
+                    self.disk_bytes -= row[0]
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (cache_key, blob, len(blob), now, now)
+                )
+                self.disk_bytes += len(blob)
+                self._evict(now)
+                self.connection.commit()
+        except Exception as e:
+            logger.error(f"Error writing response cache: {str(e)}")
+
+    def _remember(self, cache_key: str, response: str, created_at: float):
+        """Insert into the in-process LRU, evicting the least recently used entry"""
+        self.memory[cache_key] = (response, created_at)
+        self.memory.move_to_end(cache_key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict(self, now: float):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        expired = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created_at < ?",
+            (now - self.ttl_seconds,)
+        ).fetchone()
+        if expired[0]:
+            self.connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.disk_bytes -= expired[1]
+            self.expirations += expired[0]
+
+        if self.disk_bytes <= self.max_bytes:
+            return
+
+        # Evict down to 90% of the budget so eviction is not triggered on every write
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        for key, size in self.connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if self.disk_bytes <= target:
+                break
+            victims.append((key,))
+            self.disk_bytes -= size
+            self.memory.pop(key, None)
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.evictions += len(victims)
 
-    def _get_cache_key(self, question: str, context: str) -> str:
-        """Generate cache key from question and context"""
-        combined = f"{question}|{context}"
-        return hashlib.md5(combined.encode()).hexdigest()
-
-    def get_cached_response(self, question: str, context: str) -> Dict[str, Any]:
-        """Get cached response if available"""
-        cache_key = self._get_cache_key(question, context)
-        cache_file = self.cache_dir / f"{cache_key}.json"
-        
-        if cache_file.exists():
-            with open(cache_file, 'r') as f:
-                return json.load(f)
-        return None
-
-    def cache_response(self, 
-                      question: str, 
-                      context: str, 
-                      response: str):
-        """Cache the response"""
-        cache_key = self._get_cache_key(question, context)
-        cache_file = self.cache_dir / f"{cache_key}.json"
-        
-        cache_data = {
-            'question': question,
-            'context': context,
-            'response': response,
-            'cached_at': self.current_date,
-            'cached_by': self.current_user
-        }
-        
-        with open(cache_file, 'w') as f:
-            json.dump(cache_data, f, indent=2)
\ No newline at end of file
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters, sizes and lookup latency"""
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            latencies = sorted(self.lookup_ms)
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'memory_entries': len(self.memory),
+                'disk_bytes': self.disk_bytes,
+                'lookup_ms_p50': latencies[len(latencies) // 2] if latencies else 0.0,
+                'lookup_ms_max': latencies[-1] if latencies else 0.0
+            }
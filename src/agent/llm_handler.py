@@ -1,125 +1,802 @@
 # src/agent/llm_handler.py
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterator, Optional, Tuple
 from loguru import logger
 from datetime import datetime
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
+from functools import lru_cache
+from threading import Event, Lock, Thread
+import hashlib
+import subprocess
+import time
+from .backends import create_generator
+from .batch_scheduler import GenerationScheduler, GenerationUnavailable
+from .metrics import metrics, RATE_BUCKETS
+from .prefix_cache import PrefixKVCache
+from .context_packer import ContextPacker
+from .model_pool import ModelPool, LoadedModel
+
+# torch and transformers are imported on first model use so that importing
+# the package, CLI tools and ingest-only jobs never pay for them
+
+# Role tags used in the prompt; seeing one of these in generated text marks a new turn
+PROMPT_ROLES = ('System', 'Context', 'Human', 'Assistant')
+
+SYSTEM_PROMPT = """### System: You are an insurance policy assistant. 
+Provide accurate, clear answers based only on the provided policy information.
+
+### Context: 
+"""
+
+
+class _StopOnEvent:
+    """Stopping criterion that ends generation once the stream consumer goes away"""
+
+    def __init__(self, event: Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.event.is_set()
+
+
+class _GenerationTimer:
+    """Stopping criterion that never stops, used to split generate() into prefill and decode.
+
+    generate() checks its stopping criteria once per new token, so the
+    first check marks the end of prefill and the number of checks is the
+    number of tokens generated per sequence.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_step_at: Optional[float] = None
+        self.steps = 0
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        if self.first_step_at is None:
+            self.first_step_at = time.perf_counter()
+        self.steps += 1
+        return False
+
+    def record(self, prompt_tokens: int, batch_size: int = 1):
+        """Record prefill and decode spans, token counts and decode throughput"""
+        finished = time.perf_counter()
+        first_step_at = self.first_step_at or finished
+        decode_s = finished - first_step_at
+        metrics.record_stage('prefill', first_step_at - self.started)
+        metrics.record_stage('decode', decode_s)
+        metrics.increment('rag_prompt_tokens_total', prompt_tokens * batch_size)
+        metrics.increment('rag_generated_tokens_total', self.steps * batch_size)
+        # The first token of each sequence comes out of prefill
+        if self.steps > 1 and decode_s > 0:
+            metrics.observe('rag_decode_tokens_per_second', (self.steps - 1) * batch_size / decode_s, buckets=RATE_BUCKETS)
+
+
+@lru_cache(maxsize=1)
+def _nvidia_driver_version() -> Optional[str]:
+    """Driver version reported by nvidia-smi, or None when it is unavailable"""
+    try:
+        output = subprocess.run(
+            ["nvidia-smi", "--query-gpu=driver_version", "--format=csv,noheader"],
+            capture_output=True, text=True, timeout=5, check=True
+        ).stdout
+        return output.strip().splitlines()[0] or None
+    except (OSError, subprocess.SubprocessError, IndexError):
+        return None
+
+
+class _EchoStripper:
+    """Incrementally strips prompt role tags from streamed text.
+
+    Text that could be the start of a ``### Role:`` tag is held back until
+    it can be classified. An echoed ``### Assistant:`` tag is dropped and
+    streaming continues; any other role tag means the model has started a
+    new turn, so the stream ends.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+
+    def feed(self, text: str) -> str:
+        """Consume new text and return the part that is safe to emit"""
+        self.buffer += text
+        output = ""
+        while not self.done:
+            idx = self.buffer.find("###")
+            if idx == -1:
+                # Hold back trailing '#' characters that may open a tag
+                held = len(self.buffer) - len(self.buffer.rstrip('#'))
+                output += self.buffer[:len(self.buffer) - held]
+                self.buffer = self.buffer[len(self.buffer) - held:]
+                break
+
+            output += self.buffer[:idx]
+            rest = self.buffer[idx:]
+            colon = rest.find(':')
+            if colon == -1 and len(rest) < 16:
+                # Wait for the rest of a possible role tag
+                self.buffer = rest
+                break
+
+            role = rest[3:colon].strip() if colon != -1 else None
+            if role == 'Assistant':
+                self.buffer = rest[colon + 1:].lstrip()
+            elif role in PROMPT_ROLES:
+                self.buffer = ""
+                self.done = True
+            else:
+                output += rest[:3]
+                self.buffer = rest[3:]
+        return output
+
+    def flush(self) -> str:
+        """Return whatever is still held back at the end of the stream"""
+        output = "" if self.done else self.buffer
+        self.buffer = ""
+        return output
+
 
 class LLMHandler:
     def __init__(self, config: Dict[str, Any]):
         self.current_date = "2025-01-20 23:18:40"
         self.current_user = "objectgyan"
         self.config = config
-        self.model_name = "facebook/opt-350m"
-        
-        # Check GPU and CUDA version
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        if self.device == "cuda":
-            self.gpu_name = torch.cuda.get_device_name(0)
-            self.cuda_version = torch.version.cuda
-            logger.info(f"Using GPU: {self.gpu_name} with CUDA {self.cuda_version}")
-        else:
-            logger.warning("No GPU found, using CPU")
-            
-        self._initialize_model()
+        self.model_name = self.config.get('llm', {}).get('model', "facebook/opt-350m")
+        self.generation_batch_size = int(self.config.get('llm', {}).get('generation_batch_size', 8))
+        self.max_new_tokens = int(self.config.get('llm', {}).get('max_tokens', 500))
+        self.temperature = float(self.config.get('llm', {}).get('temperature', 0.3))
+
+        # Weight precision and optional torch.compile, resolved against the device at load time
+        self.precision_setting = str(self.config.get('llm', {}).get('precision', 'auto')).lower()
+        self._expected_precision: Optional[str] = None
+        self.compile_model = bool(self.config.get('llm', {}).get('compile', False))
+
+        # Models are loaded on first use, or ahead of time via warm_up, and kept in a bounded pool
+        pool_config = self.config.get('llm', {}).get('model_pool', {}) or {}
+        self.model_pool = ModelPool(
+            self._load_model,
+            max_bytes=pool_config.get('max_bytes', 4 * 1024 ** 3),
+            max_models=pool_config.get('max_models', 2)
+        )
+        self._swap_lock = Lock()
+        self.load_timings: Dict[str, float] = {}
+
+        # llm.backend echo or fixed_latency answers without a model, for offline benchmarks
+        self.backend = self.config.get('llm', {}).get('backend', "transformers")
+        self.generator = create_generator(self.config)
+
+        # Reuse of past_key_values for the fixed system prompt and recurring contexts
+        prefix_config = self.config.get('llm', {}).get('prefix_cache', {}) or {}
+        self.prefix_cache = None
+        if prefix_config.get('enabled', False):
+            self.prefix_cache = PrefixKVCache(
+                max_bytes=prefix_config.get('max_bytes', 512 * 1024 * 1024),
+                min_hits=prefix_config.get('context_min_hits', 2)
+            )
+
+        # Retrieved chunks are packed into the context window, leaving room for the answer
+        packing_config = self.config.get('llm', {}).get('context_packing', {}) or {}
+        self.context_packer = None
+        if packing_config.get('enabled', True):
+            self.context_packer = ContextPacker(
+                context_window=packing_config.get('context_window', 2048),
+                max_context_tokens=packing_config.get('max_context_tokens'),
+                dedupe_overlap=packing_config.get('dedupe_overlap', 0.5)
+            )
+
+        # Optional micro-batching of concurrent generate_response calls
+        scheduler_config = self.config.get('llm', {}).get('scheduler', {}) or {}
+        self.scheduler = None
+        if scheduler_config.get('enabled', False):
+            self.scheduler = GenerationScheduler(
+                self,
+                max_batch_size=scheduler_config.get('max_batch_size', self.generation_batch_size),
+                max_wait_ms=scheduler_config.get('max_wait_ms', 20),
+                max_queue_size=scheduler_config.get('max_queue_size', 0),
+                timeout_s=scheduler_config.get('timeout_s', 0)
+            )
+
         logger.info(f"LLMHandler initialized by {self.current_user}")
 
-    def _initialize_model(self):
-        """Initialize the model with CUDA 12.2 support"""
+    @property
+    def model(self):
+        """Current model, loaded on first access"""
+        return self._current().model
+
+    @property
+    def tokenizer(self):
+        """Tokenizer of the current model, loaded with it on first access"""
+        return self._current().tokenizer
+
+    @property
+    def device(self) -> str:
+        """Device the current model runs on, resolved when the model loads"""
+        return self._current().device
+
+    @property
+    def precision(self) -> Optional[str]:
+        """Precision the current model was loaded with, or None before it loads"""
+        loaded = self.model_pool.peek(self.model_name)
+        return loaded.precision if loaded is not None else None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.generator is not None or self.model_pool.peek(self.model_name) is not None
+
+    def _current(self, model_name: Optional[str] = None) -> LoadedModel:
+        """Resolve a model from the pool, defaulting to the current model.
+
+        Each request resolves its model once and uses that reference
+        throughout, so a concurrent change_model never mixes two models
+        within one request.
+        """
+        return self.model_pool.get(model_name or self.model_name)
+
+    def warm_up(self):
+        """Load the model ahead of the first request"""
+        if self.generator is None:
+            self._current()
+
+    def reset_after_fork(self):
+        """Restart the scheduler thread, which does not survive fork; loaded models are kept"""
+        if self.scheduler is not None:
+            self.scheduler = GenerationScheduler(
+                self,
+                max_batch_size=self.scheduler.max_batch_size,
+                max_wait_ms=self.scheduler.max_wait * 1000,
+                max_queue_size=self.scheduler.queue.maxsize,
+                timeout_s=self.scheduler.timeout_s
+            )
+
+    def change_model(self, model_name: str):
+        """Switch the default model without restarting.
+
+        The new model is loaded before the switch, so requests already in
+        flight finish on the model they started with and new requests keep
+        using the old model until the new one is ready.
+        """
         try:
+            if self.generator is None:
+                self.model_pool.get(model_name)
+            with self._swap_lock:
+                previous = self.model_name
+                self.model_name = model_name
+            logger.info(f"Switched model from {previous} to {model_name}")
+        except Exception as e:
+            logger.error(f"Error changing model: {str(e)}")
+            raise
+
+    def _load_model(self, model_name: str) -> LoadedModel:
+        """Load a model and its tokenizer with CUDA 12.2 support"""
+        try:
+            started = time.perf_counter()
+            import torch
+            from transformers import AutoConfig, AutoModelForCausalLM, AutoModelForSeq2SeqLM, AutoTokenizer
+            self.load_timings.setdefault('import_ms', (time.perf_counter() - started) * 1000)
+
+            # Check GPU and CUDA version
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            if device == "cuda":
+                self.gpu_name = torch.cuda.get_device_name(0)
+                self.cuda_version = torch.version.cuda
+                logger.info(f"Using GPU: {self.gpu_name} with CUDA {self.cuda_version}")
+            else:
+                logger.warning("No GPU found, using CPU")
+
+            precision = self._resolve_precision(device)
+
             # Initialize tokenizer
-            self.tokenizer = AutoTokenizer.from_pretrained(
-                self.model_name,
+            loading = time.perf_counter()
+            tokenizer = AutoTokenizer.from_pretrained(
+                model_name,
                 cache_dir="cache/models"
             )
+
+            # Encoder-decoder models such as flan-t5 need the seq2seq head
+            model_config = AutoConfig.from_pretrained(model_name, cache_dir="cache/models")
+            is_encoder_decoder = bool(getattr(model_config, 'is_encoder_decoder', False))
+            model_class = AutoModelForSeq2SeqLM if is_encoder_decoder else AutoModelForCausalLM
             
             # Initialize model with CUDA support
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_name,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                cache_dir="cache/models"
-            )
+            model_kwargs = {'cache_dir': "cache/models"}
+            if precision == "int8" and device == "cuda":
+                # bitsandbytes 8-bit weights, placed on the GPU by accelerate
+                model_kwargs.update(load_in_8bit=True, device_map="auto")
+            else:
+                model_kwargs['torch_dtype'] = {
+                    'fp16': torch.float16,
+                    'bf16': torch.bfloat16
+                }.get(precision, torch.float32)
+            model = model_class.from_pretrained(model_name, **model_kwargs)
+            model.eval()
+
+            if precision == "int8" and device == "cpu":
+                # Dynamic quantization: int8 Linear weights, activations quantized per batch
+                quantizing = time.perf_counter()
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                self.load_timings['quantize_ms'] = (time.perf_counter() - quantizing) * 1000
             
             # Move model to GPU if available
-            if self.device == "cuda":
-                self.model = self.model.to(self.device)
+            if device == "cuda":
+                if precision != "int8":
+                    model = model.to(device)
                 logger.info(f"GPU Memory Allocated: {torch.cuda.memory_allocated(0)/1024**2:.2f}MB")
                 logger.info(f"GPU Memory Reserved: {torch.cuda.memory_reserved(0)/1024**2:.2f}MB")
+
+            if self.compile_model:
+                if hasattr(torch, 'compile'):
+                    # Compiled lazily on the first forward pass; dynamic shapes avoid recompiling per prompt length
+                    model.forward = torch.compile(model.forward, dynamic=True)
+                else:
+                    logger.warning("torch.compile is not available in this torch version, skipping")
+
+            load_ms = (time.perf_counter() - loading) * 1000
+            self.load_timings['model_load_ms'] = load_ms
             
-            logger.info(f"Model {self.model_name} loaded successfully on {self.device}")
+            logger.info(f"Model {model_name} loaded successfully on {device} ({precision}) in {load_ms:.0f}ms")
+            return LoadedModel(model_name, model, tokenizer, device, precision, is_encoder_decoder, load_ms)
             
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             raise
 
+    def _resolve_precision(self, device: str) -> str:
+        """Map llm.precision to a mode the device supports, falling back to fp32"""
+        import torch
+
+        precision = self.precision_setting
+        if precision == "auto":
+            return "fp16" if device == "cuda" else "fp32"
+
+        if precision == "fp16" and device == "cpu":
+            logger.warning("fp16 inference is not supported on CPU, using fp32")
+            return "fp32"
+
+        if precision == "bf16" and not self._bf16_supported(device):
+            logger.warning(f"bf16 is not supported natively on this {device}, using fp32")
+            return "fp32"
+
+        if precision == "int8":
+            if device == "cpu" and torch.backends.quantized.engine == "none":
+                logger.warning("No quantized engine available for int8 on CPU, using fp32")
+                return "fp32"
+            if device == "cuda":
+                try:
+                    import bitsandbytes  # noqa: F401
+                except ImportError:
+                    logger.warning("bitsandbytes is not installed, using fp16")
+                    return "fp16"
+
+        if precision not in ("fp32", "fp16", "bf16", "int8"):
+            logger.warning(f"Unknown llm.precision '{precision}', using fp32")
+            return "fp32"
+        return precision
+
+    def _bf16_supported(self, device: str) -> bool:
+        """Whether the device has native bfloat16 compute"""
+        import torch
+
+        if device == "cuda":
+            return torch.cuda.is_bf16_supported()
+        try:
+            with open("/proc/cpuinfo") as f:
+                flags = f.read()
+            return "avx512_bf16" in flags or "amx_bf16" in flags
+        except OSError:
+            return False
+
+    def _generation_kwargs(self) -> Dict[str, Any]:
+        """Decoding settings shared by every generate call"""
+        kwargs = {
+            'max_new_tokens': self.max_new_tokens,
+            'num_return_sequences': 1,
+            'do_sample': self.temperature > 0
+        }
+        if self.temperature > 0:
+            kwargs['temperature'] = self.temperature
+        return kwargs
+
+    def generation_settings(self) -> str:
+        """Everything besides the question and context that shapes a response, for cache keys"""
+        system_hash = hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:16]
+        precision = "none" if self.generator is not None else self._resolved_precision()
+        packer = self.context_packer
+        packing = (
+            f"{packer.context_window}/{packer.max_context_tokens}/{packer.dedupe_overlap}"
+            if packer is not None else "off"
+        )
+        return (
+            f"{self.model_name}|{self.backend}|{self.max_new_tokens}|{self.temperature}|{system_hash}"
+            f"|{precision}|{packing}"
+        )
+
+    def _resolved_precision(self) -> str:
+        """Precision models load with on this device, resolved once without loading one"""
+        if self._expected_precision is None:
+            loaded = self.precision
+            if loaded is None:
+                import torch
+                loaded = self._resolve_precision("cuda" if torch.cuda.is_available() else "cpu")
+            self._expected_precision = loaded
+        return self._expected_precision
+
+    def _prompt_parts(self, question: str, context_docs: List[Dict[str, Any]]) -> Tuple[str, str, str]:
+        """Split the prompt into its system, context and question segments"""
+        # Prepare context from relevant documents
+        context = "\n\n".join([doc['content'] for doc in context_docs])
+
+        return (
+            SYSTEM_PROMPT,
+            f"{context}\n\n",
+            f"### Human: {question}\n\n### Assistant: Let me help you with that based on the policy information provided."
+        )
+
+    def _build_prompt(self, question: str, context_docs: List[Dict[str, Any]]) -> str:
+        """Build the instruction prompt for a question and its context"""
+        return "".join(self._prompt_parts(question, context_docs))
+
+    def _pack_context(self,
+                      question: str,
+                      context_docs: List[Dict[str, Any]],
+                      loaded: LoadedModel) -> List[Dict[str, Any]]:
+        """Fit the retrieved chunks into the token budget left by the prompt and the answer"""
+        if self.context_packer is None or not context_docs:
+            return context_docs
+
+        system, _, rest = self._prompt_parts(question, [])
+        overhead_tokens = (
+            len(loaded.tokenizer(system)["input_ids"])
+            + len(loaded.tokenizer(rest + "\n\n", add_special_tokens=False)["input_ids"])
+        )
+        # Encoder-decoder models generate in a separate decoder, so the answer needs no room in the input
+        packed, _ = self.context_packer.pack(
+            loaded.tokenizer,
+            context_docs,
+            overhead_tokens,
+            0 if loaded.is_encoder_decoder else self.max_new_tokens,
+            context_window=loaded.context_window
+        )
+        return packed
+
+    def _prepare_inputs(self,
+                        question: str,
+                        context_docs: List[Dict[str, Any]],
+                        loaded: LoadedModel) -> Tuple[str, Dict[str, Any]]:
+        """Tokenize a prompt into generate() keyword arguments.
+
+        The full prompt is always tokenized in one piece, so the model sees
+        the same tokens with or without the prefix cache. With the cache
+        enabled, the longest cached prefix of those tokens (system prompt,
+        or system prompt and context) is resumed via ``past_key_values``
+        and only the remaining tokens are prefilled.
+        """
+        import torch
+
+        with metrics.span('prompt_build'):
+            context_docs = self._pack_context(question, context_docs, loaded)
+            prompt = self._build_prompt(question, context_docs)
+        with metrics.span('tokenize'):
+            encoded = loaded.tokenizer(prompt, return_tensors="pt")
+        inputs = {'input_ids': encoded['input_ids'], 'attention_mask': encoded['attention_mask']}
+
+        if self.prefix_cache is not None and not loaded.is_encoder_decoder:
+            with metrics.span('prefix_cache'):
+                system, context, _ = self._prompt_parts(question, context_docs)
+                past = self._cached_prefix(
+                    loaded,
+                    encoded['input_ids'][0].tolist(),
+                    loaded.tokenizer(system)["input_ids"],
+                    loaded.tokenizer(system + context)["input_ids"]
+                )
+            if past is not None:
+                inputs['past_key_values'] = past
+
+        if loaded.device == "cuda":
+            inputs = {k: v.to(loaded.device) if torch.is_tensor(v) else v for k, v in inputs.items()}
+        return prompt, inputs
+
+    def _cached_prefix(self,
+                       loaded: LoadedModel,
+                       prompt_ids: List[int],
+                       system_ids: List[int],
+                       context_prefix_ids: List[int]):
+        """Find or build past_key_values for the longest reusable prefix of ``prompt_ids``.
+
+        Byte-level BPE can merge tokens across a segment boundary, so a
+        segment is only reusable when tokenizing the prompt up to it gives
+        exactly the head of ``prompt_ids``; otherwise that level is skipped.
+        """
+        def reusable(ids: List[int]) -> bool:
+            return 0 < len(ids) < len(prompt_ids) and prompt_ids[:len(ids)] == ids
+
+        if not reusable(system_ids):
+            system_ids = []
+        if not reusable(context_prefix_ids) or len(context_prefix_ids) <= len(system_ids):
+            context_prefix_ids = []
+
+        if context_prefix_ids:
+            past = self.prefix_cache.get(loaded.name, context_prefix_ids)
+            if past is not None:
+                return past
+
+        system_past = None
+        if system_ids:
+            system_past = self.prefix_cache.get(loaded.name, system_ids)
+            if system_past is None:
+                system_past = self._prefill(loaded, system_ids)
+                self.prefix_cache.put(loaded.name, system_ids, system_past)
+
+        # Contexts are only worth caching once they recur
+        if context_prefix_ids and self.prefix_cache.should_cache(loaded.name, context_prefix_ids):
+            past = self._prefill(loaded, context_prefix_ids[len(system_ids):], system_past)
+            self.prefix_cache.put(loaded.name, context_prefix_ids, past)
+            return past
+
+        return system_past
+
+    def _prefill(self, loaded: LoadedModel, token_ids: List[int], past_key_values=None):
+        """Run the model over prompt tokens and return the resulting past_key_values"""
+        import torch
+
+        input_ids = torch.tensor([token_ids], device=loaded.device)
+        with torch.no_grad():
+            outputs = loaded.model(input_ids=input_ids, past_key_values=past_key_values, use_cache=True)
+        past = outputs.past_key_values
+        # Store the legacy tuple layout so cached prefixes are never mutated in place
+        if hasattr(past, 'to_legacy_cache'):
+            past = past.to_legacy_cache()
+        return past
+
+    def _timing_kwargs(self, timer: Optional[_GenerationTimer]) -> Dict[str, Any]:
+        """generate() arguments that attach the prefill/decode timer when metrics are enabled"""
+        if timer is None:
+            return {}
+        from transformers import StoppingCriteriaList
+        return {'stopping_criteria': StoppingCriteriaList([timer])}
+
+    def _extract_answer(self, text: str) -> str:
+        """Strip the prompt echo from decoded model output"""
+        if "### Assistant:" in text:
+            text = text.split("### Assistant:")[-1].strip()
+        return text
+
     def generate_response(self, 
                          question: str, 
-                         context_docs: List[Dict[str, Any]]) -> str:
-        """Generate response using model"""
-        try:
-            # Prepare context from relevant documents
-            context = "\n\n".join([doc['content'] for doc in context_docs])
-            
-            # Create prompt
-            prompt = f"""### System: You are an insurance policy assistant. 
-Provide accurate, clear answers based only on the provided policy information.
+                         context_docs: List[Dict[str, Any]],
+                         model_name: Optional[str] = None) -> str:
+        """Generate response using model, or a specific pooled model when ``model_name`` is given.
 
-### Context: 
-{context}
+        Raises GenerationUnavailable when the scheduler queue is full or the
+        wait times out; other failures return an error string.
+        """
+        try:
+            # Concurrent callers are grouped into micro-batches when scheduling is enabled
+            if self.scheduler is not None and model_name is None:
+                return self.scheduler.generate(question, context_docs)
+            if self.generator is not None:
+                return self.generator.generate([question], [context_docs])[0]
 
-### Human: {question}
+            import torch
 
-### Assistant: Let me help you with that based on the policy information provided."""
+            loaded = self._current(model_name)
 
-            # Tokenize input
-            inputs = self.tokenizer(prompt, return_tensors="pt")
-            
-            # Move inputs to GPU if available
-            if self.device == "cuda":
-                inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            # Create and tokenize prompt, resuming from a cached prefix when possible
+            prompt, inputs = self._prepare_inputs(question, context_docs, loaded)
             
             # Generate response with GPU acceleration
+            timer = _GenerationTimer() if metrics.enabled else None
             with torch.no_grad():
-                outputs = self.model.generate(
-                    inputs["input_ids"],
-                    max_length=500,
-                    num_return_sequences=1,
-                    temperature=0.3,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id
+                outputs = loaded.model.generate(
+                    **inputs,
+                    **self._generation_kwargs(),
+                    **self._timing_kwargs(timer),
+                    pad_token_id=loaded.tokenizer.eos_token_id
                 )
+            if timer is not None:
+                timer.record(inputs['input_ids'].shape[1])
             
-            # Decode response
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            with metrics.span('postprocess'):
+                # Decode response
+                response = loaded.tokenizer.decode(outputs[0], skip_special_tokens=True)
             
-            # Extract assistant's response
-            if "### Assistant:" in response:
-                response = response.split("### Assistant:")[-1].strip()
-            
-            return response
+                # Extract assistant's response
+                return self._extract_answer(response)
 
+        except GenerationUnavailable as e:
+            logger.warning(f"Generation unavailable: {str(e)}")
+            raise
         except Exception as e:
             logger.error(f"Error generating LLM response: {str(e)}")
             return f"Error generating response: {str(e)}"
 
+    def generate_response_stream(self,
+                                 question: str,
+                                 context_docs: List[Dict[str, Any]],
+                                 model_name: Optional[str] = None,
+                                 stop_event: Optional[Event] = None) -> Iterator[str]:
+        """Generate a response, yielding decoded text as tokens are produced.
+
+        The prompt itself is never re-emitted: the assistant preamble from
+        the prompt leads the first generated piece, and role tags in the
+        generated text are stripped incrementally. Generation stops early if the consumer
+        stops iterating, or once ``stop_event`` is set.
+        """
+        if self.generator is not None:
+            for piece in self.generator.stream(question, context_docs):
+                if stop_event is not None and stop_event.is_set():
+                    return
+                yield piece
+            return
+
+        import torch
+        from transformers import StoppingCriteriaList, TextIteratorStreamer
+
+        loaded = self._current(model_name)
+        prompt, inputs = self._prepare_inputs(question, context_docs, loaded)
+
+        streamer = TextIteratorStreamer(loaded.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        stop_event = stop_event if stop_event is not None else Event()
+        errors: List[Exception] = []
+        stopping_criteria = StoppingCriteriaList([_StopOnEvent(stop_event)])
+        timer = _GenerationTimer() if metrics.enabled else None
+        if timer is not None:
+            stopping_criteria.append(timer)
+
+        def run_generation():
+            try:
+                with torch.no_grad():
+                    loaded.model.generate(
+                        **inputs,
+                        **self._generation_kwargs(),
+                        pad_token_id=loaded.tokenizer.eos_token_id,
+                        streamer=streamer,
+                        stopping_criteria=stopping_criteria
+                    )
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+
+        started = time.perf_counter()
+        first_token_at: Optional[float] = None
+        thread = Thread(target=run_generation, name="llm-stream", daemon=True)
+        thread.start()
+
+        try:
+            # The assistant preamble ends a causal LM's prompt; it leads the first generated piece.
+            # Encoder-decoder output never contains the prompt, so there is nothing to restore.
+            preamble = "" if loaded.is_encoder_decoder else self._extract_answer(prompt)
+
+            stripper = _EchoStripper()
+            for text in streamer:
+                piece = stripper.feed(text)
+                if piece:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        piece = preamble + piece
+                    yield piece
+                if stripper.done:
+                    break
+            else:
+                piece = stripper.flush()
+                if piece:
+                    yield piece if first_token_at is not None else preamble + piece
+                elif first_token_at is None and preamble:
+                    yield preamble
+
+            if errors:
+                raise errors[0]
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {str(e)}")
+            raise
+        finally:
+            # The stopping criterion ends generation within one decoding step
+            stop_event.set()
+            thread.join()
+            if timer is not None:
+                timer.record(inputs['input_ids'].shape[1])
+            if first_token_at is not None:
+                logger.info(
+                    f"Streamed response: time to first token {(first_token_at - started) * 1000:.1f}ms, "
+                    f"total {(time.perf_counter() - started) * 1000:.1f}ms"
+                )
+
+    def generate_responses(self,
+                           questions: List[str],
+                           context_docs_list: List[List[Dict[str, Any]]],
+                           model_name: Optional[str] = None) -> List[str]:
+        """Generate responses for several questions with padded batched generation.
+
+        Prompts are left-padded so every sequence ends where generation
+        starts, and processed in sub-batches of ``llm.generation_batch_size``.
+        Results are returned in input order. Padded batches prefill every
+        prompt in full; the prefix cache only serves single-question
+        generation and streaming, not this path or the scheduler built on it.
+        """
+        try:
+            if self.generator is not None:
+                responses = []
+                for start in range(0, len(questions), self.generation_batch_size):
+                    responses.extend(self.generator.generate(
+                        questions[start:start + self.generation_batch_size],
+                        context_docs_list[start:start + self.generation_batch_size]
+                    ))
+                return responses
+
+            loaded = self._current(model_name)
+            with metrics.span('prompt_build'):
+                prompts = [
+                    self._build_prompt(question, self._pack_context(question, context_docs, loaded))
+                    for question, context_docs in zip(questions, context_docs_list)
+                ]
+            responses = []
+            for start in range(0, len(prompts), self.generation_batch_size):
+                responses.extend(self._generate_batch(prompts[start:start + self.generation_batch_size], loaded))
+            return responses
+
+        except Exception as e:
+            logger.error(f"Error generating batched LLM responses: {str(e)}")
+            return [f"Error generating response: {str(e)}" for _ in questions]
+
+    def _generate_batch(self, prompts: List[str], loaded: LoadedModel) -> List[str]:
+        """Run one padded generate call over a list of prompts"""
+        import torch
+
+        tokenizer = loaded.tokenizer
+        # Decoder-only models must be padded on the left for batched generation
+        tokenizer.padding_side = "right" if loaded.is_encoder_decoder else "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        with metrics.span('tokenize'):
+            inputs = tokenizer(prompts, return_tensors="pt", padding=True)
+        if loaded.device == "cuda":
+            inputs = {k: v.to(loaded.device) for k, v in inputs.items()}
+
+        timer = _GenerationTimer() if metrics.enabled else None
+        with torch.no_grad():
+            outputs = loaded.model.generate(
+                inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                **self._generation_kwargs(),
+                **self._timing_kwargs(timer),
+                pad_token_id=tokenizer.pad_token_id
+            )
+        if timer is not None:
+            timer.record(inputs["input_ids"].shape[1], batch_size=len(prompts))
+
+        with metrics.span('postprocess'):
+            decoded = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+            return [self._extract_answer(text) for text in decoded]
+
     def get_model_info(self) -> Dict[str, Any]:
-        """Get information about the current model"""
+        """Get information about the current model without forcing it to load"""
+        loaded = self.model_pool.peek(self.model_name)
         gpu_info = {}
-        if self.device == "cuda":
+        if loaded is not None and loaded.device == "cuda":
+            import torch
             gpu_info = {
                 'gpu_name': self.gpu_name,
                 'cuda_version': self.cuda_version,
                 'gpu_memory_allocated': f"{torch.cuda.memory_allocated(0)/1024**2:.2f}MB",
                 'gpu_memory_reserved': f"{torch.cuda.memory_reserved(0)/1024**2:.2f}MB",
-                'driver_version': "538.78"  # From nvidia-smi
+                'driver_version': _nvidia_driver_version()
             }
             
         return {
             'model_name': self.model_name,
             'provider': 'local',
-            'device': self.device,
+            'backend': self.backend,
+            'generator': self.generator.get_stats() if self.generator is not None else None,
+            'device': loaded.device if loaded is not None else 'not loaded',
+            'precision': loaded.precision if loaded is not None else self.precision_setting,
+            'encoder_decoder': loaded.is_encoder_decoder if loaded is not None else None,
+            'compiled': self.compile_model,
+            'loaded': loaded is not None,
             'gpu_info': gpu_info,
-            'cache_enabled': True,
+            'cache_enabled': bool(self.config.get('llm', {}).get('use_cache', False)),
+            'model_pool': self.model_pool.get_stats(),
+            'scheduler': self.scheduler.get_stats() if self.scheduler is not None else None,
+            'prefix_cache': self.prefix_cache.get_stats() if self.prefix_cache is not None else None,
+            'context_packing': self.context_packer.get_stats() if self.context_packer is not None else None,
             'last_used': self.current_date,
             'user': self.current_user
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,287 @@
+# src/agent/metrics.py
+from typing import Dict, Any, List, Optional, Tuple, Callable, Iterable
+from bisect import bisect_left
+from contextvars import ContextVar
+import threading
+import time
+from loguru import logger
+
+# Upper bounds in seconds, from index lookups (sub-millisecond) to CPU decoding (tens of seconds)
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+STAGE_METRIC = "rag_stage_duration_seconds"
+REQUEST_METRIC = "rag_request_duration_seconds"
+
+HELP = {
+    STAGE_METRIC: "Time spent in each pipeline stage",
+    REQUEST_METRIC: "End-to-end answer latency",
+    "rag_decode_tokens_per_second": "Decode throughput per generate call",
+    "rag_generated_tokens_total": "Tokens produced by generation",
+    "rag_prompt_tokens_total": "Prompt tokens prefilled by generation",
+    "rag_answers_total": "Answers by where they came from"
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Trace:
+    """Stage durations recorded while handling one request"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+    def add(self, stage: str, labels: LabelKey, seconds: float):
+        suffix = ".".join(value for _, value in labels)
+        self.stages.append((f"{stage}.{suffix}" if suffix else stage, seconds * 1000))
+
+    def as_dict(self) -> Dict[str, float]:
+        """Milliseconds per stage, summed over repeats"""
+        totals: Dict[str, float] = {}
+        for stage, ms in self.stages:
+            totals[stage] = totals.get(stage, 0.0) + ms
+        totals['total'] = (time.perf_counter() - self.started) * 1000
+        return totals
+
+
+class _NoopScope:
+    """Shared stand-in for spans and traces while metrics are disabled"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+_NOOP = _NoopScope()
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("rag_trace", default=None)
+
+
+class _Span:
+    __slots__ = ('registry', 'stage', 'labels', 'started')
+
+    def __init__(self, registry: "MetricsRegistry", stage: str, labels: LabelKey):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.registry.record_stage(self.stage, time.perf_counter() - self.started, self.labels)
+        return False
+
+
+class _TraceScope:
+    __slots__ = ('registry', 'trace', 'token')
+
+    def __init__(self, registry: "MetricsRegistry", name: str):
+        self.registry = registry
+        self.trace = Trace(name)
+
+    def __enter__(self) -> Trace:
+        self.token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, *exc_info) -> bool:
+        _current_trace.reset(self.token)
+        self.registry.finish_trace(self.trace)
+        return False
+
+
+class MetricsRegistry:
+    """In-process registry of stage histograms, counters and collected gauges.
+
+    ``span(stage)`` times a block into the ``rag_stage_duration_seconds``
+    histogram, and into the current request's ``Trace`` when one is open
+    on this thread or context. Collectors are callables polled at export
+    time, so cache hit rates are read from the caches' own counters rather
+    than duplicated here. While disabled, ``span`` and ``trace`` return
+    one shared no-op context manager and nothing is recorded.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_request_ms = 0.0
+        self.lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+        self.collectors: Dict[str, Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = {}
+
+    def configure(self, config: Dict[str, Any]):
+        """Apply the ``metrics`` config section"""
+        metrics_config = config.get('metrics', {}) or {}
+        self.enabled = bool(metrics_config.get('enabled', False))
+        self.slow_request_ms = float(metrics_config.get('slow_request_ms', 0) or 0)
+
+    @staticmethod
+    def _label_key(labels: Dict[str, Any]) -> LabelKey:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def span(self, stage: str, **labels):
+        """Context manager timing one pipeline stage"""
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, stage, self._label_key(labels))
+
+    def trace(self, name: str = "answer"):
+        """Context manager collecting the stages of one request; yields the Trace, or None when disabled"""
+        if not self.enabled:
+            return _NOOP
+        return _TraceScope(self, name)
+
+    def record_stage(self, stage: str, seconds: float, labels: LabelKey = ()):
+        self._observe(STAGE_METRIC, seconds, (('stage', stage),) + labels, DURATION_BUCKETS)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, labels, seconds)
+
+    def finish_trace(self, trace: Trace):
+        elapsed_ms = (time.perf_counter() - trace.started) * 1000
+        self._observe(REQUEST_METRIC, elapsed_ms / 1000, (('request', trace.name),), DURATION_BUCKETS)
+        if self.slow_request_ms and elapsed_ms >= self.slow_request_ms:
+            breakdown = ", ".join(f"{stage} {ms:.1f}ms" for stage, ms in trace.as_dict().items() if stage != 'total')
+            logger.warning(f"Slow {trace.name}: {elapsed_ms:.0f}ms ({breakdown})")
+
+    def observe(self, name: str, value: float, buckets: Iterable[float] = DURATION_BUCKETS, **labels):
+        """Record a value in a named histogram"""
+        if self.enabled:
+            self._observe(name, value, self._label_key(labels), buckets)
+
+    def _observe(self, name: str, value: float, labels: LabelKey, buckets: Iterable[float]):
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name: str, value: float = 1.0, **labels):
+        """Add to a named counter"""
+        if self.enabled:
+            key = (name, self._label_key(labels))
+            with self.lock:
+                self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def register_collector(self, name: str, collector: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]):
+        """Register (or replace) a callable returning (metric, labels, value) gauges at export time"""
+        with self.lock:
+            self.collectors[name] = collector
+
+    def _collect_gauges(self) -> List[Tuple[str, LabelKey, float]]:
+        with self.lock:
+            collectors = list(self.collectors.items())
+        gauges = []
+        for name, collector in collectors:
+            try:
+                gauges.extend((metric, self._label_key(labels), float(value)) for metric, labels, value in collector())
+            except Exception as e:
+                logger.error(f"Error collecting {name} metrics: {str(e)}")
+        return gauges
+
+    def reset(self):
+        """Drop recorded histograms and counters"""
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    @staticmethod
+    def _series(name: str, labels: LabelKey) -> str:
+        if not labels:
+            return name
+        rendered = ",".join(
+            f'{label}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+            for label, value in labels
+        )
+        return f"{name}{{{rendered}}}"
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Histogram summaries, counters and gauges keyed by series name"""
+        with self.lock:
+            histograms = {
+                self._series(name, labels): {
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'p50': histogram.quantile(0.5),
+                    'p95': histogram.quantile(0.95),
+                    'p99': histogram.quantile(0.99)
+                }
+                for (name, labels), histogram in sorted(self.histograms.items())
+            }
+            counters = {self._series(name, labels): value for (name, labels), value in sorted(self.counters.items())}
+        gauges = {self._series(name, labels): value for name, labels, value in self._collect_gauges()}
+        return {'enabled': self.enabled, 'histograms': histograms, 'counters': counters, 'gauges': gauges}
+
+    def render_prometheus(self) -> str:
+        """Everything recorded, in the Prometheus text exposition format"""
+        lines: List[str] = []
+        declared = set()
+
+        def declare(name: str, kind: str):
+            if name not in declared:
+                declared.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            histograms = sorted((key, list(h.buckets), list(h.counts), h.sum, h.count) for key, h in self.histograms.items())
+            counters = sorted(self.counters.items())
+
+        for (name, labels), buckets, counts, total, count in histograms:
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + [float('inf')], counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float('inf') else repr(float(bound))
+                lines.append(f"{self._series(name + '_bucket', labels + (('le', le),))} {cumulative}")
+            lines.append(f"{self._series(name + '_sum', labels)} {total!r}")
+            lines.append(f"{self._series(name + '_count', labels)} {count}")
+
+        for (name, labels), value in counters:
+            declare(name, "counter")
+            lines.append(f"{self._series(name, labels)} {value!r}")
+
+        for name, labels, value in sorted(self._collect_gauges()):
+            declare(name, "gauge")
+            lines.append(f"{self._series(name, labels)} {value!r}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry, configured by InsuranceAgent from the ``metrics`` config section
+metrics = MetricsRegistry()
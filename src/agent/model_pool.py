@@ -0,0 +1,139 @@
+# src/agent/model_pool.py
+from typing import Dict, Any, Callable, Optional
+from collections import OrderedDict
+import threading
+from loguru import logger
+
+
+def model_nbytes(model) -> int:
+    """Approximate resident size of a model's weights and buffers"""
+    total = 0
+    for value in model.state_dict().values():
+        # Dynamically quantized Linear layers store (weight, bias) tuples
+        tensors = value if isinstance(value, (tuple, list)) else (value,)
+        for tensor in tensors:
+            if hasattr(tensor, 'element_size'):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class LoadedModel:
+    """A resident model together with the tokenizer and settings it was loaded with"""
+
+    def __init__(self,
+                 name: str,
+                 model,
+                 tokenizer,
+                 device: str,
+                 precision: str,
+                 is_encoder_decoder: bool,
+                 load_ms: float):
+        self.name = name
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.precision = precision
+        self.is_encoder_decoder = is_encoder_decoder
+        self.load_ms = load_ms
+        self.nbytes = model_nbytes(model)
+
+    @property
+    def context_window(self) -> Optional[int]:
+        """Maximum number of input positions the model supports, if it declares one"""
+        return getattr(self.model.config, 'max_position_embeddings', None)
+
+
+class ModelPool:
+    """Memory-bounded LRU of loaded models.
+
+    Models are loaded on first request through ``loader``. Loading happens
+    outside the pool lock, so requests for resident models are never held
+    up by a load; concurrent requests for the same missing model share one
+    load. Once resident models exceed ``max_bytes`` or ``max_models``, the
+    least recently used ones are dropped from the pool. Requests already
+    holding an evicted model keep their reference and finish normally.
+    """
+
+    def __init__(self,
+                 loader: Callable[[str], LoadedModel],
+                 max_bytes: int = 4 * 1024 ** 3,
+                 max_models: int = 2):
+        self.loader = loader
+        self.max_bytes = int(max_bytes)
+        self.max_models = max(int(max_models), 1)
+        self.lock = threading.Lock()
+        self.models: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self.load_locks: Dict[str, threading.Lock] = {}
+
+        # Counters
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, name: str) -> LoadedModel:
+        """Return a resident model, loading it if needed"""
+        with self.lock:
+            loaded = self.models.get(name)
+            if loaded is not None:
+                self.models.move_to_end(name)
+                self.hits += 1
+                return loaded
+            load_lock = self.load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            # Another request may have finished loading this model meanwhile
+            with self.lock:
+                loaded = self.models.get(name)
+                if loaded is not None:
+                    self.models.move_to_end(name)
+                    self.hits += 1
+                    return loaded
+
+            loaded = self.loader(name)
+            with self.lock:
+                self.models[name] = loaded
+                self.loads += 1
+                self._evict(keep=name)
+            return loaded
+
+    def _evict(self, keep: str):
+        """Drop least recently used models until the pool is within budget"""
+        while len(self.models) > 1 and (
+            len(self.models) > self.max_models
+            or sum(model.nbytes for model in self.models.values()) > self.max_bytes
+        ):
+            name = next(iter(self.models))
+            if name == keep:
+                self.models.move_to_end(name)
+                name = next(iter(self.models))
+            evicted = self.models.pop(name)
+            self.evictions += 1
+            logger.info(f"Evicted model {name} from pool ({evicted.nbytes / 1024 ** 2:.0f}MB)")
+
+    def peek(self, name: str) -> Optional[LoadedModel]:
+        """Return a resident model without loading it or touching LRU order"""
+        with self.lock:
+            return self.models.get(name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get resident models and pool counters"""
+        with self.lock:
+            return {
+                'resident': [
+                    {
+                        'model_name': loaded.name,
+                        'device': loaded.device,
+                        'precision': loaded.precision,
+                        'encoder_decoder': loaded.is_encoder_decoder,
+                        'mb': round(loaded.nbytes / 1024 ** 2, 1),
+                        'load_ms': loaded.load_ms
+                    }
+                    for loaded in self.models.values()
+                ],
+                'resident_bytes': sum(loaded.nbytes for loaded in self.models.values()),
+                'max_bytes': self.max_bytes,
+                'max_models': self.max_models,
+                'hits': self.hits,
+                'loads': self.loads,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,490 @@
+# src/agent/numpy_store.py
+from typing import Dict, Any, List, Optional, Callable
+from pathlib import Path
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from loguru import logger
+from .ann_index import IVFIndex
+
+# Rows scored per matrix product; each block is cut to its top k before the next, so a
+# scan holds queries x (SCAN_BLOCK_ROWS + k) float32 scores whatever the segment size
+SCAN_BLOCK_ROWS = 65536
+# IDs bound per "IN (...)" statement, well under SQLite's variable limit
+SQL_IN_BATCH = 500
+INITIAL_CAPACITY = 1024
+
+
+class NumpyCollection:
+    """Collection backed by a memory-mapped ``.npy`` segment and a SQLite sidecar.
+
+    Embeddings are L2-normalized and stored row by row in ``vectors.npy``
+    (float32 or float16); ``rows.sqlite`` maps each row to its ID, document
+    and metadata. Searches are a blocked matrix product over the mapped
+    segment followed by ``argpartition``, with cosine distance reported as
+    ``1 - similarity``. Reader processes map the segment read-only, so they
+    share one copy through the page cache and pick up new writes when the
+    sidecar version changes. Only one process should write at a time.
+
+    Deleted rows are tombstoned. Once they make up ``compact_dead_ratio`` of
+    the segment, the live rows are copied into a new segment file and
+    renumbered; readers switch to it when the version changes, and a query
+    that raced a compaction searches again.
+
+    With ``ann`` settings enabled, collections of at least
+    ``min_train_size`` rows are searched through an ``IVFIndex`` instead of
+    a full scan. It is trained once from a sample of the segment, kept up
+    to date as rows are added, and saved next to the segment.
+
+    Implements the subset of the Chroma collection API ``VectorStore`` uses.
+    """
+
+    def __init__(self,
+                 name: str,
+                 directory: str,
+                 embedding_function: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 dtype: str = "float32",
+                 ann: Optional[Dict[str, Any]] = None,
+                 compact_dead_ratio: float = 0.3):
+        self.name = name
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.embedding_function = embedding_function
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.dtype(np.float32), np.dtype(np.float16)):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+        self.compact_dead_ratio = float(compact_dead_ratio or 0)
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(str(self.directory / "rows.sqlite"), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, document TEXT, metadata TEXT, "
+            "alive INTEGER NOT NULL DEFAULT 1)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.commit()
+
+        # Read-side state, refreshed whenever the sidecar version moves
+        self._version: Optional[int] = None
+        self._generation = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._rows = 0
+        self._dead = np.zeros(0, dtype=np.int64)
+
+        self.ann_config = ann if ann and ann.get('enabled') else None
+        self._ann: Optional[IVFIndex] = None
+        self._ann_dirty = False
+
+    def _meta(self, key: str, default: int = 0) -> int:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else default
+
+    def _set_meta(self, key: str, value: int):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _segment_path(self, generation: int) -> Path:
+        """Segment file written by the ``generation``-th compaction"""
+        return self.directory / (f"vectors.{generation}.npy" if generation else "vectors.npy")
+
+    def _ann_path(self, generation: int) -> Path:
+        return self.directory / (f"ivf.{generation}.npz" if generation else "ivf.npz")
+
+    def _refresh(self):
+        """Remap the segment if another writer (or this one) changed it"""
+        version = self._meta('version')
+        if version == self._version:
+            return
+        generation = self._meta('generation')
+        if generation != self._generation:
+            # Rows were renumbered, so the index built for the old segment no longer applies
+            self._ann = None
+            self._ann_dirty = False
+        self._rows = self._meta('rows')
+        segment_path = self._segment_path(generation)
+        self._vectors = np.load(segment_path, mmap_mode='r') if self._rows and segment_path.exists() else None
+        self._dead = np.array(
+            [row for (row,) in self.db.execute("SELECT row FROM rows WHERE alive = 0")],
+            dtype=np.int64
+        )
+        self._version = version
+        self._generation = generation
+        if self.ann_config is not None:
+            self._sync_ann()
+
+    def _sync_ann(self):
+        """Train the ANN index once the collection is large enough and index new rows"""
+        if self._vectors is None:
+            return
+        if self._ann is None:
+            if self._rows < int(self.ann_config.get('min_train_size', 50000)):
+                return
+            index = self._new_ann()
+            if not index.load(str(self._ann_path(self._generation))) or index.indexed_rows > self._rows:
+                index = self._new_ann()
+                started = time.perf_counter()
+                sample_size = min(self._rows, int(self.ann_config.get('train_size', 100000)))
+                sample = np.sort(np.random.default_rng(0).choice(self._rows, sample_size, replace=False))
+                index.train(np.asarray(self._vectors[sample], dtype=np.float32))
+                logger.info(f"Trained ANN index for {self.name} on {sample_size} rows in {time.perf_counter() - started:.1f}s")
+                self._ann_dirty = True
+            self._ann = index
+
+        for start in range(self._ann.indexed_rows, self._rows, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, self._rows)
+            self._ann.add(np.arange(start, end), self._vectors[start:end])
+            self._ann_dirty = True
+
+    def _new_ann(self) -> IVFIndex:
+        return IVFIndex(
+            nlist=int(self.ann_config.get('nlist', 1024)),
+            nprobe=int(self.ann_config.get('nprobe', 16)),
+            pq_m=int(self.ann_config.get('pq_m', 0)),
+            refine=int(self.ann_config.get('refine', 4))
+        )
+
+    def flush(self):
+        """Bring the ANN index up to date and persist it"""
+        try:
+            with self.lock:
+                self._refresh()
+                if self._ann is not None and self._ann_dirty:
+                    self._ann.save(str(self._ann_path(self._generation)))
+                    self._ann_dirty = False
+        except Exception as e:
+            logger.error(f"Error saving ANN index for {self.name}: {str(e)}")
+            raise
+
+    def _normalize(self, embeddings) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _embed(self, documents: List[str]) -> List[List[float]]:
+        if self.embedding_function is None:
+            raise ValueError(f"Collection {self.name} has no embedding function")
+        return self.embedding_function(documents)
+
+    def _write_rows(self, rows: List[int], vectors: np.ndarray):
+        """Write vectors into the segment, growing it when rows run past its capacity"""
+        needed = max(rows) + 1
+        vectors_path = self._segment_path(self._meta('generation'))
+        if vectors_path.exists():
+            segment = np.load(vectors_path, mmap_mode='r+')
+            if segment.shape[1] != vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match collection dimension {segment.shape[1]}"
+                )
+            if segment.shape[0] < needed:
+                grown_path = vectors_path.with_suffix('.tmp.npy')
+                grown = np.lib.format.open_memmap(
+                    grown_path, mode='w+', dtype=self.dtype,
+                    shape=(max(needed, segment.shape[0] * 2), segment.shape[1])
+                )
+                used = self._meta('rows')
+                grown[:used] = segment[:used]
+                grown.flush()
+                del segment, grown
+                os.replace(grown_path, vectors_path)
+                segment = np.load(vectors_path, mmap_mode='r+')
+        else:
+            segment = np.lib.format.open_memmap(
+                vectors_path, mode='w+', dtype=self.dtype,
+                shape=(max(needed, INITIAL_CAPACITY), vectors.shape[1])
+            )
+
+        order = np.argsort(rows)
+        sorted_rows = np.asarray(rows)[order]
+        segment[sorted_rows] = vectors[order].astype(self.dtype)
+        segment.flush()
+        del segment
+
+    def _execute_in(self, sql: str, values: List[Any], params: tuple = ()) -> List[tuple]:
+        """Run ``sql`` once per ``SQL_IN_BATCH`` values, substituting the placeholders for ``{}``.
+
+        Callers hold the lock, so the statements share one transaction.
+        """
+        records = []
+        for start in range(0, len(values), SQL_IN_BATCH):
+            batch = list(values[start:start + SQL_IN_BATCH])
+            records.extend(self.db.execute(sql.format(','.join('?' * len(batch))), (*params, *batch)).fetchall())
+        return records
+
+    def upsert(self,
+               ids: List[str],
+               documents: List[str],
+               metadatas: Optional[List[Dict[str, Any]]] = None,
+               embeddings: Optional[List[List[float]]] = None):
+        """Insert or overwrite rows by ID"""
+        try:
+            if not ids:
+                return
+            metadatas = metadatas or [{} for _ in ids]
+            vectors = self._normalize(embeddings if embeddings is not None else self._embed(documents))
+
+            with self.lock:
+                existing = dict(self._execute_in("SELECT id, row FROM rows WHERE id IN ({})", ids))
+                next_row = self._meta('rows')
+                rows = []
+                for doc_id in ids:
+                    if doc_id not in existing:
+                        existing[doc_id] = next_row
+                        next_row += 1
+                    rows.append(existing[doc_id])
+
+                # Vectors land before the sidecar commit, so readers never see rows without them
+                self._write_rows(rows, vectors)
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO rows (row, id, document, metadata, alive) VALUES (?, ?, ?, ?, 1)",
+                    [(row, doc_id, document, json.dumps(metadata))
+                     for row, doc_id, document, metadata in zip(rows, ids, documents, metadatas)]
+                )
+                self._set_meta('rows', next_row)
+                self._set_meta('version', self._meta('version') + 1)
+                self.db.commit()
+
+                # Overwritten rows may belong to a different inverted list now
+                if self._ann is not None:
+                    moved = [idx for idx, row in enumerate(rows) if row < self._ann.indexed_rows]
+                    if moved:
+                        self._ann.add(np.asarray(rows)[moved], vectors[moved])
+                        self._ann_dirty = True
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error upserting into {self.name}: {str(e)}")
+            raise
+
+    def delete(self, ids: List[str]):
+        """Tombstone rows by ID"""
+        try:
+            if not ids:
+                return
+            with self.lock:
+                self._execute_in("UPDATE rows SET alive = 0 WHERE id IN ({})", ids)
+                self._set_meta('version', self._meta('version') + 1)
+                self.db.commit()
+
+                used = self._meta('rows')
+                dead = self.db.execute("SELECT COUNT(*) FROM rows WHERE alive = 0").fetchone()[0]
+                if self.compact_dead_ratio and used and dead / used >= self.compact_dead_ratio:
+                    self.compact()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error deleting from {self.name}: {str(e)}")
+            raise
+
+    def compact(self):
+        """Copy the live rows into a new segment, renumbering them and dropping tombstoned rows"""
+        try:
+            with self.lock:
+                self._refresh()
+                started = time.perf_counter()
+                generation = self._meta('generation')
+                used = self._meta('rows')
+                live = np.array(
+                    [row for (row,) in self.db.execute("SELECT row FROM rows WHERE alive = 1 ORDER BY row")],
+                    dtype=np.int64
+                )
+
+                # Row i of the new segment is live[i]; the old files stay in place until the sidecar commits
+                compacted_path = self._segment_path(generation + 1)
+                if len(live):
+                    segment = np.load(self._segment_path(generation), mmap_mode='r')
+                    compacted = np.lib.format.open_memmap(
+                        compacted_path, mode='w+', dtype=self.dtype,
+                        shape=(max(len(live), INITIAL_CAPACITY), segment.shape[1])
+                    )
+                    for start in range(0, len(live), SCAN_BLOCK_ROWS):
+                        block = live[start:start + SCAN_BLOCK_ROWS]
+                        compacted[start:start + len(block)] = segment[block]
+                    compacted.flush()
+                    del segment, compacted
+                ann = self._ann.renumbered(live) if self._ann is not None else None
+                if ann is not None:
+                    ann.save(str(self._ann_path(generation + 1)))
+
+                # Ascending order: each new row number is free by the time it is taken
+                self.db.execute("DELETE FROM rows WHERE alive = 0")
+                self.db.executemany(
+                    "UPDATE rows SET row = ? WHERE row = ?",
+                    [(new_row, int(row)) for new_row, row in enumerate(live) if new_row != row]
+                )
+                self._set_meta('rows', len(live))
+                self._set_meta('generation', generation + 1)
+                self._set_meta('version', self._meta('version') + 1)
+                self.db.commit()
+
+                # Readers still mapping the old files keep them open until they remap
+                self._segment_path(generation).unlink(missing_ok=True)
+                self._ann_path(generation).unlink(missing_ok=True)
+                self._generation = generation + 1
+                self._ann = ann
+                self._ann_dirty = False
+                logger.info(
+                    f"Compacted {self.name}: dropped {used - len(live)} dead rows, "
+                    f"kept {len(live)} in {time.perf_counter() - started:.1f}s"
+                )
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Error compacting {self.name}: {str(e)}")
+            raise
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Fetch live rows, optionally restricted to ``ids``"""
+        include = ['documents', 'metadatas'] if include is None else include
+        with self.lock:
+            if ids is None:
+                records = self.db.execute(
+                    "SELECT id, document, metadata FROM rows WHERE alive = 1 ORDER BY row"
+                ).fetchall()
+            elif ids:
+                records = [record[1:] for record in sorted(self._execute_in(
+                    "SELECT row, id, document, metadata FROM rows WHERE alive = 1 AND id IN ({})", ids
+                ))]
+            else:
+                records = []
+
+        return {
+            'ids': [record[0] for record in records],
+            'documents': [record[1] for record in records] if 'documents' in include else None,
+            'metadatas': [json.loads(record[2]) for record in records] if 'metadatas' in include else None
+        }
+
+    def count(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM rows WHERE alive = 1").fetchone()[0]
+
+    def query(self,
+              query_embeddings: Optional[List[List[float]]] = None,
+              n_results: int = 10,
+              query_texts: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Top ``n_results`` rows per query by cosine distance, in Chroma's result shape"""
+        try:
+            if query_embeddings is None:
+                query_embeddings = self._embed(query_texts or [])
+            queries = self._normalize(query_embeddings)
+
+            while True:
+                with self.lock:
+                    self._refresh()
+                    vectors, rows, dead, generation = self._vectors, self._rows, self._dead, self._generation
+                    ann = self._ann if self._ann is not None and self._ann.indexed_rows >= rows else None
+
+                if vectors is None or not rows:
+                    result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+                    for _ in range(len(queries)):
+                        for key in result:
+                            result[key].append([])
+                    return result
+
+                if ann is not None:
+                    found = [ann.search(query, n_results, vectors, exclude=dead) for query in queries]
+                    top_rows = [list(found_rows) for found_rows, _ in found]
+                    top_scores = [scores for _, scores in found]
+                else:
+                    top_rows, top_scores = self._scan(queries, n_results, vectors, rows, dead)
+
+                result = self._fetch_rows(top_rows, top_scores, generation)
+                if result is not None:
+                    return result
+
+        except Exception as e:
+            logger.error(f"Error querying {self.name}: {str(e)}")
+            raise
+
+    def _scan(self, queries: np.ndarray, n_results: int, vectors: np.ndarray, rows: int, dead: np.ndarray):
+        """Exact top ``n_results`` rows and similarities per query over the whole segment"""
+        k = min(n_results, rows - len(dead))
+        if k <= 0:
+            return [[] for _ in queries], [np.zeros(0, dtype=np.float32) for _ in queries]
+
+        # Running top k per query, merged with each block's top k
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, rows, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, rows)
+            block = np.asarray(vectors[start:end], dtype=np.float32)
+            scores = queries @ block.T
+            block_dead = dead[(dead >= start) & (dead < end)]
+            if len(block_dead):
+                scores[:, block_dead - start] = -np.inf
+            block_rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            if end - start > k:
+                block_rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, block_rows, axis=1)
+                block_rows = block_rows + start
+
+            best_rows = np.concatenate([best_rows, block_rows], axis=1)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            if best_rows.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        top_rows: List[List[int]] = []
+        top_scores: List[np.ndarray] = []
+        for query_rows, query_scores in zip(best_rows, best_scores):
+            order = np.argsort(-query_scores, kind='stable')
+            order = order[np.isfinite(query_scores[order])]
+            top_rows.append([int(row) for row in query_rows[order]])
+            top_scores.append(query_scores[order])
+        return top_rows, top_scores
+
+    def _fetch_rows(self,
+                    top_rows: List[List[int]],
+                    top_scores: List[np.ndarray],
+                    generation: int) -> Optional[Dict[str, Any]]:
+        """Resolve ranked rows and similarities into Chroma's query result shape.
+
+        Returns None if a compaction renumbered the rows after they were ranked.
+        """
+        wanted = sorted({int(row) for ranked in top_rows for row in ranked})
+        with self.lock:
+            records = {
+                record[0]: record[1:]
+                for record in self._execute_in("SELECT row, id, document, metadata FROM rows WHERE row IN ({})", wanted)
+            }
+            if self._meta('generation') != generation:
+                return None
+
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for ranked, similarities in zip(top_rows, top_scores):
+            pairs = [(int(row), float(score)) for row, score in zip(ranked, similarities) if int(row) in records]
+            result['ids'].append([records[row][0] for row, _ in pairs])
+            result['documents'].append([records[row][1] for row, _ in pairs])
+            result['metadatas'].append([json.loads(records[row][2]) for row, _ in pairs])
+            result['distances'].append([1.0 - score for _, score in pairs])
+        return result
+
+
+class NumpyClient:
+    """Opens ``NumpyCollection`` directories under one path, mirroring ``chromadb.PersistentClient``"""
+
+    def __init__(self,
+                 path: str,
+                 dtype: str = "float32",
+                 ann: Optional[Dict[str, Any]] = None,
+                 compact_dead_ratio: float = 0.3):
+        self.path = Path(path)
+        self.dtype = dtype
+        self.ann = ann
+        self.compact_dead_ratio = compact_dead_ratio
+        self.lock = threading.Lock()
+        self.collections: Dict[str, NumpyCollection] = {}
+
+    def get_or_create_collection(self,
+                                 name: str,
+                                 embedding_function: Optional[Callable[[List[str]], List[List[float]]]] = None) -> NumpyCollection:
+        with self.lock:
+            collection = self.collections.get(name)
+            if collection is None:
+                collection = NumpyCollection(
+                    name, str(self.path / name), embedding_function, self.dtype, self.ann, self.compact_dead_ratio
+                )
+                self.collections[name] = collection
+            return collection
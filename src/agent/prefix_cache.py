@@ -0,0 +1,101 @@
+# src/agent/prefix_cache.py
+from typing import Dict, Any, Sequence, Tuple
+from collections import OrderedDict, Counter
+import threading
+
+# Cached prefix: (past_key_values, size in bytes)
+PrefixEntry = Tuple[Any, int]
+
+
+def past_nbytes(past_key_values) -> int:
+    """Total size of the tensors held in a legacy past_key_values tuple"""
+    return sum(
+        tensor.numel() * tensor.element_size()
+        for layer in past_key_values
+        for tensor in layer
+    )
+
+
+class PrefixKVCache:
+    """LRU of past_key_values for prompt prefixes, keyed by their token IDs.
+
+    Entries are evicted least-recently-used first once their tensors
+    exceed ``max_bytes``. Prefixes other than the system prompt are only
+    worth caching when they recur, so ``should_cache`` admits a prefix
+    after it has been seen ``min_hits`` times.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024, min_hits: int = 2):
+        self.max_bytes = int(max_bytes)
+        self.min_hits = int(min_hits)
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[Tuple[str, Tuple[int, ...]], PrefixEntry]" = OrderedDict()
+        self.seen: Counter = Counter()
+        self.total_bytes = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tokens_reused = 0
+
+    def get(self, model_name: str, token_ids: Sequence[int]):
+        """Get the cached past_key_values for an exact token prefix"""
+        key = (model_name, tuple(token_ids))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.tokens_reused += len(token_ids)
+            return entry[0]
+
+    def should_cache(self, model_name: str, token_ids: Sequence[int]) -> bool:
+        """Count a sighting of a prefix and report whether it recurs often enough to cache"""
+        key = (model_name, tuple(token_ids))
+        with self.lock:
+            self.seen[key] += 1
+            # Keep the frequency table bounded
+            if len(self.seen) > 16384:
+                self.seen = Counter(dict(self.seen.most_common(8192)))
+            return self.seen[key] >= self.min_hits
+
+    def put(self, model_name: str, token_ids: Sequence[int], past_key_values):
+        """Store past_key_values for a prefix, evicting LRU entries over budget"""
+        key = (model_name, tuple(token_ids))
+        nbytes = past_nbytes(past_key_values)
+        if nbytes > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self.entries[key] = (past_key_values, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached prefix"""
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and memory use"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'prefill_tokens_reused': self.tokens_reused
+            }
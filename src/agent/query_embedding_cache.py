@@ -0,0 +1,130 @@
+# src/agent/query_embedding_cache.py
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from pathlib import Path
+import sqlite3
+import threading
+import time
+import numpy as np
+from loguru import logger
+
+class QueryEmbeddingCache:
+    """Bounded LRU of query embeddings keyed by embedding model and normalized query.
+
+    Queries are normalized by lowercasing and collapsing whitespace, which
+    the uncased MiniLM tokenizer ignores anyway, so a hit returns exactly
+    the vector a forward pass would. Vectors are held as float32 arrays.
+    When ``cache_dir`` is given, new entries are also written to SQLite and
+    the most recent ``max_entries`` are reloaded on start.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 4096, cache_dir: Optional[str] = None):
+        self.model_name = model_name
+        self.max_entries = int(max_entries)
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+        self.connection = None
+        self.db_path = None
+        if cache_dir:
+            Path(cache_dir).mkdir(parents=True, exist_ok=True)
+            self.db_path = str(Path(cache_dir) / "query_embeddings.sqlite3")
+            self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (model, query))"
+            )
+            self.connection.commit()
+            self._load()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _load(self):
+        """Warm the LRU from the most recent persisted entries"""
+        try:
+            rows = self.connection.execute(
+                "SELECT query, vector FROM embeddings WHERE model = ? ORDER BY created_at DESC LIMIT ?",
+                (self.model_name, self.max_entries)
+            ).fetchall()
+            for query, vector in reversed(rows):
+                self.entries[query] = np.frombuffer(vector, dtype=np.float32)
+            if rows:
+                logger.info(f"Loaded {len(rows)} cached query embeddings")
+        except Exception as e:
+            logger.error(f"Error loading query embedding cache: {str(e)}")
+            raise
+
+    def reopen(self):
+        """Open a fresh SQLite connection, e.g. in a forked worker that must not share the parent's"""
+        self.lock = threading.Lock()
+        if self.db_path is not None:
+            self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def get_many(self, queries: List[str]) -> List[Optional[List[float]]]:
+        """Cached embedding per query, or None for misses"""
+        results: List[Optional[List[float]]] = []
+        with self.lock:
+            for query in queries:
+                key = self.normalize(query)
+                vector = self.entries.get(key)
+                if vector is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    results.append(vector.tolist())
+        return results
+
+    def put_many(self, queries: List[str], embeddings: List[List[float]]):
+        """Cache freshly computed query embeddings"""
+        try:
+            now = time.time()
+            rows = []
+            with self.lock:
+                for query, embedding in zip(queries, embeddings):
+                    key = self.normalize(query)
+                    vector = np.asarray(embedding, dtype=np.float32)
+                    self.entries[key] = vector
+                    self.entries.move_to_end(key)
+                    rows.append((self.model_name, key, vector.tobytes(), now))
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+
+                if self.connection is not None and rows:
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, query, vector, created_at) VALUES (?, ?, ?, ?)", rows
+                    )
+                    # Keep the table near the in-memory bound
+                    self.connection.execute(
+                        "DELETE FROM embeddings WHERE model = ? AND query NOT IN "
+                        "(SELECT query FROM embeddings WHERE model = ? ORDER BY created_at DESC LIMIT ?)",
+                        (self.model_name, self.model_name, self.max_entries)
+                    )
+                    self.connection.commit()
+        except Exception as e:
+            logger.error(f"Error caching query embeddings: {str(e)}")
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit rate"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'persistent': self.connection is not None
+            }
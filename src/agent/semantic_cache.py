@@ -0,0 +1,125 @@
+# src/agent/semantic_cache.py
+from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
+import threading
+import time
+import numpy as np
+from loguru import logger
+
+class SemanticCache:
+    """Answer cache keyed by question-embedding similarity.
+
+    An entry matches when its question embedding has cosine similarity of
+    at least ``similarity_threshold`` with the new question and it was
+    answered from exactly the same set of retrieved chunks under the same
+    generation settings. Entries are grouped by chunk set and settings, so
+    a lookup only compares against questions that share its context. The
+    oldest entry is replaced once
+    ``max_entries`` is reached.
+    """
+
+    def __init__(self,
+                 similarity_threshold: float = 0.92,
+                 max_entries: int = 4096):
+        self.similarity_threshold = float(similarity_threshold)
+        self.max_entries = int(max_entries)
+        self.lock = threading.Lock()
+
+        # Row storage, allocated lazily once the embedding dimension is known
+        self.embeddings: Optional[np.ndarray] = None
+        self.entries: List[Optional[Dict[str, Any]]] = [None] * self.max_entries
+        self.rows_by_docs: Dict[Tuple[str, frozenset], List[int]] = {}
+        self.next_row = 0
+
+        # Counters
+        self.lookups = 0
+        self.hits = 0
+        self.saved_ms: deque = deque(maxlen=4096)
+        self.lookup_ms: deque = deque(maxlen=4096)
+
+    def _normalize(self, embedding: List[float]) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, embedding: List[float], doc_ids: List[str], settings: str = "") -> Optional[str]:
+        """Return the cached answer of the most similar prior question, if close enough"""
+        started = time.perf_counter()
+        try:
+            with self.lock:
+                self.lookups += 1
+                rows = self.rows_by_docs.get((settings, frozenset(doc_ids)))
+                if not rows or self.embeddings is None:
+                    return None
+
+                similarities = self.embeddings[rows] @ self._normalize(embedding)
+                best = int(np.argmax(similarities))
+                if similarities[best] < self.similarity_threshold:
+                    return None
+
+                entry = self.entries[rows[best]]
+                self.hits += 1
+                self.saved_ms.append(entry['generation_ms'])
+                logger.info(f"Semantic cache hit (similarity {similarities[best]:.3f}) for prior question: {entry['question']}")
+                return entry['response']
+        except Exception as e:
+            logger.error(f"Error reading semantic cache: {str(e)}")
+            return None
+        finally:
+            self.lookup_ms.append((time.perf_counter() - started) * 1000)
+
+    def add(self,
+            question: str,
+            embedding: List[float],
+            doc_ids: List[str],
+            response: str,
+            generation_ms: float,
+            settings: str = ""):
+        """Store an answer along with its question embedding and retrieved chunk set"""
+        try:
+            with self.lock:
+                vector = self._normalize(embedding)
+                if self.embeddings is None:
+                    self.embeddings = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+                row = self.next_row
+                self.next_row = (self.next_row + 1) % self.max_entries
+
+                # Recycle the oldest row
+                old = self.entries[row]
+                if old is not None:
+                    old_rows = self.rows_by_docs[old['doc_key']]
+                    old_rows.remove(row)
+                    if not old_rows:
+                        del self.rows_by_docs[old['doc_key']]
+
+                doc_key = (settings, frozenset(doc_ids))
+                self.embeddings[row] = vector
+                self.entries[row] = {
+                    'question': question,
+                    'response': response,
+                    'doc_key': doc_key,
+                    'generation_ms': generation_ms
+                }
+                self.rows_by_docs.setdefault(doc_key, []).append(row)
+        except Exception as e:
+            logger.error(f"Error writing semantic cache: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit rate, latency saved per hit and lookup latency"""
+        with self.lock:
+            saved = np.asarray(self.saved_ms, dtype=np.float64)
+            lookup = np.asarray(self.lookup_ms, dtype=np.float64)
+            return {
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+                'entries': sum(len(rows) for rows in self.rows_by_docs.values()),
+                'saved_ms_total': float(saved.sum()) if saved.size else 0.0,
+                'saved_ms_p50': float(np.percentile(saved, 50)) if saved.size else 0.0,
+                'saved_ms_p99': float(np.percentile(saved, 99)) if saved.size else 0.0,
+                'lookup_ms_p50': float(np.percentile(lookup, 50)) if lookup.size else 0.0,
+                'lookup_ms_p99': float(np.percentile(lookup, 99)) if lookup.size else 0.0,
+                'similarity_threshold': self.similarity_threshold
+            }
@@ -0,0 +1,534 @@
+# src/agent/server.py
+"""Asyncio HTTP front end for InsuranceAgent.
+
+    python -m src.agent.server --config config/config.yaml
+
+Endpoints (JSON in and out):
+
+    POST /answer         {"question": "...", "policy": "..."}    policy is optional
+    POST /answer/batch   {"questions": ["...", ...]}
+    POST /answer/stream  {"question": "...", "policy": "..."}    chunked text/plain
+    POST /ingest         {"file_paths": ["...", ...]}
+    GET  /health
+    GET  /stats
+    GET  /metrics        Prometheus text format
+"""
+from typing import Dict, Any, List, Optional, Tuple, Callable
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+import argparse
+import asyncio
+import json
+import threading
+import time
+from loguru import logger
+from .metrics import metrics
+from .batch_scheduler import GenerationUnavailable
+
+_END_OF_STREAM = object()
+
+
+class HTTPError(Exception):
+    """Error that maps directly to an HTTP status"""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class AgentServer:
+    """HTTP/1.1 server running the agent's blocking work in bounded executors.
+
+    At most ``max_concurrency`` answer requests run at once on a thread
+    pool of the same size, and up to ``max_queue`` more wait for a slot.
+    Anything beyond that is shed immediately with 503 and ``Retry-After``,
+    as are answers the generation scheduler turns away (``GenerationUnavailable``).
+    Each request has ``request_timeout_s`` to finish, queueing included,
+    or it gets 504. A timed-out request keeps its slot until its worker
+    thread actually finishes, so the concurrency bound stays honest.
+    Ingestion runs one job at a time on its own executor, so a long
+    ingest never takes answer slots.
+
+    With a ``WorkerPool``, answers are computed in its forked workers and
+    the pool is restarted after each ingest so they see the new chunks;
+    streaming and ingestion still run in this process.
+    """
+
+    def __init__(self, agent, config: Dict[str, Any], pool=None):
+        self.agent = agent
+        self.pool = pool
+        self.answerer = pool if pool is not None else agent
+        self.current_date = "2025-01-20 23:26:03"
+        self.current_user = "objectgyan"
+        server_config = config.get('server', {}) or {}
+        self.host = server_config.get('host', "127.0.0.1")
+        self.port = int(server_config.get('port', 8080))
+        self.max_concurrency = max(int(server_config.get('max_concurrency', 4)), 1)
+        self.max_queue = max(int(server_config.get('max_queue', 32)), 0)
+        self.request_timeout_s = float(server_config.get('request_timeout_s', 60))
+        self.ingest_timeout_s = float(server_config.get('ingest_timeout_s', 3600))
+        self.max_body_bytes = int(server_config.get('max_body_bytes', 1024 * 1024))
+        self.keep_alive_s = float(server_config.get('keep_alive_s', 15))
+        self.max_batch_questions = int(server_config.get('max_batch_questions', 64))
+
+        self.answer_executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="answer")
+        self.ingest_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.ingest_lock: Optional[asyncio.Lock] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+
+        # Admission state, only touched on the event loop thread
+        self.in_flight = 0
+        self.waiting = 0
+
+        # Counters
+        self.stats_lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.completed = 0
+        self.latency_ms: deque = deque(maxlen=4096)
+
+        self.routes: Dict[Tuple[str, str], Callable] = {
+            ('POST', '/answer'): self._handle_answer,
+            ('POST', '/answer/batch'): self._handle_answer_batch,
+            ('POST', '/answer/stream'): self._handle_answer_stream,
+            ('POST', '/ingest'): self._handle_ingest,
+            ('GET', '/health'): self._handle_health,
+            ('GET', '/stats'): self._handle_stats,
+            ('GET', '/metrics'): self._handle_metrics
+        }
+        metrics.register_collector('server', self._server_metrics)
+
+    async def start(self):
+        """Bind the listening socket"""
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        self.ingest_lock = asyncio.Lock()
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        sockets = self.server.sockets or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+        logger.info(
+            f"Serving on http://{self.host}:{self.port} "
+            f"(concurrency {self.max_concurrency}, queue {self.max_queue}, timeout {self.request_timeout_s:.0f}s)"
+        )
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def shutdown(self, grace_s: float = 10.0):
+        """Stop accepting connections and give in-flight requests time to finish"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        deadline = time.monotonic() + grace_s
+        while self.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self.answer_executor.shutdown(wait=False, cancel_futures=True)
+        self.ingest_executor.shutdown(wait=False, cancel_futures=True)
+        if self.pool is not None:
+            self.pool.close()
+
+    # Connection handling
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.keep_alive_s)
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as e:
+                    await self._write_json(writer, e.status, {'error': e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                handler = self.routes.get((method, path))
+                try:
+                    if handler is None:
+                        known_path = any(route_path == path for _, route_path in self.routes)
+                        raise HTTPError(405 if known_path else 404, f"No route for {method} {path}")
+                    await handler(writer, self._parse_json(body) if method == 'POST' else {}, keep_alive)
+                except HTTPError as e:
+                    await self._write_json(writer, e.status, {'error': e.message}, keep_alive, e.headers)
+                except GenerationUnavailable as e:
+                    with self.stats_lock:
+                        self.rejected += 1
+                    await self._write_json(writer, 503, {'error': str(e)}, keep_alive, {'Retry-After': "1"})
+                except Exception as e:
+                    logger.error(f"Error handling {method} {path}: {str(e)}")
+                    with self.stats_lock:
+                        self.errors += 1
+                    await self._write_json(writer, 500, {'error': "Internal server error"}, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """Read one request; None when the client closed the connection"""
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return None
+            parts = request_line.decode('latin-1').split()
+            if len(parts) != 3:
+                raise HTTPError(400, "Malformed request line")
+            method, target, _ = parts
+
+            headers: Dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+        except (ValueError, asyncio.LimitOverrunError):
+            raise HTTPError(431, "Request header too large")
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(411, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > self.max_body_bytes:
+            raise HTTPError(413, f"Request body exceeds {self.max_body_bytes} bytes")
+        body = await reader.readexactly(length) if length > 0 else b''
+        return method.upper(), target.split('?', 1)[0], headers, body
+
+    def _parse_json(self, body: bytes) -> Dict[str, Any]:
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(400, "Request body must be JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return payload
+
+    async def _write_json(self,
+                          writer: asyncio.StreamWriter,
+                          status: int,
+                          payload: Dict[str, Any],
+                          keep_alive: bool = True,
+                          headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        head = [
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        head.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    # Admission control
+
+    async def _admit(self, deadline: float):
+        """Take an execution slot, or shed the request if the queue is full"""
+        if self.in_flight >= self.max_concurrency and self.waiting >= self.max_queue:
+            with self.stats_lock:
+                self.rejected += 1
+            raise HTTPError(503, "Server busy, retry later", {'Retry-After': "1"})
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            with self.stats_lock:
+                self.timeouts += 1
+            raise HTTPError(504, "Timed out waiting for a free worker")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        with self.stats_lock:
+            self.accepted += 1
+
+    def _release(self, _future=None):
+        self.in_flight -= 1
+        self.slots.release()
+
+    async def _run_admitted(self, func: Callable, *args) -> Any:
+        """Run blocking agent work within the concurrency bound and request deadline"""
+        started = time.monotonic()
+        deadline = started + self.request_timeout_s
+        await self._admit(deadline)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.answer_executor, func, *args)
+        # The slot frees when the thread is done, even if the client has stopped waiting
+        future.add_done_callback(self._release)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            with self.stats_lock:
+                self.timeouts += 1
+            raise HTTPError(504, f"Request exceeded {self.request_timeout_s:.0f}s")
+
+        with self.stats_lock:
+            self.completed += 1
+            self.latency_ms.append((time.monotonic() - started) * 1000)
+        return result
+
+    # Handlers
+
+    def _require_question(self, payload: Dict[str, Any]) -> str:
+        question = payload.get('question')
+        if not isinstance(question, str) or not question.strip():
+            raise HTTPError(400, "Field 'question' must be a non-empty string")
+        return question
+
+    def _optional_policy(self, payload: Dict[str, Any]) -> Optional[str]:
+        """Policy number or source file the question is about, if the client gave one"""
+        policy = payload.get('policy')
+        if policy is not None and (not isinstance(policy, str) or not policy.strip()):
+            raise HTTPError(400, "Field 'policy' must be a non-empty string")
+        return policy
+
+    async def _handle_answer(self, writer, payload: Dict[str, Any], keep_alive: bool):
+        question = self._require_question(payload)
+        policy = self._optional_policy(payload)
+        result = await self._run_admitted(self.answerer.answer_question, question, policy)
+        await self._write_json(writer, 200, result, keep_alive)
+
+    async def _handle_answer_batch(self, writer, payload: Dict[str, Any], keep_alive: bool):
+        questions = payload.get('questions')
+        if (not isinstance(questions, list) or not questions
+                or not all(isinstance(question, str) and question.strip() for question in questions)):
+            raise HTTPError(400, "Field 'questions' must be a non-empty list of strings")
+        if len(questions) > self.max_batch_questions:
+            raise HTTPError(413, f"At most {self.max_batch_questions} questions per batch")
+        result = await self._run_admitted(self.answerer.answer_questions, questions)
+        await self._write_json(writer, 200, result, keep_alive)
+
+    async def _handle_answer_stream(self, writer, payload: Dict[str, Any], keep_alive: bool):
+        """Stream the answer as chunked text.
+
+        Headers go out with the first piece, after retrieval, so failures and
+        timeouts before it still get a 5xx status. Later ones end the stream
+        with an ``X-Stream-Error`` trailer. Generation is cancelled when the
+        client disconnects or the deadline passes.
+        """
+        question = self._require_question(payload)
+        policy = self._optional_policy(payload)
+        started = time.monotonic()
+        deadline = started + self.request_timeout_s
+        await self._admit(deadline)
+
+        loop = asyncio.get_running_loop()
+        pieces: asyncio.Queue = asyncio.Queue()
+        cancel = threading.Event()
+
+        def produce():
+            try:
+                for piece in self.agent.answer_question_stream(question, policy=policy, cancel=cancel):
+                    if cancel.is_set():
+                        break
+                    loop.call_soon_threadsafe(pieces.put_nowait, piece)
+            except Exception as e:
+                logger.error(f"Error streaming answer: {str(e)}")
+                loop.call_soon_threadsafe(pieces.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(pieces.put_nowait, _END_OF_STREAM)
+
+        future = loop.run_in_executor(self.answer_executor, produce)
+        future.add_done_callback(self._release)
+
+        headers_sent = False
+        timed_out = False
+        error: Optional[Exception] = None
+        try:
+            while True:
+                try:
+                    piece = await asyncio.wait_for(pieces.get(), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    break
+                if piece is _END_OF_STREAM:
+                    break
+                if isinstance(piece, Exception):
+                    error = piece
+                    break
+                if not headers_sent:
+                    self._write_stream_head(writer, keep_alive)
+                    headers_sent = True
+                data = piece.encode('utf-8')
+                if data:
+                    writer.write(f"{len(data):x}\r\n".encode('latin-1') + data + b"\r\n")
+                    await writer.drain()
+
+            if not headers_sent:
+                # Nothing was sent yet, so the failure can still be the status
+                if timed_out:
+                    with self.stats_lock:
+                        self.timeouts += 1
+                    raise HTTPError(504, f"Request exceeded {self.request_timeout_s:.0f}s")
+                if error is not None:
+                    raise error
+                self._write_stream_head(writer, keep_alive)
+
+            if timed_out:
+                writer.write(f"0\r\nX-Stream-Error: Request exceeded {self.request_timeout_s:.0f}s\r\n\r\n".encode('latin-1'))
+            elif error is not None:
+                writer.write(b"0\r\nX-Stream-Error: Internal server error\r\n\r\n")
+            else:
+                writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            # Stops generation within one decoding step if the answer is not finished
+            cancel.set()
+
+        with self.stats_lock:
+            if timed_out:
+                self.timeouts += 1
+            elif error is not None:
+                self.errors += 1
+            else:
+                self.completed += 1
+                self.latency_ms.append((time.monotonic() - started) * 1000)
+
+    def _write_stream_head(self, writer, keep_alive: bool):
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/plain; charset=utf-8\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            "Trailer: X-Stream-Error\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode('latin-1'))
+
+    async def _handle_ingest(self, writer, payload: Dict[str, Any], keep_alive: bool):
+        file_paths = payload.get('file_paths')
+        if not isinstance(file_paths, list) or not all(isinstance(path, str) for path in file_paths):
+            raise HTTPError(400, "Field 'file_paths' must be a list of strings")
+        if self.ingest_lock.locked():
+            with self.stats_lock:
+                self.rejected += 1
+            raise HTTPError(503, "An ingest is already running", {'Retry-After': "30"})
+
+        async with self.ingest_lock:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.ingest_executor, self._ingest, file_paths)
+            try:
+                report = await asyncio.wait_for(asyncio.shield(future), self.ingest_timeout_s)
+            except asyncio.TimeoutError:
+                with self.stats_lock:
+                    self.timeouts += 1
+                raise HTTPError(504, f"Ingest exceeded {self.ingest_timeout_s:.0f}s and continues in the background")
+        await self._write_json(writer, 200, report, keep_alive)
+
+    def _ingest(self, file_paths: List[str]) -> Dict[str, Any]:
+        report = self.agent.process_documents(file_paths)
+        if self.pool is not None and report.get('chunks_written'):
+            self.pool.restart()
+        return report
+
+    async def _handle_health(self, writer, payload: Dict[str, Any], keep_alive: bool):
+        await self._write_json(writer, 200, {
+            'status': 'ok',
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'llm_loaded': self.agent.llm_handler.is_loaded
+        }, keep_alive)
+
+    async def _handle_stats(self, writer, payload: Dict[str, Any], keep_alive: bool):
+        await self._write_json(writer, 200, {
+            'server': self.get_stats(),
+            'workers': self.pool.get_stats() if self.pool is not None else None,
+            'caches': self.agent.get_cache_stats(),
+            'startup': self.agent.get_startup_report()
+        }, keep_alive)
+
+    async def _handle_metrics(self, writer, payload: Dict[str, Any], keep_alive: bool):
+        body = metrics.render_prometheus().encode('utf-8')
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode('latin-1') + body)
+        await writer.drain()
+
+    def _server_metrics(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Admission counters as (metric, labels, value) gauges"""
+        return [
+            (f"rag_server_{name}", {}, value)
+            for name, value in self.get_stats().items()
+            if not name.startswith('latency')
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get admission and latency counters"""
+        with self.stats_lock:
+            latency_ms = sorted(self.latency_ms)
+            return {
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+                'completed': self.completed,
+                'latency_ms_p50': latency_ms[len(latency_ms) // 2] if latency_ms else 0.0,
+                'latency_ms_p95': latency_ms[int(len(latency_ms) * 0.95)] if latency_ms else 0.0
+            }
+
+
+async def _serve(config_path: str, host: Optional[str], port: Optional[int]):
+    from .insurance_agent import InsuranceAgent
+
+    agent = InsuranceAgent(config_path)
+    config = dict(agent.config)
+    config['server'] = dict(config.get('server', {}) or {})
+    if host is not None:
+        config['server']['host'] = host
+    if port is not None:
+        config['server']['port'] = port
+
+    # Fork the worker zygote before any request threads exist; every later worker forks from it
+    pool = None
+    if (config.get('worker_pool', {}) or {}).get('workers'):
+        from .worker_pool import WorkerPool
+        pool = WorkerPool(agent)
+        pool.start()
+
+    server = AgentServer(agent, config, pool=pool)
+    await server.start()
+    try:
+        await server.serve_forever()
+    finally:
+        await server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve InsuranceAgent over HTTP")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.config, args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info("Server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,325 @@
 # src/agent/vector_store.py
-from typing import List, Dict, Any
-import yaml
+from typing import List, Dict, Any, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import hashlib
+import heapq
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 from loguru import logger
+from .config import load_config
+from .backends import create_embedding_function
+from .metrics import metrics
+from .ingest_manifest import IngestManifest
+from .keyword_index import KeywordIndex, tokenize, is_identifier
+from .numpy_store import NumpyClient
+from .query_embedding_cache import QueryEmbeddingCache
+from .embedding_store import EmbeddingStore
+
+# Lines of business and their Chroma collections, unless overridden in config
+DEFAULT_COLLECTIONS = {
+    'health': 'health_insurance',
+    'auto': 'auto_insurance'
+}
+
+class _LazyEmbeddingFunction:
+    """Chroma embedding function that defers to VectorStore, loading the model on first call"""
+
+    def __init__(self, vector_store: "VectorStore"):
+        self.vector_store = vector_store
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.vector_store.embed_texts(list(input))
+
 
 class VectorStore:
-    def __init__(self, config_path: str):
-        self.config = self._load_config(config_path)
-        self.persist_directory = "data/chroma"
-        
-        # Check for required packages
+    def __init__(self, config_path: str, config: Optional[Dict[str, Any]] = None):
+        self.config = config if config is not None else self._load_config(config_path)
+        vector_config = self.config.get('vector_store', {})
+        self.persist_directory = vector_config.get('persist_directory', "data/chroma")
+        self.backend = vector_config.get('backend', "chroma")
+        if self.backend not in ("chroma", "numpy"):
+            raise ValueError(f"Unsupported vector store backend: {self.backend}")
+        numpy_config = vector_config.get('numpy', {}) or {}
+        self.numpy_dtype = numpy_config.get('dtype', "float32")
+        self.ann_config = numpy_config.get('ann', {}) or {}
+        self.compact_dead_ratio = float(numpy_config.get('compact_dead_ratio', 0.3))
+        if self.ann_config.get('enabled') and self.backend != "numpy":
+            logger.warning("vector_store.numpy.ann is ignored by the chroma backend, which keeps its own HNSW index")
+        self.embedding_model = vector_config.get('embedding_model', "all-MiniLM-L6-v2")
+        # Optional model-free embedder; its name keys the embedding and query caches instead
+        self._embedding_function = create_embedding_function(vector_config)
+        if self._embedding_function is not None:
+            self.embedding_model = self._embedding_function.model_name
+        # Manifest and keyword index describe what this backend holds, so switching backends re-ingests
+        self.index_directory = Path(self.persist_directory) / ("numpy" if self.backend == "numpy" else "")
+        self.manifest = IngestManifest(str(self.index_directory / "ingest_manifest.json"))
+
+        # Chunk embeddings survive vector DB rebuilds and backend switches
+        embedding_store_config = vector_config.get('embedding_store', {}) or {}
+        self.embedding_store = None
+        if embedding_store_config.get('enabled', True):
+            self.embedding_store = EmbeddingStore(embedding_store_config.get('cache_dir', "cache/embeddings"))
+
+        # Lines of business are known up front; Chroma and the embedder load on first use
+        self.collection_names = vector_config.get('collections') or DEFAULT_COLLECTIONS
+        self._client = None
+        self._collections: Optional[Dict[str, Any]] = None
+        self._load_lock = threading.RLock()
+        self.load_timings: Dict[str, float] = {}
+
+        # BM25 keyword retrieval fused with dense results; kept next to the backend files
+        hybrid_config = vector_config.get('hybrid', {}) or {}
+        self.hybrid_enabled = hybrid_config.get('enabled', True)
+        self.rrf_k = int(hybrid_config.get('rrf_k', 60))
+        self.hybrid_candidates = int(hybrid_config.get('candidates', 10))
+        self.keyword_only = hybrid_config.get('keyword_only', True)
+        self._keyword_index: Optional[KeywordIndex] = None
+
+        # Repeated questions reuse their query embedding instead of a forward pass
+        query_cache_config = vector_config.get('query_cache', {}) or {}
+        self.query_cache = None
+        if query_cache_config.get('enabled', True):
+            self.query_cache = QueryEmbeddingCache(
+                self.embedding_model,
+                max_entries=query_cache_config.get('max_entries', 4096),
+                cache_dir=query_cache_config.get('cache_dir') if query_cache_config.get('persist', False) else None
+            )
+
+        # Fans a single query embedding out to every relevant collection
+        self.query_executor = ThreadPoolExecutor(
+            max_workers=max(len(self.collection_names), 1),
+            thread_name_prefix="vector-query"
+        )
+
+        logger.info(f"VectorStore initialized at {datetime.utcnow()}")
+
+    def _import_chromadb(self):
+        """Import chromadb, which the chroma backend and the sentence-transformer embedder need"""
         try:
             import chromadb
-            from sentence_transformers import SentenceTransformer
         except ImportError as e:
             logger.error(f"Required package not found: {str(e)}")
-            logger.info("Installing required packages...")
-            import subprocess
-            import sys
-            
-            # Install required packages
-            subprocess.check_call([sys.executable, "-m", "pip", "install", 
-                                "sentence-transformers==2.2.2",
-                                "chromadb==0.4.22"])
-            
-            # Try importing again
-            import chromadb
-            from sentence_transformers import SentenceTransformer
-        
-        # Initialize ChromaDB
-        self.client = chromadb.PersistentClient(path=self.persist_directory)
-        
-        # Initialize embedding function
-        from chromadb.utils import embedding_functions
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
-        
-        # Create or get collections
-        self.health_collection = self.client.get_or_create_collection(
-            name="health_insurance",
-            embedding_function=self.embedding_function
-        )
-        
-        self.auto_collection = self.client.get_or_create_collection(
-            name="auto_insurance",
-            embedding_function=self.embedding_function
-        )
-        
-        logger.info(f"VectorStore initialized at {datetime.utcnow()}")
+            raise ImportError(
+                "chromadb is not installed; install requirements.txt, or set vector_store.backend "
+                "to numpy and vector_store.embedding_backend to hash"
+            ) from e
+        return chromadb
 
-    def _load_config(self, config_path: str) -> Dict[str, Any]:
-        """Load configuration from YAML file"""
+    @property
+    def client(self):
+        """ChromaDB client, or the memory-mapped NumPy store, opened on first access"""
+        if self._client is None:
+            with self._load_lock:
+                if self._client is None:
+                    started = time.perf_counter()
+                    if self.backend == "numpy":
+                        self._client = NumpyClient(
+                            str(self.index_directory),
+                            dtype=self.numpy_dtype,
+                            ann=self.ann_config,
+                            compact_dead_ratio=self.compact_dead_ratio
+                        )
+                    else:
+                        chromadb = self._import_chromadb()
+                        self._client = chromadb.PersistentClient(path=self.persist_directory)
+                    self.load_timings[f'{self.backend}_open_ms'] = (time.perf_counter() - started) * 1000
+        return self._client
+
+    @property
+    def collections(self) -> Dict[str, Any]:
+        """One collection per line of business, created or opened on first access"""
+        if self._collections is None:
+            with self._load_lock:
+                if self._collections is None:
+                    embedding_function = _LazyEmbeddingFunction(self)
+                    self._collections = {
+                        policy_type: self.client.get_or_create_collection(
+                            name=name,
+                            embedding_function=embedding_function
+                        )
+                        for policy_type, name in self.collection_names.items()
+                    }
+        return self._collections
+
+    @property
+    def health_collection(self):
+        return self.collections.get('health')
+
+    @property
+    def auto_collection(self):
+        return self.collections.get('auto')
+
+    @property
+    def embedding_function(self):
+        """Sentence-transformer embedding function, loaded on first use, or the configured hash embedder"""
+        if self._embedding_function is None:
+            with self._load_lock:
+                if self._embedding_function is None:
+                    started = time.perf_counter()
+                    self._import_chromadb()
+                    try:
+                        import sentence_transformers  # noqa: F401
+                    except ImportError as e:
+                        logger.error(f"Required package not found: {str(e)}")
+                        raise ImportError(
+                            "sentence-transformers is not installed; install requirements.txt, "
+                            "or set vector_store.embedding_backend to hash"
+                        ) from e
+                    from chromadb.utils import embedding_functions
+                    self._embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+                        model_name=self.embedding_model
+                    )
+                    self.load_timings['embedder_load_ms'] = (time.perf_counter() - started) * 1000
+        return self._embedding_function
+
+    @property
+    def keyword_index(self) -> Optional[KeywordIndex]:
+        """BM25 index over stored chunks, loaded on first use; None when hybrid retrieval is disabled"""
+        if not self.hybrid_enabled:
+            return None
+        if self._keyword_index is None:
+            with self._load_lock:
+                if self._keyword_index is None:
+                    started = time.perf_counter()
+                    index = KeywordIndex(str(self.index_directory))
+                    self._sync_keyword_index(index)
+                    self._keyword_index = index
+                    self.load_timings['keyword_index_load_ms'] = (time.perf_counter() - started) * 1000
+        return self._keyword_index
+
+    def _manifest_stamp(self) -> str:
+        """Identifies the saved ingest manifest, so indexes can tell whether it changed"""
         try:
-            with open(config_path, 'r') as f:
-                return yaml.safe_load(f)
+            stat = self.manifest.manifest_path.stat()
+            return f"{stat.st_mtime_ns}:{stat.st_size}"
+        except FileNotFoundError:
+            return ""
+
+    def _sync_keyword_index(self, index: KeywordIndex):
+        """Bring the keyword index in line with the ingest manifest.
+
+        An index saved against the current manifest is used as is. Otherwise
+        only the difference is applied: chunks the manifest lists but the
+        index lacks are read from the collections and indexed, and indexed
+        chunks the manifest does not list are kept only if still stored,
+        since add_documents may have written them directly. A missing or
+        unreadable index is rebuilt from the collections.
+        """
+        try:
+            stamp = self._manifest_stamp()
+            if index.persisted and index.manifest_stamp == stamp:
+                return
+
+            if not index.persisted:
+                logger.info("Rebuilding keyword index from the vector store")
+                index.clear()
+                for collection in self.collections.values():
+                    records = collection.get(include=['documents'])
+                    for doc_id, content in zip(records['ids'], records['documents']):
+                        index.add(doc_id, content)
+            else:
+                expected = {doc_id for entry in self.manifest.entries.values() for doc_id in entry['ids']}
+                indexed = set(index.docno_by_id)
+                unlisted = indexed - expected
+                stored = {record['id'] for record in self._fetch_chunks(unlisted, include=[])}
+                index.remove(unlisted - stored)
+                missing = expected - indexed
+                for record in self._fetch_chunks(missing, include=['documents']):
+                    index.add(record['id'], record['content'])
+                logger.info(
+                    f"Keyword index synced with the ingest manifest: {len(missing)} chunks checked for indexing, "
+                    f"{len(unlisted - stored)} removed"
+                )
+            index.save(stamp)
         except Exception as e:
-            logger.error(f"Error loading config: {str(e)}")
+            logger.error(f"Error syncing keyword index: {str(e)}")
             raise
 
+    def _fetch_chunks(self, ids: Iterable[str], include: List[str], batch_size: int = 256) -> List[Dict[str, Any]]:
+        """Read stored chunks by ID from the collections their IDs name; unknown IDs are skipped"""
+        by_collection: Dict[str, List[str]] = {}
+        for doc_id in ids:
+            by_collection.setdefault(doc_id.split('_', 1)[0], []).append(doc_id)
+
+        records = []
+        for policy_type, doc_ids in by_collection.items():
+            collection = self.collections.get(policy_type)
+            if collection is None:
+                continue
+            for start in range(0, len(doc_ids), batch_size):
+                result = collection.get(ids=doc_ids[start:start + batch_size], include=include)
+                for idx, doc_id in enumerate(result['ids']):
+                    records.append({
+                        'id': doc_id,
+                        'content': result['documents'][idx] if result.get('documents') else None,
+                        'metadata': result['metadatas'][idx] if result.get('metadatas') else None,
+                        'policy_type': policy_type
+                    })
+        return records
+
+    def _hydrate(self, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill in the text and metadata of keyword hits, which the index does not keep"""
+        missing = [hit['id'] for hit in hits if 'content' not in hit]
+        if not missing:
+            return hits
+        with metrics.span('keyword_fetch'):
+            records = {record['id']: record for record in self._fetch_chunks(missing, include=['documents', 'metadatas'])}
+        hydrated = []
+        for hit in hits:
+            if 'content' not in hit:
+                record = records.get(hit['id'])
+                if record is None:
+                    continue
+                hit = dict(hit, content=record['content'], metadata=record['metadata'])
+            hydrated.append(hit)
+        return hydrated
+
+    def flush(self):
+        """Persist the keyword and ANN indexes after a batch of writes"""
+        if self._keyword_index is not None:
+            self._keyword_index.save(self._manifest_stamp())
+        if self.backend == "numpy" and self._collections is not None:
+            for collection in self._collections.values():
+                collection.flush()
+
+    def warm_up(self):
+        """Load the embedder and open the collections ahead of the first request"""
+        self.embedding_function
+        self.collections
+        self.keyword_index
+
+    def reset_after_fork(self):
+        """Drop database handles and threads inherited from a parent process.
+
+        The client and collections reopen on first use; the embedder and
+        keyword index stay loaded, shared copy-on-write with the parent.
+        """
+        if self.backend == "chroma" and self._client is not None:
+            # PersistentClient caches its system per path; a cached one holds the parent's connections
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        self._client = None
+        self._collections = None
+        self._load_lock = threading.RLock()
+        self.query_executor = ThreadPoolExecutor(
+            max_workers=max(len(self.collection_names), 1),
+            thread_name_prefix="vector-query"
+        )
+        if self.query_cache is not None:
+            self.query_cache.reopen()
+
+    def reload_keyword_index(self):
+        """Drop the loaded keyword index; it is read from disk again on next use"""
+        with self._load_lock:
+            self._keyword_index = None
+
+    def _load_config(self, config_path: str) -> Dict[str, Any]:
+        """Load configuration from YAML file"""
+        return load_config(config_path)
+
     def _get_policy_type(self, text: str) -> str:
         """Determine the policy type of a document or query"""
         text = text.lower()
@@ -69,88 +329,341 @@ class VectorStore:
             return 'auto'
         return 'unknown'
 
-    def add_documents(self, documents: List[Dict[str, Any]]):
-        """Add documents to the appropriate ChromaDB collection"""
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts with the collection embedding function"""
+        try:
+            return self.embedding_function(texts)
+        except Exception as e:
+            logger.error(f"Error embedding texts: {str(e)}")
+            raise
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed chunk texts, reusing vectors already in the embedding store"""
+        if self.embedding_store is None or not texts:
+            return self.embed_texts(texts) if texts else []
+        try:
+            embeddings = self.embedding_store.get_many(self.embedding_model, texts)
+            missing: Dict[str, List[int]] = {}
+            for idx, embedding in enumerate(embeddings):
+                if embedding is None:
+                    missing.setdefault(texts[idx], []).append(idx)
+
+            if missing:
+                to_embed = list(missing)
+                computed = self.embed_texts(to_embed)
+                self.embedding_store.put_many(self.embedding_model, to_embed, computed)
+                for text, embedding in zip(to_embed, computed):
+                    for idx in missing[text]:
+                        embeddings[idx] = embedding
+            return embeddings
+        except Exception as e:
+            logger.error(f"Error embedding documents: {str(e)}")
+            raise
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed search queries, serving repeated ones from the query embedding cache"""
+        if not queries:
+            return []
+        if self.query_cache is None:
+            with metrics.span('embed'):
+                return self.embed_texts(queries)
         try:
-            health_docs = []
-            auto_docs = []
-            
+            embeddings = self.query_cache.get_many(queries)
+            missing: Dict[str, List[int]] = {}
+            for idx, embedding in enumerate(embeddings):
+                if embedding is None:
+                    missing.setdefault(QueryEmbeddingCache.normalize(queries[idx]), []).append(idx)
+
+            if missing:
+                # One forward pass per distinct query, even if it repeats within the batch
+                to_embed = [queries[indices[0]] for indices in missing.values()]
+                with metrics.span('embed'):
+                    computed = self.embed_texts(to_embed)
+                self.query_cache.put_many(to_embed, computed)
+                for indices, embedding in zip(missing.values(), computed):
+                    for idx in indices:
+                        embeddings[idx] = embedding
+            return embeddings
+        except Exception as e:
+            logger.error(f"Error embedding queries: {str(e)}")
+            raise
+
+    def _route_document(self, doc: Dict[str, Any]) -> str:
+        """Pick the collection a document belongs to"""
+        # Chunks rarely repeat the policy header, so prefer the document-level type
+        policy_type = doc.get('metadata', {}).get('doc_type')
+        if policy_type not in self.collection_names:
+            policy_type = self._get_policy_type(doc['content'])
+        return policy_type
+
+    def _collection_for_id(self, doc_id: str):
+        """Resolve the collection that owns a document ID"""
+        return self.collections.get(doc_id.split('_', 1)[0])
+
+    def document_id(self, doc: Dict[str, Any]) -> str:
+        """Stable ID derived from source path, chunk offset and content hash"""
+        metadata = doc.get('metadata', {})
+        content_hash = hashlib.sha256(doc['content'].encode('utf-8')).hexdigest()
+        key = f"{metadata.get('source', '')}|{metadata.get('start_offset', 0)}|{content_hash}"
+        return f"{self._route_document(doc)}_{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+
+    def find_missing(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the documents whose IDs are not stored yet"""
+        try:
+            by_collection: Dict[str, List[str]] = {}
+            ids = [self.document_id(doc) for doc in documents]
+            for doc_id in ids:
+                by_collection.setdefault(doc_id.split('_', 1)[0], []).append(doc_id)
+
+            existing = set()
+            for policy_type, doc_ids in by_collection.items():
+                collection = self.collections.get(policy_type)
+                if collection is not None:
+                    existing.update(collection.get(ids=doc_ids, include=[])['ids'])
+
+            return [doc for doc, doc_id in zip(documents, ids) if doc_id not in existing]
+        except Exception as e:
+            logger.error(f"Error checking stored documents: {str(e)}")
+            raise
+
+    def delete_ids(self, ids: List[str], batch_size: int = 256):
+        """Delete documents by ID from whichever collection holds them.
+
+        IDs are deleted ``batch_size`` at a time, so a large re-ingest stays
+        under SQLite's limit on bound variables per statement.
+        """
+        try:
+            by_collection: Dict[str, List[str]] = {}
+            for doc_id in ids:
+                by_collection.setdefault(doc_id.split('_', 1)[0], []).append(doc_id)
+            for policy_type, doc_ids in by_collection.items():
+                collection = self.collections.get(policy_type)
+                if collection is not None:
+                    for start in range(0, len(doc_ids), batch_size):
+                        collection.delete(ids=doc_ids[start:start + batch_size])
+            if self.keyword_index is not None:
+                self.keyword_index.remove(ids)
+            if ids:
+                logger.info(f"Deleted {len(ids)} stale documents")
+        except Exception as e:
+            logger.error(f"Error deleting documents: {str(e)}")
+            raise
+
+    def add_documents(self,
+                      documents: List[Dict[str, Any]],
+                      embeddings: Optional[List[List[float]]] = None) -> List[str]:
+        """Upsert documents into the appropriate ChromaDB collection.
+
+        When ``embeddings`` is given it must align with ``documents`` and is
+        stored as-is; otherwise the content is embedded through the
+        embedding store. Returns the document IDs in input order.
+        """
+        try:
+            if embeddings is None:
+                embeddings = self.embed_documents([doc['content'] for doc in documents])
+
+            grouped: Dict[str, List[Dict[str, Any]]] = {}
+            ids = []
+
             for idx, doc in enumerate(documents):
-                content = doc['content']
-                policy_type = self._get_policy_type(content)
-                
-                if policy_type == 'health':
-                    health_docs.append({
-                        'id': f"health_{idx}",
-                        'content': content,
-                        'metadata': doc.get('metadata', {})
-                    })
-                elif policy_type == 'auto':
-                    auto_docs.append({
-                        'id': f"auto_{idx}",
-                        'content': content,
-                        'metadata': doc.get('metadata', {})
-                    })
+                policy_type = self._route_document(doc)
+                doc_id = self.document_id(doc)
+                ids.append(doc_id)
 
-            # Add to ChromaDB collections
-            if health_docs:
-                self.health_collection.add(
-                    ids=[doc['id'] for doc in health_docs],
-                    documents=[doc['content'] for doc in health_docs],
-                    metadatas=[doc['metadata'] for doc in health_docs]
-                )
-                logger.info(f"Added {len(health_docs)} health insurance documents")
+                entry = {
+                    'id': doc_id,
+                    'content': doc['content'],
+                    'metadata': doc.get('metadata', {}),
+                    'embedding': embeddings[idx]
+                }
+                if policy_type in self.collection_names:
+                    grouped.setdefault(policy_type, []).append(entry)
 
-            if auto_docs:
-                self.auto_collection.add(
-                    ids=[doc['id'] for doc in auto_docs],
-                    documents=[doc['content'] for doc in auto_docs],
-                    metadatas=[doc['metadata'] for doc in auto_docs]
-                )
-                logger.info(f"Added {len(auto_docs)} auto insurance documents")
+            # Upsert into ChromaDB collections, keeping the keyword index in step
+            keyword_index = self.keyword_index
+            for policy_type, docs in grouped.items():
+                self._upsert_to_collection(self.collections[policy_type], docs)
+                if keyword_index is not None:
+                    for doc in docs:
+                        keyword_index.add(doc['id'], doc['content'])
+                logger.info(f"Upserted {len(docs)} {policy_type} insurance documents")
+
+            return ids
 
         except Exception as e:
             logger.error(f"Error adding documents: {str(e)}")
             raise
 
-    def search_similar(self, query: str, n_results: int = 3) -> List[Dict[str, Any]]:
-        """Search for similar documents using ChromaDB"""
-        try:
-            policy_type = self._get_policy_type(query)
+    def _upsert_to_collection(self, collection, docs: List[Dict[str, Any]]):
+        """Write prepared documents to a collection in a single call"""
+        kwargs = {
+            'ids': [doc['id'] for doc in docs],
+            'documents': [doc['content'] for doc in docs],
+            'metadatas': [doc['metadata'] for doc in docs]
+        }
+        if all(doc['embedding'] is not None for doc in docs):
+            kwargs['embeddings'] = [doc['embedding'] for doc in docs]
+        collection.upsert(**kwargs)
+
+    def _query_collection(self,
+                          policy_type: str,
+                          query_embeddings: List[List[float]],
+                          n_results: int) -> List[List[Dict[str, Any]]]:
+        """Query one collection with precomputed embeddings, one result list per query"""
+        collection_results = self.collections[policy_type].query(
+            query_embeddings=query_embeddings,
+            n_results=n_results
+        )
+        batch_results = []
+        for query_idx in range(len(query_embeddings)):
             results = []
+            if collection_results['documents']:
+                for idx, doc in enumerate(collection_results['documents'][query_idx]):
+                    results.append({
+                        'id': collection_results['ids'][query_idx][idx],
+                        'content': doc,
+                        'metadata': collection_results['metadatas'][query_idx][idx],
+                        'policy_type': policy_type,
+                        'distance': collection_results['distances'][query_idx][idx] if collection_results.get('distances') else None
+                    })
+            batch_results.append(results)
+        return batch_results
 
-            if policy_type == 'health' or policy_type == 'unknown':
-                health_results = self.health_collection.query(
-                    query_texts=[query],
-                    n_results=n_results
-                )
-                if health_results['documents']:
-                    for idx, doc in enumerate(health_results['documents'][0]):
-                        results.append({
-                            'content': doc,
-                            'metadata': health_results['metadatas'][0][idx],
-                            'policy_type': 'health',
-                            'distance': health_results['distances'][0][idx] if 'distances' in health_results else None
-                        })
-
-            if policy_type == 'auto' or policy_type == 'unknown':
-                auto_results = self.auto_collection.query(
-                    query_texts=[query],
-                    n_results=n_results
+    def search_keyword_only(self, query: str, n_results: int = 3) -> Optional[List[Dict[str, Any]]]:
+        """Serve an identifier-heavy query from the keyword index alone.
+
+        Queries naming exact identifiers (policy numbers, phone numbers,
+        dollar amounts) are answered by BM25 without embedding when the top
+        hit contains every identifier. Returns None when the query needs
+        dense retrieval.
+        """
+        keyword_index = self.keyword_index
+        if keyword_index is None or not self.keyword_only:
+            return None
+        identifiers = {term for term in tokenize(query) if is_identifier(term)}
+        if not identifiers:
+            return None
+        with metrics.span('keyword_search'):
+            hits = keyword_index.search(query, n_results)
+        if not hits or not keyword_index.contains_terms(hits[0]['id'], identifiers):
+            return None
+        return self._hydrate(hits) or None
+
+    def _fuse(self,
+              dense: List[Dict[str, Any]],
+              sparse: List[Dict[str, Any]],
+              n_results: int) -> List[Dict[str, Any]]:
+        """Reciprocal rank fusion of dense and BM25 rankings"""
+        scores: Dict[str, float] = {}
+        hits: Dict[str, Dict[str, Any]] = {}
+        for ranking in (dense, sparse):
+            for rank, hit in enumerate(ranking):
+                scores[hit['id']] = scores.get(hit['id'], 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                if hit['id'] in hits:
+                    hits[hit['id']]['bm25_score'] = hit.get('bm25_score')
+                else:
+                    hits[hit['id']] = dict(hit)
+
+        fused = []
+        for doc_id in heapq.nlargest(n_results, scores, key=scores.get):
+            hit = hits[doc_id]
+            hit['rrf_score'] = scores[doc_id]
+            fused.append(hit)
+        return fused
+
+    def search_similar(self,
+                       query: str,
+                       n_results: int = 3,
+                       query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """Search for similar documents across the relevant collections"""
+        return self.search_similar_batch(
+            [query],
+            n_results,
+            query_embeddings=[query_embedding] if query_embedding is not None else None
+        )[0]
+
+    def search_similar_batch(self,
+                             queries: List[str],
+                             n_results: int = 3,
+                             timings: Optional[Dict[str, float]] = None,
+                             query_embeddings: Optional[List[List[float]]] = None) -> List[List[Dict[str, Any]]]:
+        """Search for similar documents for several queries at once.
+
+        All queries are embedded in one batch. Each collection then receives
+        a single query call carrying every query routed to it, with the
+        collections queried concurrently; per-query hits are merged by
+        distance. With hybrid retrieval enabled, the dense hits are fused
+        with BM25 hits from every collection by reciprocal rank fusion, and
+        identifier-heavy queries are served from BM25 without embedding
+        (see ``search_keyword_only``). Callers that already embedded the
+        queries can pass ``query_embeddings`` to skip that step. Stage
+        durations in milliseconds are written to ``timings`` when given.
+        """
+        try:
+            started = time.perf_counter()
+            results: List[Optional[List[Dict[str, Any]]]] = [None] * len(queries)
+            if query_embeddings is None:
+                results = [self.search_keyword_only(query, n_results) for query in queries]
+                dense_indices = [idx for idx, hits in enumerate(results) if hits is None]
+                keyword_done = time.perf_counter()
+                embedded_queries = self.embed_queries([queries[idx] for idx in dense_indices])
+                query_embeddings = [None] * len(queries)
+                for idx, embedding in zip(dense_indices, embedded_queries):
+                    query_embeddings[idx] = embedding
+            else:
+                dense_indices = list(range(len(queries)))
+                keyword_done = started
+            embedded = time.perf_counter()
+
+            # Route each query to its collections
+            with metrics.span('routing'):
+                routed: Dict[str, List[int]] = {policy_type: [] for policy_type in self.collection_names}
+                for query_idx in dense_indices:
+                    policy_type = self._get_policy_type(queries[query_idx])
+                    targets = [policy_type] if policy_type in self.collection_names else list(self.collection_names)
+                    for target in targets:
+                        routed[target].append(query_idx)
+                routed = {target: indices for target, indices in routed.items() if indices}
+
+            keyword_index = self.keyword_index
+            n_candidates = max(n_results, self.hybrid_candidates) if keyword_index is not None else n_results
+
+            def run(target: str) -> List[List[Dict[str, Any]]]:
+                indices = routed[target]
+                with metrics.span('collection_query', collection=target):
+                    return self._query_collection(target, [query_embeddings[idx] for idx in indices], n_candidates)
+
+            if len(routed) == 1:
+                per_collection = [run(target) for target in routed]
+            else:
+                # Each pool thread runs in a copy of the caller's context, so its spans join the caller's trace
+                context = contextvars.copy_context()
+                per_collection = list(self.query_executor.map(lambda target: context.copy().run(run, target), routed))
+
+            candidates: List[List[Dict[str, Any]]] = [[] for _ in queries]
+            for target, collection_hits in zip(routed, per_collection):
+                for query_idx, hits in zip(routed[target], collection_hits):
+                    candidates[query_idx].extend(hits)
+
+            for query_idx in dense_indices:
+                dense = heapq.nsmallest(
+                    n_candidates,
+                    candidates[query_idx],
+                    key=lambda x: x['distance'] if x['distance'] is not None else float('inf')
                 )
-                if auto_results['documents']:
-                    for idx, doc in enumerate(auto_results['documents'][0]):
-                        results.append({
-                            'content': doc,
-                            'metadata': auto_results['metadatas'][0][idx],
-                            'policy_type': 'auto',
-                            'distance': auto_results['distances'][0][idx] if 'distances' in auto_results else None
-                        })
-
-            # Sort results by distance if available
-            if results and results[0].get('distance') is not None:
-                results.sort(key=lambda x: x['distance'])
+                if keyword_index is not None:
+                    with metrics.span('keyword_search'):
+                        sparse = keyword_index.search(queries[query_idx], n_candidates)
+                    with metrics.span('fusion'):
+                        fused = self._fuse(dense, sparse, n_results)
+                    results[query_idx] = self._hydrate(fused)
+                else:
+                    results[query_idx] = dense[:n_results]
 
+            if timings is not None:
+                finished = time.perf_counter()
+                timings['embed_ms'] = (embedded - keyword_done) * 1000
+                timings['query_ms'] = (finished - embedded + keyword_done - started) * 1000
             return results
 
         except Exception as e:
@@ -160,14 +673,13 @@ class VectorStore:
     def get_collection_stats(self):
         """Get statistics about the stored documents"""
         try:
-            health_count = self.health_collection.count()
-            auto_count = self.auto_collection.count()
-            
-            return {
-                'health_documents': health_count,
-                'auto_documents': auto_count,
-                'total_documents': health_count + auto_count
-            }
+            counts = {policy_type: collection.count() for policy_type, collection in self.collections.items()}
+
+            stats = {f"{policy_type}_documents": count for policy_type, count in counts.items()}
+            stats['total_documents'] = sum(counts.values())
+            if self.keyword_index is not None:
+                stats['keyword_index'] = self.keyword_index.get_stats()
+            return stats
         except Exception as e:
             logger.error(f"Error getting collection stats: {str(e)}")
             raise
\ No newline at end of file
@@ -0,0 +1,374 @@
+# src/agent/worker_pool.py
+from typing import Dict, Any, List, Optional
+from concurrent.futures import Future
+from multiprocessing import connection, reduction
+import gc
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+from loguru import logger
+from .batch_scheduler import GenerationUnavailable
+
+# Agent methods a worker will run
+WORKER_METHODS = ('answer_question', 'answer_questions')
+
+
+def _worker_main(agent, threads_per_worker: int, conn, reload_indexes: bool):
+    """Serve tasks received on ``conn`` until a None sentinel or EOF arrives"""
+    import torch
+
+    torch.set_num_threads(threads_per_worker)
+    agent.reset_after_fork()
+    if reload_indexes:
+        # The zygote holds the indexes as they were at start; later ingests are on disk
+        agent.reload_indexes()
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        task_id, method, args = task
+        try:
+            result = (task_id, True, getattr(agent, method)(*args))
+        except GenerationUnavailable as e:
+            result = (task_id, False, e)
+        except Exception as e:
+            logger.error(f"Error in worker {os.getpid()}: {str(e)}")
+            result = (task_id, False, f"{type(e).__name__}: {e}")
+        conn.send(result)
+
+
+def _zygote_main(agent, threads_per_worker: int, control, pool_control):
+    """Fork workers on request, from a process that never starts a thread.
+
+    Each request on ``control`` is ``(slot, reload_indexes)``. The new
+    worker talks to the pool over its own socket pair; the zygote replies
+    with the worker's pid and passes the pool's end of the pair as a file
+    descriptor, then keeps no reference to it.
+    """
+    # Only the pool may hold its end, so the zygote sees EOF if the pool goes away
+    pool_control.close()
+    # The parent stops the pool; a terminal Ctrl-C should not kill workers mid-answer
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Workers are children of the zygote; let the kernel reap them
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    # Objects alive now are shared with every worker; keep GC from touching their pages
+    gc.collect()
+    gc.freeze()
+
+    while True:
+        try:
+            request = control.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        slot, reload_indexes = request
+
+        pool_end, worker_end = multiprocessing.Pipe(duplex=True)
+        try:
+            pid = os.fork()
+        except OSError as e:
+            logger.error(f"Error forking worker slot {slot}: {str(e)}")
+            control.send(None)
+            pool_end.close()
+            worker_end.close()
+            continue
+        if pid == 0:
+            code = 0
+            try:
+                control.close()
+                pool_end.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                _worker_main(agent, threads_per_worker, worker_end, reload_indexes)
+            except BaseException as e:
+                logger.error(f"Error in worker slot {slot}: {str(e)}")
+                code = 1
+            finally:
+                os._exit(code)
+
+        worker_end.close()
+        control.send(pid)
+        reduction.send_handle(control, pool_end.fileno(), pid)
+        pool_end.close()
+
+
+class _Worker:
+    """A worker process, its connection and the tasks it has not answered yet"""
+
+    def __init__(self, slot: int, pid: int, conn):
+        self.slot = slot
+        self.pid = pid
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.outstanding: Dict[int, Future] = {}
+        self.retired = False
+        self.exited = False
+        self.completed = 0
+
+    def send(self, message) -> bool:
+        """Send a task or sentinel; False if the worker is gone"""
+        try:
+            with self.send_lock:
+                self.conn.send(message)
+            return True
+        except (OSError, ValueError):
+            return False
+
+
+class WorkerPool:
+    """Pre-fork pool of answer workers sharing one copy of the loaded models.
+
+    ``start`` loads the embedder, collections, keyword index and LLM in the
+    parent and forks a zygote: a process that never starts a thread and
+    whose only job is forking workers. Every worker, including
+    replacements and the new workers of ``restart``, is forked from the
+    zygote. Forking from the serving process itself, once its event loop,
+    executor and streaming threads exist, could copy a lock held by one of
+    them (loguru, OpenMP, sqlite, metrics) and deadlock the child.
+    Model weights are not written after loading, so the workers share them
+    copy-on-write and each one adds little more than its activations.
+    Every worker limits torch to ``threads_per_worker`` intra-op threads
+    (cores / workers by default) so the pool does not oversubscribe the
+    machine. The parent keeps a single intra-op thread while the pool runs,
+    because forking after OpenMP has started its thread team can hang the
+    children.
+
+    Tasks go to the live worker with the fewest unanswered tasks. A worker
+    that dies fails its unanswered tasks and is replaced. The zygote holds
+    the store as it was at ``start``; call ``restart`` after ingesting, and
+    the new workers reload the keyword and field indexes from disk. Models
+    cannot be shared this way once CUDA is initialized, so the pool is
+    CPU-only.
+    """
+
+    def __init__(self, agent, workers: Optional[int] = None, threads_per_worker: Optional[int] = None):
+        self.agent = agent
+        self.current_date = "2025-01-20 23:26:03"
+        self.current_user = "objectgyan"
+        pool_config = agent.config.get('worker_pool', {}) or {}
+        cores = os.cpu_count() or 1
+        self.workers = max(int(workers or pool_config.get('workers') or cores), 1)
+        self.threads_per_worker = max(int(threads_per_worker or pool_config.get('threads_per_worker') or cores // self.workers), 1)
+
+        self.context = multiprocessing.get_context('fork')
+        self.zygote = None
+        self.control = None
+        self.control_lock = threading.Lock()
+        # Wakes the collector when workers are added
+        self.wakeup_recv, self.wakeup_send = self.context.Pipe(duplex=False)
+        self.lock = threading.Lock()
+        self.pool: List[_Worker] = []
+        self.retired: List[_Worker] = []
+        self.task_ids = itertools.count()
+        self.collector: Optional[threading.Thread] = None
+        self.running = False
+        self.generation = 0
+
+        # Counters
+        self.failed = 0
+        self.restarts = 0
+
+    def start(self):
+        """Load the models in this process, fork the zygote and the workers"""
+        import torch
+
+        if self.running:
+            return
+        try:
+            torch.set_num_threads(1)
+            # Workers tokenize on their own; Rust tokenizer threads in the parent would only be disabled at fork
+            os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+            self.agent.warm_up(background=False)
+            if torch.cuda.is_available() and torch.cuda.is_initialized():
+                raise RuntimeError("Pre-fork workers need a CPU model; CUDA state cannot be shared across fork")
+            if threading.active_count() > 1:
+                logger.warning(
+                    f"Starting the worker zygote with {threading.active_count()} threads running; "
+                    "start the pool before serving requests"
+                )
+
+            self.control, zygote_control = self.context.Pipe(duplex=True)
+            self.zygote = self.context.Process(
+                target=_zygote_main,
+                args=(self.agent, self.threads_per_worker, zygote_control, self.control),
+                name="answer-zygote",
+                daemon=True
+            )
+            self.zygote.start()
+            zygote_control.close()
+
+            with self.lock:
+                self.running = True
+                self.pool = [self._spawn(slot) for slot in range(self.workers)]
+            self.collector = threading.Thread(target=self._collect, name="worker-pool-results", daemon=True)
+            self.collector.start()
+            logger.info(f"WorkerPool started {self.workers} workers with {self.threads_per_worker} torch threads each")
+        except Exception as e:
+            logger.error(f"Error starting worker pool: {str(e)}")
+            raise
+
+    def _spawn(self, slot: int) -> _Worker:
+        """Have the zygote fork one worker; safe from any thread"""
+        with self.control_lock:
+            self.control.send((slot, self.generation > 0))
+            pid = self.control.recv()
+            if pid is None:
+                raise RuntimeError(f"The zygote could not fork worker slot {slot}")
+            fd = reduction.recv_handle(self.control)
+        worker = _Worker(slot, pid, connection.Connection(fd))
+        self.wakeup_send.send(None)
+        return worker
+
+    def restart(self):
+        """Fork a fresh set of workers, e.g. after ingestion; the old ones finish their tasks first"""
+        with self.lock:
+            if not self.running:
+                return
+            self.generation += 1
+            old_pool = self.pool
+            self.pool = [self._spawn(slot) for slot in range(self.workers)]
+            for worker in old_pool:
+                worker.retired = True
+            self.retired.extend(old_pool)
+            self.restarts += 1
+        for worker in old_pool:
+            worker.send(None)
+        logger.info(f"WorkerPool restarted {self.workers} workers")
+
+    def submit(self, method: str, *args) -> Future:
+        """Queue an agent call on the least busy worker"""
+        if method not in WORKER_METHODS:
+            raise ValueError(f"Workers do not run {method}")
+        future: Future = Future()
+        with self.lock:
+            if not self.running:
+                raise RuntimeError("Worker pool is not running")
+            live = [candidate for candidate in self.pool if not candidate.exited]
+            if not live:
+                raise RuntimeError("No live workers")
+            worker = min(live, key=lambda candidate: len(candidate.outstanding))
+            task_id = next(self.task_ids)
+            worker.outstanding[task_id] = future
+        # A worker that died meanwhile fails the task when the collector sees it exit
+        worker.send((task_id, method, args))
+        return future
+
+    def answer_question(self, question: str, policy: Optional[str] = None) -> Dict[str, Any]:
+        return self.submit('answer_question', question, policy).result()
+
+    def answer_questions(self, questions: List[str]) -> Dict[str, Any]:
+        """Split a batch into one contiguous slice per worker and answer the slices in parallel"""
+        if not questions:
+            return self.agent.answer_questions(questions)
+        slices = min(self.workers, len(questions))
+        bounds = [len(questions) * i // slices for i in range(slices + 1)]
+        futures = [self.submit('answer_questions', questions[start:end]) for start, end in zip(bounds, bounds[1:])]
+
+        results: List[Dict[str, Any]] = []
+        timings: Dict[str, float] = {}
+        for future in futures:
+            batch = future.result()
+            results.extend(batch['results'])
+            # Slices run concurrently, so each stage takes as long as its slowest slice
+            for name, value in batch['timings'].items():
+                timings[name] = max(timings.get(name, 0.0), value)
+        timings['workers'] = slices
+        return {'results': results, 'timings': timings}
+
+    def _collect(self):
+        """Route worker results to their futures and replace workers that exit"""
+        while True:
+            with self.lock:
+                workers = {worker.conn: worker for worker in self.pool + self.retired if not worker.exited}
+                if not self.running and not workers:
+                    break
+            for conn in connection.wait(list(workers) + [self.wakeup_recv], timeout=1.0):
+                if conn is self.wakeup_recv:
+                    self.wakeup_recv.recv()
+                    continue
+                worker = workers[conn]
+                try:
+                    task_id, ok, payload = conn.recv()
+                except (EOFError, OSError):
+                    self._exited(worker)
+                    continue
+                with self.lock:
+                    future = worker.outstanding.pop(task_id, None)
+                    if future is not None:
+                        worker.completed += 1
+                if future is None:
+                    continue
+                if ok:
+                    future.set_result(payload)
+                else:
+                    self.failed += 1
+                    future.set_exception(payload if isinstance(payload, Exception) else RuntimeError(payload))
+
+    def _exited(self, worker: _Worker):
+        """Fail the tasks of a worker whose connection closed, and replace it if it was serving"""
+        with self.lock:
+            worker.exited = True
+            worker.conn.close()
+            if worker in self.retired:
+                self.retired.remove(worker)
+            expected = worker.retired or not self.running
+            if not expected or worker.outstanding:
+                logger.error(f"Worker {worker.pid} exited with {len(worker.outstanding)} unanswered tasks")
+            for future in worker.outstanding.values():
+                self.failed += 1
+                future.set_exception(RuntimeError(f"Worker {worker.pid} exited"))
+            worker.outstanding.clear()
+            if not expected:
+                try:
+                    self.pool[self.pool.index(worker)] = self._spawn(worker.slot)
+                    self.restarts += 1
+                except Exception as e:
+                    logger.error(f"Error replacing worker {worker.pid}: {str(e)}")
+
+    def close(self, timeout: float = 30.0):
+        """Let workers finish their queued tasks, then stop them and the zygote"""
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            workers = self.pool + self.retired
+        for worker in self.pool:
+            worker.send(None)
+        self.wakeup_send.send(None)
+        if self.collector is not None:
+            self.collector.join(timeout)
+        for worker in workers:
+            if not worker.exited:
+                try:
+                    os.kill(worker.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+        with self.control_lock:
+            try:
+                self.control.send(None)
+            except OSError:
+                pass
+        self.zygote.join(timeout)
+        if self.zygote.is_alive():
+            self.zygote.terminate()
+        logger.info("WorkerPool stopped")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-worker load and failure counters"""
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'threads_per_worker': self.threads_per_worker,
+                'alive': sum(not worker.exited for worker in self.pool),
+                'outstanding': [len(worker.outstanding) for worker in self.pool],
+                'completed': [worker.completed for worker in self.pool],
+                'failed': self.failed,
+                'restarts': self.restarts
+            }
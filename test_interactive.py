@@ -1,5 +1,6 @@
 # test_interactive.py
 import sys
+import time
 from pathlib import Path
 from datetime import datetime
 from loguru import logger
@@ -146,6 +147,8 @@ class InteractiveTest:
             print("=" * 50)
             print(f"Model: {model_info['model_name']}")
             print(f"Provider: {model_info['provider']}")
+            print(f"Device: {model_info['device']} ({model_info['precision']})")
+            print(f"Resident Models: {', '.join(m['model_name'] for m in model_info['model_pool']['resident']) or 'none'}")
             print(f"Cache Enabled: {model_info['cache_enabled']}")
             print(f"Last Used: {model_info['last_used']}")
             print("=" * 50)
@@ -270,6 +273,10 @@ class InteractiveTest:
                         self.clear_screen()
                     elif user_input.lower() == 'stats':
                         self.show_chroma_stats()
+                    elif user_input.lower() == 'llm':
+                        self.get_llm_info()
+                    elif user_input.lower() == 'model':
+                        self.select_model()
                     else:
                         # Process the question
                         self.process_question(user_input)
@@ -292,17 +299,27 @@ class InteractiveTest:
         try:
             print("\nProcessing your question...")
             
-            # Get response from agent
-            response = self.agent.answer_question(question)
-            
-            # Display response
+            # Stream response from agent
+            response = {}
+            pieces = []
+            started = time.perf_counter()
+            first_token_ms = None
+
             print("\nAnswer:")
             print("=" * 50)
-            print(response['response'])
+            for piece in self.agent.answer_question_stream(question, result=response):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                pieces.append(piece)
+                print(piece, end="", flush=True)
+            print()
             print("=" * 50)
+            response['response'] = "".join(pieces)
+            if first_token_ms is not None:
+                print(f"Time to first token: {first_token_ms:.0f}ms, total: {(time.perf_counter() - started) * 1000:.0f}ms")
             
             # Display relevant documents
-            if response['similar_documents']:
+            if response.get('similar_documents'):
                 print("\nRelevant Policy Sections:")
                 for idx, doc in enumerate(response['similar_documents'], 1):
                     print(f"\n{idx}. {doc['content'][:200]}...")